@@ -0,0 +1,42 @@
+"""add_transactions_history_index
+
+Revision ID: 18057b853e6e
+Revises: f92dc55bd6cf
+Create Date: 2026-10-17 09:00:12.481305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '18057b853e6e'
+down_revision: Union[str, None] = 'f92dc55bd6cf'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Backs keyset pagination of an account's history on (created_at, id).
+    # Built CONCURRENTLY on PostgreSQL so writes to transactions keep flowing.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_transactions_account_created_id',
+            'transactions',
+            ['account_id', 'created_at', 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_transactions_account_created_id',
+            table_name='transactions',
+            postgresql_concurrently=True,
+        )
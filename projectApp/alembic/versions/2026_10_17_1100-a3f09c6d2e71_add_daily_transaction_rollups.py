@@ -0,0 +1,37 @@
+"""add_daily_transaction_rollups
+
+Revision ID: a3f09c6d2e71
+Revises: 5c1d7e2a9b34
+Create Date: 2026-10-17 11:00:07.215533
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f09c6d2e71'
+down_revision: Union[str, None] = '5c1d7e2a9b34'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # History is filled afterwards with `python -m app.cli backfill-rollups`,
+    # in short chunks rather than one long transaction here
+    op.create_table('daily_transaction_rollups',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('transaction_type', postgresql.ENUM('deposit', 'withdrawal', 'transfer', name='transactiontype', create_type=False), nullable=False),
+    sa.Column('count', sa.BigInteger(), nullable=False),
+    sa.Column('total_amount', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'transaction_type')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('daily_transaction_rollups')
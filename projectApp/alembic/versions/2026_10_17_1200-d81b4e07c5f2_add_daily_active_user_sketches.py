@@ -0,0 +1,35 @@
+"""add_daily_active_user_sketches
+
+Revision ID: d81b4e07c5f2
+Revises: a3f09c6d2e71
+Create Date: 2026-10-17 12:00:33.640918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd81b4e07c5f2'
+down_revision: Union[str, None] = 'a3f09c6d2e71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Rows are built lazily by the activity endpoint or with
+    # `python -m app.cli build-activity-sketches`
+    op.create_table('daily_active_user_sketches',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('active_users', sa.Integer(), nullable=False),
+    sa.Column('registers', sa.LargeBinary(), nullable=False),
+    sa.PrimaryKeyConstraint('day')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('daily_active_user_sketches')
@@ -0,0 +1,49 @@
+"""add_user_search_trigram_indexes
+
+Revision ID: 7e4a2b91d0c8
+Revises: d81b4e07c5f2
+Create Date: 2026-10-17 13:00:18.377402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e4a2b91d0c8'
+down_revision: Union[str, None] = 'd81b4e07c5f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Substring ILIKE on users.full_name / users.email is served by trigram
+    # GIN indexes; SQLite deployments use the in-process index in
+    # app/services/user_search.py instead.
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    with op.get_context().autocommit_block():
+        for column in ('full_name', 'email'):
+            op.create_index(
+                f'ix_users_{column}_trgm',
+                'users',
+                [column],
+                unique=False,
+                postgresql_using='gin',
+                postgresql_ops={column: 'gin_trgm_ops'},
+                postgresql_concurrently=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for column in ('full_name', 'email'):
+            op.drop_index(
+                f'ix_users_{column}_trgm',
+                table_name='users',
+                postgresql_concurrently=True,
+            )
+    # pg_trgm is left installed; other objects may depend on it
@@ -0,0 +1,97 @@
+"""partition_system_logs_by_month
+
+Revision ID: 2b6f8d3a17e9
+Revises: 7e4a2b91d0c8
+Create Date: 2026-10-17 14:00:52.118406
+
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2b6f8d3a17e9'
+down_revision: Union[str, None] = '7e4a2b91d0c8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 2
+
+
+def _month(index: int) -> datetime:
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # system_logs becomes a table range-partitioned by month on timestamp, so
+    # retention detaches/drops whole partitions (app/services/log_retention.py).
+    # Existing rows are not copied: the old table is attached as one partition
+    # covering everything before the next month boundary.
+    now = datetime.now(timezone.utc)
+    first = now.year * 12 + now.month  # index of next month
+    boundary = _month(first).isoformat()
+
+    op.execute("ALTER TABLE system_logs RENAME TO system_logs_legacy")
+    op.execute("ALTER TABLE system_logs_legacy RENAME CONSTRAINT system_logs_pkey TO system_logs_legacy_pkey")
+    op.execute("ALTER INDEX ix_system_logs_id RENAME TO ix_system_logs_legacy_id")
+    op.execute("UPDATE system_logs_legacy SET timestamp = now() WHERE timestamp IS NULL")
+    # A validated CHECK lets SET NOT NULL and ATTACH skip their full-table scans
+    op.execute(
+        "ALTER TABLE system_logs_legacy ADD CONSTRAINT system_logs_legacy_range "
+        f"CHECK (timestamp IS NOT NULL AND timestamp < '{boundary}') NOT VALID"
+    )
+    op.execute("ALTER TABLE system_logs_legacy VALIDATE CONSTRAINT system_logs_legacy_range")
+    op.execute("ALTER TABLE system_logs_legacy ALTER COLUMN timestamp SET NOT NULL")
+
+    op.execute("""
+        CREATE TABLE system_logs (
+            id INTEGER NOT NULL DEFAULT nextval('system_logs_id_seq'),
+            timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            level VARCHAR,
+            service VARCHAR,
+            message VARCHAR,
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+    """)
+    op.execute("ALTER SEQUENCE system_logs_id_seq OWNED BY system_logs.id")
+    op.execute(
+        "ALTER TABLE system_logs ATTACH PARTITION system_logs_legacy "
+        f"FOR VALUES FROM (MINVALUE) TO ('{boundary}')"
+    )
+    for index in range(first, first + MONTHS_AHEAD):
+        start, end = _month(index), _month(index + 1)
+        op.execute(
+            f"CREATE TABLE system_logs_{start.year:04d}_{start.month:02d} PARTITION OF system_logs "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+    # Catches rows if the maintenance job ever falls behind on creating months
+    op.execute("CREATE TABLE system_logs_default PARTITION OF system_logs DEFAULT")
+
+    op.create_index(op.f('ix_system_logs_id'), 'system_logs', ['id'], unique=False)
+    op.create_index('ix_system_logs_timestamp_level', 'system_logs', ['timestamp', 'level'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Back to one plain table; every partition still attached is copied into it
+    op.execute("ALTER TABLE system_logs RENAME TO system_logs_partitioned")
+    op.execute("ALTER INDEX ix_system_logs_id RENAME TO ix_system_logs_partitioned_id")
+    op.create_table('system_logs',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('system_logs_id_seq')"), nullable=False),
+    sa.Column('timestamp', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('level', sa.String(), nullable=True),
+    sa.Column('service', sa.String(), nullable=True),
+    sa.Column('message', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute(
+        "INSERT INTO system_logs (id, timestamp, level, service, message) "
+        "SELECT id, timestamp, level, service, message FROM system_logs_partitioned"
+    )
+    op.execute("ALTER SEQUENCE system_logs_id_seq OWNED BY system_logs.id")
+    op.execute("DROP TABLE system_logs_partitioned CASCADE")
+    op.create_index(op.f('ix_system_logs_id'), 'system_logs', ['id'], unique=False)
@@ -0,0 +1,31 @@
+"""add_kyc_document_size_and_digest
+
+Revision ID: 4c8a1f6d2b90
+Revises: 2b6f8d3a17e9
+Create Date: 2026-10-17 15:00:17.530294
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4c8a1f6d2b90'
+down_revision: Union[str, None] = '2b6f8d3a17e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Nullable: existing documents were stored without being measured
+    op.add_column('kyc_documents', sa.Column('size_bytes', sa.BigInteger(), nullable=True))
+    op.add_column('kyc_documents', sa.Column('sha256', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('kyc_documents', 'sha256')
+    op.drop_column('kyc_documents', 'size_bytes')
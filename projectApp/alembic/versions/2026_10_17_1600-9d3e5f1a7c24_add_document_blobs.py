@@ -0,0 +1,39 @@
+"""add_document_blobs
+
+Revision ID: 9d3e5f1a7c24
+Revises: 4c8a1f6d2b90
+Create Date: 2026-10-17 16:00:08.664120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d3e5f1a7c24'
+down_revision: Union[str, None] = '4c8a1f6d2b90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing files are moved into the store with `python -m app.cli migrate-documents`
+    op.create_table('document_blobs',
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('size_bytes', sa.BigInteger(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('sha256')
+    )
+    op.create_index('ix_document_blobs_unreferenced', 'document_blobs', ['sha256'], unique=False,
+                    postgresql_where=sa.text('ref_count <= 0'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_document_blobs_unreferenced', table_name='document_blobs',
+                  postgresql_where=sa.text('ref_count <= 0'))
+    op.drop_table('document_blobs')
@@ -0,0 +1,135 @@
+"""add_ledger_journal_minor_units
+
+Revision ID: c6b2e8f4a013
+Revises: 9d3e5f1a7c24
+Create Date: 2026-10-17 17:00:33.290581
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6b2e8f4a013'
+down_revision: Union[str, None] = '9d3e5f1a7c24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+OPENING_BALANCE = 'Opening balance (ledger migration)'
+
+# Same rule as app.services.ledger.postings: the customer leg, then the settlement leg
+POSTINGS = """
+    SELECT id, account_id,
+           CASE WHEN transaction_type = 'withdrawal' THEN -amount_minor ELSE amount_minor END,
+           created_at
+    FROM {source} WHERE transaction_type IN ('deposit', 'withdrawal')
+    UNION ALL
+    SELECT id, NULL,
+           CASE WHEN transaction_type = 'withdrawal' THEN amount_minor ELSE -amount_minor END,
+           created_at
+    FROM {source} WHERE transaction_type IN ('deposit', 'withdrawal')
+"""
+
+
+def _to_minor(table: str, float_column: str, minor_column: str) -> None:
+    op.add_column(table, sa.Column(minor_column, sa.BigInteger(), nullable=True))
+    # Through numeric, so 19.99 becomes 1999 rather than 1998.9999...
+    op.execute(f"UPDATE {table} SET {minor_column} = ROUND(COALESCE({float_column}, 0)::numeric * 100)")
+    op.alter_column(table, minor_column, nullable=False)
+    op.drop_column(table, float_column)
+
+
+def _to_float(table: str, minor_column: str, float_column: str) -> None:
+    op.add_column(table, sa.Column(float_column, sa.Float(), nullable=True))
+    op.execute(f"UPDATE {table} SET {float_column} = {minor_column} / 100.0")
+    op.drop_column(table, minor_column)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _to_minor('accounts', 'balance', 'balance_minor')
+    _to_minor('transactions', 'amount', 'amount_minor')
+    _to_minor('daily_transaction_rollups', 'total_amount', 'total_minor')
+    op.execute("UPDATE transactions SET created_at = now() WHERE created_at IS NULL")
+
+    op.create_table('ledger_entries',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('transaction_id', sa.Integer(), nullable=False),
+    sa.Column('account_id', sa.Integer(), nullable=True),
+    sa.Column('amount_minor', sa.BigInteger(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['account_id'], ['accounts.id'], ),
+    sa.ForeignKeyConstraint(['transaction_id'], ['transactions.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    # Journal the existing history...
+    op.execute(
+        "INSERT INTO ledger_entries (transaction_id, account_id, amount_minor, created_at) "
+        + POSTINGS.format(source="transactions")
+    )
+    # ...and give every account whose stored balance is not explained by its
+    # history (initial deposits were never recorded) one opening-balance
+    # transaction dated just before its first one
+    op.execute(f"""
+        WITH drift AS (
+            SELECT a.id AS account_id,
+                   a.balance_minor - COALESCE(SUM(e.amount_minor), 0) AS diff,
+                   (SELECT MIN(t.created_at) FROM transactions t WHERE t.account_id = a.id) AS first_at
+            FROM accounts a
+            LEFT JOIN ledger_entries e ON e.account_id = a.id
+            GROUP BY a.id, a.balance_minor
+            HAVING a.balance_minor <> COALESCE(SUM(e.amount_minor), 0)
+        ), opened AS (
+            INSERT INTO transactions (account_id, transaction_type, amount_minor, description, created_at)
+            SELECT account_id,
+                   (CASE WHEN diff > 0 THEN 'deposit' ELSE 'withdrawal' END)::transactiontype,
+                   ABS(diff),
+                   '{OPENING_BALANCE}',
+                   COALESCE(first_at - interval '1 second', now())
+            FROM drift
+            RETURNING id, account_id, transaction_type, amount_minor, created_at
+        )
+        INSERT INTO ledger_entries (transaction_id, account_id, amount_minor, created_at)
+        {POSTINGS.format(source="opened")}
+    """)
+
+    op.create_index('ix_ledger_entries_transaction_id', 'ledger_entries', ['transaction_id'], unique=False)
+    op.create_index('ix_ledger_entries_account_created_id', 'ledger_entries',
+                    ['account_id', 'created_at', 'id'], unique=False)
+
+    # Append-only at the database level, whatever client writes to it
+    op.execute("""
+        CREATE FUNCTION ledger_entries_append_only() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            RAISE EXCEPTION 'ledger_entries is append-only';
+        END
+        $$
+    """)
+    op.execute(
+        "CREATE TRIGGER ledger_entries_no_change BEFORE UPDATE OR DELETE ON ledger_entries "
+        "FOR EACH ROW EXECUTE FUNCTION ledger_entries_append_only()"
+    )
+    op.execute(
+        "CREATE TRIGGER ledger_entries_no_truncate BEFORE TRUNCATE ON ledger_entries "
+        "FOR EACH STATEMENT EXECUTE FUNCTION ledger_entries_append_only()"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER ledger_entries_no_truncate ON ledger_entries")
+    op.execute("DROP TRIGGER ledger_entries_no_change ON ledger_entries")
+    op.execute("DROP FUNCTION ledger_entries_append_only()")
+    op.drop_index('ix_ledger_entries_account_created_id', table_name='ledger_entries')
+    op.drop_index('ix_ledger_entries_transaction_id', table_name='ledger_entries')
+    op.drop_table('ledger_entries')
+    # Balances keep their value; only the synthetic history goes
+    op.execute(f"DELETE FROM transactions WHERE description = '{OPENING_BALANCE}'")
+
+    _to_float('daily_transaction_rollups', 'total_minor', 'total_amount')
+    op.alter_column('daily_transaction_rollups', 'total_amount', nullable=False)
+    _to_float('transactions', 'amount_minor', 'amount')
+    _to_float('accounts', 'balance_minor', 'balance')
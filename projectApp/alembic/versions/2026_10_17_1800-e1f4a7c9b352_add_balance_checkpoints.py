@@ -0,0 +1,35 @@
+"""add_balance_checkpoints
+
+Revision ID: e1f4a7c9b352
+Revises: c6b2e8f4a013
+Create Date: 2026-10-17 18:00:12.604417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1f4a7c9b352'
+down_revision: Union[str, None] = 'c6b2e8f4a013'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Filled by the balance checkpointer (app/services/checkpoints.py); its
+    # first run backfills existing history, a batch of accounts at a time
+    op.create_table(
+        'balance_checkpoints',
+        sa.Column('account_id', sa.Integer(), nullable=False),
+        sa.Column('as_of', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('balance_minor', sa.BigInteger(), nullable=False),
+        sa.ForeignKeyConstraint(['account_id'], ['accounts.id'], ),
+        sa.PrimaryKeyConstraint('account_id', 'as_of'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('balance_checkpoints')
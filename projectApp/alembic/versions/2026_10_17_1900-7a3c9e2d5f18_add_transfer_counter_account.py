@@ -0,0 +1,39 @@
+"""add_transfer_counter_account
+
+Revision ID: 7a3c9e2d5f18
+Revises: e1f4a7c9b352
+Create Date: 2026-10-17 19:00:41.118036
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a3c9e2d5f18'
+down_revision: Union[str, None] = 'e1f4a7c9b352'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing 'transfer' rows keep a NULL counter account: they never moved
+    # money and post nothing to the ledger
+    op.add_column('transactions', sa.Column('counter_account_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'fk_transactions_counter_account_id_accounts', 'transactions', 'accounts',
+        ['counter_account_id'], ['id'],
+    )
+    op.create_index(
+        'ix_transactions_counter_created_id', 'transactions',
+        ['counter_account_id', 'created_at', 'id'],
+        postgresql_where=sa.text('counter_account_id IS NOT NULL'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_transactions_counter_created_id', table_name='transactions')
+    op.drop_constraint('fk_transactions_counter_account_id_accounts', 'transactions', type_='foreignkey')
+    op.drop_column('transactions', 'counter_account_id')
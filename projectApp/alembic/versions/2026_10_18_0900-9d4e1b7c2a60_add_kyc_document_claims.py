@@ -0,0 +1,27 @@
+"""add_kyc_document_claims
+
+Revision ID: 9d4e1b7c2a60
+Revises: 5b9d2f6e8a41
+Create Date: 2026-10-18 09:00:12.406511
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4e1b7c2a60'
+down_revision: Union[str, None] = '5b9d2f6e8a41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing pending documents start unclaimed, so the next requeue picks them up
+    op.add_column('kyc_documents', sa.Column('claimed_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('kyc_documents', 'claimed_at')
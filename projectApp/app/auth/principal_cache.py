@@ -0,0 +1,163 @@
+# app/auth/principal_cache.py
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import KycStatusEnum, User
+
+
+@dataclass(frozen=True)
+class Principal:
+    """The parts of a User that request handlers need after authentication"""
+    id: int
+    email: str
+    full_name: str
+    is_admin: bool
+    kyc_status: KycStatusEnum
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            full_name=user.full_name,
+            is_admin=bool(user.is_admin),
+            kyc_status=user.kyc_status,
+        )
+
+
+class PrincipalCache:
+    """Bounded LRU of verified tokens, each kept for ``ttl`` seconds or until the token's ``exp``.
+
+    Keys are SHA-256 digests of the raw token so bearer tokens are never held
+    in memory as dictionary keys. A reverse index by user id lets privilege or
+    KYC changes drop every cached token for that user.
+
+    That invalidation only reaches this process's cache. Other workers learn
+    of a revoked ``is_admin`` or a KYC change when their entry runs out, so
+    ``ttl`` bounds how long a revocation can lag there.
+    """
+
+    def __init__(self, max_entries: int = settings.PRINCIPAL_CACHE_SIZE, ttl: float = settings.PRINCIPAL_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, dict, Principal]]" = OrderedDict()
+        self._by_user: Dict[int, Set[str]] = {}
+        # Handlers run on the loop, KYC callbacks in the threadpool
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Bumped by every invalidation; a lookup that raced one is not cached
+        self.epoch = 0
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[Tuple[dict, Principal]]:
+        key = self.key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, claims, principal = entry
+            if expires_at <= time.time():
+                self._discard(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return claims, principal
+
+    def put(self, token: str, claims: dict, principal: Principal, epoch: Optional[int] = None) -> None:
+        """Cache a principal; pass the ``epoch`` read before loading the user."""
+        expires_at = claims.get("exp")
+        if self.max_entries <= 0 or self.ttl <= 0 or expires_at is None:
+            return
+        expires_at = min(float(expires_at), time.time() + self.ttl)
+        key = self.key(token)
+        with self._lock:
+            if epoch is not None and epoch != self.epoch:
+                return
+            self._discard(key)
+            self._entries[key] = (expires_at, claims, principal)
+            self._by_user.setdefault(principal.id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                self.evictions += 1
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            self.epoch += 1
+            keys = self._by_user.pop(user_id, set())
+            for key in keys:
+                self._entries.pop(key, None)
+            self.invalidations += len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.epoch += 1
+            self._entries.clear()
+            self._by_user.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            keys = self._by_user.get(entry[2].id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_user[entry[2].id]
+
+
+principal_cache = PrincipalCache()
+
+# Attributes whose change must force a fresh lookup on the next request
+_PRINCIPAL_ATTRS = ("is_admin", "kyc_status")
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_principals(session, _flush_context):
+    changed = session.info.setdefault("principal_changes", set())
+    for obj in session.dirty:
+        if isinstance(obj, User):
+            state = inspect(obj)
+            if any(state.attrs[name].history.has_changes() for name in _PRINCIPAL_ATTRS):
+                changed.add(obj.id)
+                # Drop now as well so nothing re-reads the old row mid-transaction
+                principal_cache.invalidate_user(obj.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_principals(session):
+    for user_id in session.info.pop("principal_changes", ()):
+        principal_cache.invalidate_user(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_principals(session):
+    session.info.pop("principal_changes", None)
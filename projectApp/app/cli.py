@@ -0,0 +1,198 @@
+# app/cli.py
+"""Maintenance commands. Run from projectApp/:
+
+    python -m app.cli backfill-rollups [--start 2024-01-01] [--end 2024-12-31] [--chunk-days 7]
+    python -m app.cli build-activity-sketches [--start 2024-01-01] [--end 2024-12-31]
+    python -m app.cli prune-logs [--retention-days 90] [--archive]
+    python -m app.cli migrate-documents [--batch-size 500]
+    python -m app.cli collect-documents [--limit 1000]
+    python -m app.cli verify-ledger [--repair]
+    python -m app.cli checkpoint-balances [--every 500] [--batch-accounts 1000]
+"""
+
+import argparse
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import func, select
+
+from app import database
+from app.config import settings
+from app.models import Transaction
+from app.services.activity import build_sketches
+from app.services.checkpoints import write_checkpoints
+from app.services.document_store import document_store, migrate_documents
+from app.services.ledger import rebuild_balances, verify_ledger
+from app.services.log_retention import run_log_maintenance
+from app.services.rollups import rebuild_rollups, utc_date
+
+
+async def _day_range(db, args, default_end: date):
+    """[start, end) from --start/--end (inclusive), defaulting to the oldest transaction"""
+    start = args.start
+    if start is None:
+        first = await db.scalar(select(func.min(utc_date(Transaction.created_at))))
+        if first is None:
+            return None
+        start = first if isinstance(first, date) else date.fromisoformat(first)
+    end = args.end + timedelta(days=1) if args.end else default_end
+    return start, end
+
+
+async def backfill_rollups(args) -> None:
+    async with database.AsyncSessionLocal() as db:
+        span = await _day_range(db, args, datetime.now(timezone.utc).date() + timedelta(days=1))
+        if span is None:
+            print("No transactions; nothing to backfill")
+            return
+        start, end = span
+
+        # One short transaction per chunk so live writers are never held up for long
+        total = 0
+        chunk_start = start
+        while chunk_start < end:
+            chunk_end = min(chunk_start + timedelta(days=args.chunk_days), end)
+            written = await rebuild_rollups(db, chunk_start, chunk_end)
+            await db.commit()
+            total += written
+            print(f"{chunk_start} .. {chunk_end - timedelta(days=1)}: {written} rollup rows")
+            chunk_start = chunk_end
+        print(f"Done: {total} rollup rows for {start} .. {end - timedelta(days=1)}")
+
+
+async def build_activity_sketches(args) -> None:
+    async with database.AsyncSessionLocal() as db:
+        # Only closed days are stored; today is always computed live
+        span = await _day_range(db, args, datetime.now(timezone.utc).date())
+        if span is None:
+            print("No transactions; nothing to build")
+            return
+        start, end = span
+        day = start
+        while day < end:
+            chunk_end = min(day + timedelta(days=args.chunk_days), end)
+            built = await build_sketches(db, day, chunk_end)
+            await db.commit()
+            print(f"{day} .. {chunk_end - timedelta(days=1)}: {len(built)} day sketches")
+            day = chunk_end
+
+
+async def prune_logs(args) -> None:
+    summary = await run_log_maintenance(
+        retention_days=args.retention_days,
+        months_ahead=args.months_ahead,
+        archive=args.archive,
+    )
+    for name in summary["created"]:
+        print(f"created partition {name}")
+    for name, action in summary["expired"]:
+        print(f"{action} partition {name}")
+    if not summary["partitioned"]:
+        print(f"deleted {summary['deleted_rows']} log rows")
+
+
+async def migrate_kyc_documents(args) -> None:
+    def report(summary):
+        print(f"{summary['migrated']} documents moved ({summary['deduplicated']} deduplicated), "
+              f"{summary['missing']} missing files")
+
+    summary = await migrate_documents(batch_size=args.batch_size, progress=report)
+    print(f"Done: {summary['migrated']} documents in the store, {summary['missing']} missing files left in place")
+
+
+async def collect_documents(args) -> None:
+    total = 0
+    while removed := await document_store.collect_garbage(limit=args.limit):
+        total += removed
+    print(f"removed {total} unreferenced blobs")
+
+
+async def check_ledger(args) -> None:
+    async with database.AsyncSessionLocal() as db:
+        report = await verify_ledger(db)
+        for transaction_id in report["unbalanced"]:
+            print(f"transaction {transaction_id}: postings do not sum to zero")
+        for account_id, cached, journal in report["drifted"]:
+            print(f"account {account_id}: cached balance {cached} != journal {journal} (minor units)")
+        if args.repair and report["drifted"]:
+            corrected = await rebuild_balances(db)
+            await db.commit()
+            print(f"rebuilt {corrected} cached balances from the journal")
+        elif not report["unbalanced"] and not report["drifted"]:
+            print("ledger OK")
+
+
+async def checkpoint_balances(args) -> None:
+    written = await write_checkpoints(every=args.every, batch_accounts=args.batch_accounts)
+    print(f"Done: {written} balance checkpoints written")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="BankFin maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    backfill = commands.add_parser(
+        "backfill-rollups",
+        help="Rebuild daily_transaction_rollups from the transactions table",
+    )
+    backfill.add_argument("--start", type=date.fromisoformat, help="first day (default: oldest transaction)")
+    backfill.add_argument("--end", type=date.fromisoformat, help="last day, inclusive (default: today)")
+    backfill.add_argument("--chunk-days", type=int, default=7, help="days rebuilt per transaction")
+    backfill.set_defaults(handler=backfill_rollups)
+
+    sketches = commands.add_parser(
+        "build-activity-sketches",
+        help="Rebuild the per-day active-user sketches (e.g. after backdated transactions)",
+    )
+    sketches.add_argument("--start", type=date.fromisoformat, help="first day (default: oldest transaction)")
+    sketches.add_argument("--end", type=date.fromisoformat, help="last day, inclusive (default: yesterday)")
+    sketches.add_argument("--chunk-days", type=int, default=7, help="days rebuilt per transaction")
+    sketches.set_defaults(handler=build_activity_sketches)
+
+    prune = commands.add_parser(
+        "prune-logs",
+        help="Create upcoming system_logs partitions and drop (or detach) expired ones",
+    )
+    prune.add_argument("--retention-days", type=int, default=settings.LOG_RETENTION_DAYS)
+    prune.add_argument("--months-ahead", type=int, default=settings.LOG_PARTITION_MONTHS_AHEAD)
+    prune.add_argument("--archive", action="store_true", default=settings.LOG_ARCHIVE_EXPIRED,
+                       help="detach expired partitions and keep them as tables instead of dropping")
+    prune.set_defaults(handler=prune_logs)
+
+    migrate = commands.add_parser(
+        "migrate-documents",
+        help="Move KYC documents from the flat upload directory into the content-addressed store",
+    )
+    migrate.add_argument("--batch-size", type=int, default=500, help="documents moved per transaction")
+    migrate.set_defaults(handler=migrate_kyc_documents)
+
+    collect = commands.add_parser(
+        "collect-documents",
+        help="Delete stored document files that no KYC document references any more",
+    )
+    collect.add_argument("--limit", type=int, default=1000, help="blobs removed per transaction")
+    collect.set_defaults(handler=collect_documents)
+
+    ledger = commands.add_parser(
+        "verify-ledger",
+        help="Check that postings balance and cached account balances match the journal",
+    )
+    ledger.add_argument("--repair", action="store_true",
+                        help="recompute drifted account balances from the journal")
+    ledger.set_defaults(handler=check_ledger)
+
+    checkpoint = commands.add_parser(
+        "checkpoint-balances",
+        help="Write the balance checkpoints due, e.g. to backfill history before first deploy",
+    )
+    checkpoint.add_argument("--every", type=int, default=settings.BALANCE_CHECKPOINT_EVERY,
+                            help="postings of one account between checkpoints")
+    checkpoint.add_argument("--batch-accounts", type=int, default=settings.BALANCE_CHECKPOINT_BATCH_ACCOUNTS)
+    checkpoint.set_defaults(handler=checkpoint_balances)
+
+    args = parser.parse_args(argv)
+    asyncio.run(args.handler(args))
+
+
+if __name__ == "__main__":
+    main()
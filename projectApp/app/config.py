@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from pydantic import PostgresDsn, HttpUrl
+from typing import List, Optional
 import os
 
 class Settings(BaseSettings):
@@ -15,6 +16,119 @@ class Settings(BaseSettings):
     DEFAULT_ADMIN_PASSWORD: str = "admin123"  # Change this in production!
     UPLOAD_DIR: str = "uploads"
     UPLOAD_DIR: str = os.path.join(os.getcwd(), "uploads")  # Default to ./uploads directory
+    UPLOAD_MAX_BYTES: int = 25 * 1024 * 1024  # larger KYC documents are rejected with 413
+    UPLOAD_CHUNK_SIZE: int = 64 * 1024  # bytes read and written per step (see app/services/uploads.py)
+    UPLOAD_FORM_OVERHEAD: int = 64 * 1024  # form fields and multipart framing allowed on top of UPLOAD_MAX_BYTES
+    # Content-addressed KYC document layout under UPLOAD_DIR (see app/services/document_store.py)
+    DOCUMENT_STORE_SHARD_DEPTH: int = 2  # nested prefix directories
+    DOCUMENT_STORE_SHARD_WIDTH: int = 2  # hex characters per level: 256 entries per directory
+
+    # Database connection pools, one per engine (see app/database.py and app/pool_metrics.py)
+    DB_POOL_SIZE: int = 5  # connections kept open
+    DB_MAX_OVERFLOW: int = 10  # extra connections opened under load and closed when returned
+    DB_POOL_TIMEOUT: float = 30.0  # seconds a checkout waits for a free connection before failing
+    DB_POOL_RECYCLE: int = 1800  # seconds before a connection is replaced; -1 keeps them forever
+    DB_POOL_PRE_PING: bool = True  # test connections on checkout so a database restart is not a 500
+    DB_POOL_SLOW_HOLD: float = 1.0  # seconds; longer checkouts are counted and logged
+    DB_POOL_WAIT_SAMPLES: int = 1024  # recent checkout waits kept for percentiles
+
+    # Optional read replica for read-only endpoints (see app/replica.py)
+    DATABASE_REPLICA_URL: Optional[str] = None  # same form as DATABASE_URL; unset sends every read to the primary
+    REPLICA_MAX_LAG: float = 5.0  # seconds behind the primary before reads fall back to it
+    REPLICA_STICKY_SECONDS: float = 10.0  # a client's reads stay on the primary this long after its write
+    REPLICA_STICKY_CLIENTS: int = 10000  # recent writers remembered in memory
+    REPLICA_CHECK_INTERVAL: float = 2.0  # seconds between replica health and lag probes
+
+    # Request metrics served at GET /metrics (see app/metrics.py)
+    METRICS_DIR: Optional[str] = None  # shared by all workers so a scrape sees them all; empty it on deploy. Unset: per process
+    METRICS_BUCKETS: List[float] = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]  # latency, seconds
+
+    # Per-request SQL profiling (see app/sql_profiler.py); also switchable at /api/admin/sql-profile
+    SQL_PROFILE: bool = False  # time every statement and attribute it to its request
+    SQL_PROFILE_SERVER_TIMING: bool = False  # send the totals to clients in a Server-Timing header
+    SQL_PROFILE_SLOW_REQUEST: float = 0.5  # seconds; slower profiled requests are logged
+    SQL_PROFILE_LOG_SAMPLE: float = 1.0  # fraction of slow or N+1 requests that are logged
+    SQL_PROFILE_REPEAT_THRESHOLD: int = 5  # runs of one statement shape in a request that flag a likely N+1
+
+    # Request log pipeline (see app/services/log_writer.py)
+    LOG_QUEUE_MAX_SIZE: int = 10000
+    LOG_BATCH_SIZE: int = 500
+    LOG_FLUSH_INTERVAL: float = 1.0  # seconds
+    LOG_SAMPLE_HIGH_WATER: float = 0.8  # queue fill ratio where INFO sampling starts
+    LOG_SAMPLE_RATE: int = 10  # keep 1 in N INFO records above the high-water mark
+
+    # System log store: paging, partitions and retention (see app/services/log_retention.py)
+    LOGS_PAGE_SIZE: int = 100
+    LOGS_MAX_PAGE_SIZE: int = 1000
+    LOG_RETENTION_DAYS: int = 90  # 0 keeps everything
+    LOG_PARTITION_MONTHS_AHEAD: int = 2
+    LOG_ARCHIVE_EXPIRED: bool = False  # detach expired partitions instead of dropping them
+    LOG_MAINTENANCE_INTERVAL: float = 3600.0  # seconds
+
+    # KYC provider calls (see app/services/kyc_dispatcher.py)
+    KYC_CONCURRENCY: int = 16  # calls in flight; also the size of the shared connection pool
+    KYC_TIMEOUT: float = 10.0  # seconds per provider call
+    KYC_MAX_ATTEMPTS: int = 5  # calls per document before it is left pending
+    KYC_BACKOFF_BASE: float = 0.5  # seconds; doubles with every retry, with full jitter
+    KYC_BACKOFF_MAX: float = 30.0
+    KYC_QUEUE_MAX_SIZE: int = 10000
+    KYC_WRITE_BATCH_SIZE: int = 200  # verdicts per bulk status UPDATE
+    KYC_WRITE_FLUSH_INTERVAL: float = 0.5  # seconds
+    KYC_DRAIN_TIMEOUT: float = 10.0  # seconds shutdown waits for queued documents
+    KYC_REQUEUE_PENDING: bool = True  # queue still-pending documents again on startup
+    KYC_REQUEUE_PAGE_SIZE: int = 500  # pending documents claimed per query; half the queue stays free for registrations
+    KYC_CLAIM_TIMEOUT: float = 900.0  # seconds before a document claimed by a vanished worker can be claimed again
+
+    # Password hashing (see app/auth/passwords.py)
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_EXECUTOR: str = "thread"  # thread | process | inline
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64  # running + queued jobs before callers get a 503
+
+    # Authenticated principal cache (see app/auth/principal_cache.py); 0 disables it
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    # Seconds an entry may live (capped by the token's exp): how long another
+    # worker can keep honouring a revoked is_admin or KYC status
+    PRINCIPAL_CACHE_TTL: float = 5.0
+
+    # POST /transactions/batch
+    TRANSACTION_BATCH_MAX_ITEMS: int = 5000
+
+    # POST /transactions/transfer (see app/services/transfers.py)
+    TRANSFER_MAX_ATTEMPTS: int = 5  # runs of the whole transaction on serialization failures/deadlocks
+    TRANSFER_BACKOFF_BASE: float = 0.005  # seconds; doubles with every retry, with full jitter
+    TRANSFER_BACKOFF_MAX: float = 0.2
+
+    # Idempotency-Key on money-moving POSTs (see app/services/idempotency.py)
+    IDEMPOTENCY_TTL: float = 86400.0  # seconds a stored response is replayed
+    IDEMPOTENCY_CACHE_SIZE: int = 10000  # responses also kept in memory; 0 disables the cache
+    IDEMPOTENCY_PURGE_INTERVAL: float = 3600.0  # seconds between deletes of expired keys
+
+    # GET /transactions/{account_id} keyset pagination
+    TRANSACTIONS_PAGE_SIZE: int = 50
+    TRANSACTIONS_MAX_PAGE_SIZE: int = 500
+
+    # GET /transactions/{account_id}/export (see app/services/exports.py)
+    EXPORT_CHUNK_ROWS: int = 1000  # rows fetched per server-side cursor round trip
+
+    # Point-in-time balances (see app/services/checkpoints.py)
+    BALANCE_CHECKPOINT_EVERY: int = 500  # postings of one account between checkpoints
+    BALANCE_CHECKPOINT_SETTLE: float = 300.0  # seconds an entry must age before a checkpoint covers it
+    BALANCE_CHECKPOINT_INTERVAL: float = 300.0  # seconds between checkpoint runs
+    BALANCE_CHECKPOINT_BATCH_ACCOUNTS: int = 1000  # accounts per checkpoint transaction
+
+    # Admin dashboard counters (see app/services/stats.py)
+    STATS_CACHE_TTL: float = 5.0  # seconds a snapshot is served without touching the database
+    STATS_FLUSH_INTERVAL: float = 2.0  # seconds between writes of buffered counter deltas
+    STATS_RECONCILE_INTERVAL: float = 600.0  # seconds between full recounts that repair drift
+
+    # Admin active-user analytics (see app/services/activity.py)
+    ACTIVITY_EXACT_MAX_DAYS: int = 31  # longer ranges merge per-day HyperLogLog sketches
+
+    # Admin user search (see app/services/user_search.py)
+    USER_SEARCH_PAGE_SIZE: int = 20
+    USER_SEARCH_MAX_PAGE_SIZE: int = 100
+    USER_SEARCH_INDEX_MAX_AGE: float = 300.0  # seconds before the in-process index is rebuilt
 
     class Config:
         env_file = ".env"
@@ -1,19 +1,75 @@
 # app/database.py
 
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from app.config import settings
+from app.pool_metrics import PoolMetrics
+from app.sql_profiler import sql_profiler
 
 # Pull the DATABASE_URL from .env via Pydantic BaseSettings
 DATABASE_URL = str(settings.DATABASE_URL)
 
-# Create the SQLAlchemy engine
+def to_async_url(url: str) -> str:
+    """Map a sync database URL onto the matching asyncio driver"""
+    scheme, sep, rest = url.partition("://")
+    backend = scheme.split("+", 1)[0]
+    if backend in ("postgresql", "postgres"):
+        return f"postgresql+asyncpg{sep}{rest}"
+    if backend == "sqlite":
+        return f"sqlite+aiosqlite{sep}{rest}"
+    return url
+
+ASYNC_DATABASE_URL = to_async_url(DATABASE_URL)
+
+def pool_options() -> dict:
+    """Pool sizing from settings, the same for every engine"""
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+# Checkouts, waits, overflow and hold times; served at GET /api/admin/db-pool
+sync_pool_metrics = PoolMetrics("sync")
+async_pool_metrics = PoolMetrics("async")
+
+# Create the SQLAlchemy engine (startup checks, migrations and scripts)
 engine = create_engine(
     DATABASE_URL,
+    poolclass=sync_pool_metrics.pool_class(QueuePool),
+    **pool_options(),
     # SQLite needs this extra arg; other DBs ignore it
     connect_args={"check_same_thread": False}
                  if DATABASE_URL.startswith("sqlite") else {}
 )
+sync_pool_metrics.attach(engine)
+sql_profiler.watch(engine)
+
+# Create the asyncio engine used by request handlers
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    poolclass=async_pool_metrics.pool_class(AsyncAdaptedQueuePool),
+    **pool_options(),
+)
+async_pool_metrics.attach(async_engine.sync_engine)
+sql_profiler.watch(async_engine.sync_engine)
+
+# Optional read replica; read-only handlers reach it through app.replica.get_read_db
+replica_pool_metrics = PoolMetrics("replica")
+replica_async_engine = None
+ReplicaSessionLocal = None
+if settings.DATABASE_REPLICA_URL:
+    replica_async_engine = create_async_engine(
+        to_async_url(settings.DATABASE_REPLICA_URL),
+        poolclass=replica_pool_metrics.pool_class(AsyncAdaptedQueuePool),
+        **pool_options(),
+    )
+    replica_pool_metrics.attach(replica_async_engine.sync_engine)
+    sql_profiler.watch(replica_async_engine.sync_engine)
 
 # Create a session factory bound to this engine
 SessionLocal = sessionmaker(
@@ -22,6 +78,19 @@ SessionLocal = sessionmaker(
     bind=engine
 )
 
+# Objects stay usable after commit; lazy loads are not possible on AsyncSession
+AsyncSessionLocal = async_sessionmaker(
+    autoflush=False,
+    expire_on_commit=False,
+    bind=async_engine
+)
+if replica_async_engine is not None:
+    ReplicaSessionLocal = async_sessionmaker(
+        autoflush=False,
+        expire_on_commit=False,
+        bind=replica_async_engine
+    )
+
 # Base class for ORM models
 Base = declarative_base()
 
@@ -32,3 +101,13 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Async dependency used by the routers; never blocks the event loop on I/O
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# For work that outlives the request (streamed responses, background tasks):
+# yield-dependencies are closed before a StreamingResponse body is sent
+def get_async_session_factory():
+    return AsyncSessionLocal
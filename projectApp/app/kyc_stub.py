@@ -0,0 +1,66 @@
+# app/kyc_stub.py
+"""Stand-in for the KYC provider, for tests, benchmarks and local runs:
+
+    KYC_STUB_LATENCY=0.05 uvicorn app.kyc_stub:app --port 9100
+    # then KYC_API_URL=http://127.0.0.1:9100/api
+
+Accepts the dispatcher's POST on any path and answers
+``{"status": "verified" | "failed", "verified_at": ...}``. Documents whose URL
+contains "reject" fail verification. ``flaky_attempts`` makes every document
+get that many 503s before a real answer, and ``failure_rate`` adds random
+503s, so retry handling can be exercised. ``GET /_stats`` reports calls and
+distinct client connections.
+"""
+
+import asyncio
+import os
+import random
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def create_stub(
+    latency: float = 0.0,
+    failure_rate: float = 0.0,
+    flaky_attempts: int = 0,
+    seed: Optional[int] = None,
+) -> FastAPI:
+    stub = FastAPI(title="KYC provider stub")
+    rng = random.Random(seed)
+    # Calls per document URL, and distinct client connections seen
+    stub.state.calls = Counter()
+    stub.state.connections = set()
+
+    @stub.get("/_stats")
+    async def stats():
+        return {"calls": sum(stub.state.calls.values()), "connections": len(stub.state.connections)}
+
+    @stub.post("/{path:path}")
+    async def verify(path: str, request: Request):
+        if not request.headers.get("authorization", "").startswith("Bearer "):
+            return JSONResponse({"detail": "missing API key"}, status_code=401)
+        body = await request.json()
+        url = body.get("document_url", "")
+        stub.state.calls[url] += 1
+        if request.client is not None:
+            stub.state.connections.add((request.client.host, request.client.port))
+        if latency:
+            await asyncio.sleep(latency)
+        if stub.state.calls[url] <= flaky_attempts or rng.random() < failure_rate:
+            return JSONResponse({"detail": "try again"}, status_code=503)
+        return {
+            "status": "failed" if "reject" in url else "verified",
+            "verified_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+    return stub
+
+
+app = create_stub(
+    latency=float(os.getenv("KYC_STUB_LATENCY", "0")),
+    failure_rate=float(os.getenv("KYC_STUB_FAILURE_RATE", "0")),
+)
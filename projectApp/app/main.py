@@ -4,9 +4,20 @@ import time
 import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.exc import OperationalError
-from app.database import engine, Base, get_db
-from app.models import SystemLog  # Add this import
+from app.database import engine, Base
+from app.metrics import MetricsMiddleware, metrics_registry
+from app.sql_profiler import SqlProfilingMiddleware, sql_profiler
+from app.services.uploads import UploadLimitMiddleware
+from app.replica import replica_router
+from app.services.checkpoints import balance_checkpointer
+from app.services.idempotency import idempotency_store
+from app.services.kyc_dispatcher import kyc_dispatcher
+from app.services.log_retention import log_maintenance
+from app.services.log_writer import system_log_writer
+from app.services.stats import stats_service
+from app.auth.passwords import password_pool
 from app.routes.auth import router as auth_router
 from app.routes.accounts import router as accounts_router
 from app.routes.deposit import router as deposit_router
@@ -42,30 +53,29 @@ async def log_requests(request, call_next):
     
     # Skip logging for certain paths (e.g. health checks)
     if not path.startswith(("/health", "/static", "/favicon.ico")):
-        db = next(get_db())
-        log = SystemLog(
-            level="INFO",
-            service="api",
-            message=f"{method} {path}"
-        )
-        db.add(log)
-        db.commit()
+        system_log_writer.submit("INFO", "api", f"{method} {path}")
     
     response = await call_next(request)
+
+    # Read-your-writes: this client's next reads skip the replica for a while
+    replica_router.after_request(request, response)
     
     # Log errors
     if response.status_code >= 400:
-        db = next(get_db())
-        log = SystemLog(
-            level="ERROR",
-            service="api",
-            message=f"Error {response.status_code} on {method} {path}"
-        )
-        db.add(log)
-        db.commit()
+        system_log_writer.submit("ERROR", "api", f"Error {response.status_code} on {method} {path}")
     
     return response
 
+# Oversized KYC uploads are refused while they arrive, before multipart parsing spools them
+app.add_middleware(UploadLimitMiddleware, paths=["/auth/register"])
+
+# Query count and SQL time per request; passes straight through while profiling is off
+app.add_middleware(SqlProfilingMiddleware)
+sql_profiler.sink = system_log_writer.submit
+
+# Outermost, so request timings include every other middleware
+app.add_middleware(MetricsMiddleware)
+
 # Event: On startup, wait for DB & create tables
 @app.on_event("startup")
 def on_startup():
@@ -91,6 +101,67 @@ def on_startup():
         time.sleep(5)
         Base.metadata.create_all(bind=engine)
 
+@app.on_event("startup")
+async def start_log_writer():
+    await system_log_writer.start()
+
+@app.on_event("startup")
+async def start_log_maintenance():
+    await log_maintenance.start()
+
+@app.on_event("startup")
+async def start_stats_service():
+    await stats_service.start()
+
+@app.on_event("startup")
+async def start_kyc_dispatcher():
+    await kyc_dispatcher.start()
+
+@app.on_event("startup")
+async def start_balance_checkpointer():
+    await balance_checkpointer.start()
+
+@app.on_event("startup")
+async def start_idempotency_store():
+    await idempotency_store.start()
+
+@app.on_event("startup")
+async def start_replica_router():
+    await replica_router.start()
+
+@app.on_event("shutdown")
+async def stop_replica_router():
+    await replica_router.stop()
+
+@app.on_event("shutdown")
+async def stop_idempotency_store():
+    await idempotency_store.stop()
+
+@app.on_event("shutdown")
+async def stop_balance_checkpointer():
+    await balance_checkpointer.stop()
+
+@app.on_event("shutdown")
+async def stop_kyc_dispatcher():
+    await kyc_dispatcher.stop()
+
+@app.on_event("shutdown")
+async def stop_stats_service():
+    await stats_service.stop()
+
+@app.on_event("shutdown")
+async def stop_log_maintenance():
+    await log_maintenance.stop()
+
+@app.on_event("shutdown")
+async def stop_log_writer():
+    # Flush whatever the middleware queued before the worker exits
+    await system_log_writer.stop()
+
+@app.on_event("shutdown")
+def stop_password_pool():
+    password_pool.shutdown()
+
 # Mount routers
 app.include_router(auth_router)
 app.include_router(accounts_router)
@@ -102,6 +173,11 @@ app.include_router(admin_router)
 @app.get("/", tags=["health"])
 async def health_check():
     return {"status": "OK"}
+
+# Prometheus scrape target: request metrics of every worker sharing METRICS_DIR
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 import os
@@ -0,0 +1,319 @@
+# app/metrics.py
+
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+from bisect import bisect_left
+from typing import Dict, Optional, Sequence, Tuple
+
+from app.config import settings
+
+DURATION = "http_request_duration_seconds"
+IN_PROGRESS = "http_requests_in_progress"
+REQUEST_BYTES = "http_request_size_bytes_total"
+RESPONSE_BYTES = "http_response_size_bytes_total"
+
+FAMILIES = {
+    DURATION: ("histogram", "Request latency by route and status"),
+    IN_PROGRESS: ("gauge", "Requests being handled right now"),
+    REQUEST_BYTES: ("counter", "Request body bytes received"),
+    RESPONSE_BYTES: ("counter", "Response body bytes sent"),
+}
+
+# Label for requests no route matched, so random 404 paths do not each become a series
+UNMATCHED = "<unmatched>"
+
+_HEADER = struct.Struct("i")
+_LENGTH = struct.Struct("i")
+_VALUE = struct.Struct("d")
+
+
+def _padded(length: int) -> int:
+    return (length + 7) & ~7
+
+
+class ProcessValues:
+    """Float slots of one process in a memory-mapped file under ``directory``.
+
+    Only the owning process writes its file, so updates take no lock: a slot
+    is an aligned 8-byte double, written in place. An entry is the key's
+    length, the key, then the value. The header holds the bytes in use and
+    is bumped only once a new entry is complete, so readers in other
+    processes never see half an entry.
+    """
+
+    def __init__(self, directory: str, pid: Optional[int] = None, initial_size: int = 1 << 16):
+        self.pid = pid or os.getpid()
+        self.path = os.path.join(directory, f"metrics-{self.pid}.db")
+        self._file = open(self.path, "a+b")
+        if os.fstat(self._file.fileno()).st_size == 0:
+            self._file.truncate(initial_size)
+        self.mm = mmap.mmap(self._file.fileno(), 0)
+        self._used = _HEADER.unpack_from(self.mm, 0)[0] or 8
+        self.offsets: Dict[str, int] = {}
+        self.values: Dict[int, float] = {}
+        for key, offset, value in _entries(self.mm):
+            self.offsets[key] = offset
+            self.values[offset] = value
+
+    def slot(self, key: str) -> int:
+        """Offset of ``key``'s value, appending the entry on first use"""
+        offset = self.offsets.get(key)
+        if offset is not None:
+            return offset
+        encoded = key.encode()
+        end = self._used + _padded(_LENGTH.size + len(encoded)) + _VALUE.size
+        if end > len(self.mm):
+            size = len(self.mm)
+            while size < end:
+                size *= 2
+            self._file.truncate(size)
+            self.mm.close()
+            self.mm = mmap.mmap(self._file.fileno(), 0)
+        _LENGTH.pack_into(self.mm, self._used, len(encoded))
+        self.mm[self._used + _LENGTH.size:self._used + _LENGTH.size + len(encoded)] = encoded
+        offset = end - _VALUE.size
+        _VALUE.pack_into(self.mm, offset, 0.0)
+        self._used = end
+        _HEADER.pack_into(self.mm, 0, end)
+        self.offsets[key] = offset
+        self.values[offset] = 0.0
+        return offset
+
+    def add(self, offset: int, amount: float) -> None:
+        value = self.values[offset] + amount
+        self.values[offset] = value
+        _VALUE.pack_into(self.mm, offset, value)
+
+    def close(self) -> None:
+        self.mm.close()
+        self._file.close()
+
+
+def _entries(buffer):
+    used = _HEADER.unpack_from(buffer, 0)[0]
+    position = 8
+    while position < used:
+        length = _LENGTH.unpack_from(buffer, position)[0]
+        key = bytes(buffer[position + _LENGTH.size:position + _LENGTH.size + length]).decode()
+        offset = position + _padded(length + _LENGTH.size)
+        yield key, offset, _VALUE.unpack_from(buffer, offset)[0]
+        position = offset + _VALUE.size
+
+
+def _key(family: str, labels: Tuple[Tuple[str, str], ...], suffix: str = "", le: Optional[str] = None) -> str:
+    return json.dumps([family, suffix, labels, le])
+
+
+class _Series:
+    """Slots of one (method, route, status): one per bucket, then sum, count and sizes"""
+
+    __slots__ = ("offsets",)
+
+    def __init__(self, values: ProcessValues, labels, bounds: Sequence[str]):
+        self.offsets = [values.slot(_key(DURATION, labels, "_bucket", le)) for le in bounds] + [
+            values.slot(_key(DURATION, labels, "_sum")),
+            values.slot(_key(DURATION, labels, "_count")),
+            values.slot(_key(REQUEST_BYTES, labels)),
+            values.slot(_key(RESPONSE_BYTES, labels)),
+        ]
+
+
+class MetricsRegistry:
+    """Request metrics of every worker that shares ``directory``.
+
+    Each process keeps its numbers in its own file there (``ProcessValues``).
+    ``render`` sums all the files, so any worker can answer a scrape for the
+    whole server. Counters of exited workers stay in the total, which keeps
+    them monotonic across worker restarts. In-progress gauges only count
+    live processes. Histogram buckets are stored per bucket and made
+    cumulative when rendered, so an observation writes one bucket, not all
+    of those above it.
+    """
+
+    def __init__(self, directory: Optional[str] = None, buckets: Sequence[float] = settings.METRICS_BUCKETS):
+        self._directory = directory
+        self.buckets = sorted(buckets)
+        self._bounds = [repr(float(bound)) for bound in self.buckets] + ["+Inf"]
+        self._values: Optional[ProcessValues] = None
+        self._series: Dict[Tuple[str, str, int], _Series] = {}
+        self._in_progress: Dict[str, int] = {}
+
+    @property
+    def directory(self) -> str:
+        if self._directory is None:
+            self._directory = settings.METRICS_DIR or tempfile.mkdtemp(prefix="bankfin-metrics-")
+        os.makedirs(self._directory, exist_ok=True)
+        return self._directory
+
+    def _process_values(self) -> ProcessValues:
+        values = self._values
+        if values is None or values.pid != os.getpid():
+            # First use, or this is a forked worker: start its own file
+            values = self._values = ProcessValues(self.directory)
+            self._series.clear()
+            self._in_progress.clear()
+        return values
+
+    def track_in_progress(self, method: str, delta: int) -> None:
+        values = self._process_values()
+        offset = self._in_progress.get(method)
+        if offset is None:
+            offset = self._in_progress[method] = values.slot(_key(IN_PROGRESS, (("method", method),)))
+        values.add(offset, delta)
+
+    def observe(self, method: str, route: str, status: int, seconds: float,
+                request_bytes: int, response_bytes: int) -> None:
+        values = self._process_values()
+        series = self._series.get((method, route, status))
+        if series is None:
+            labels = (("method", method), ("route", route), ("status", str(status)))
+            series = self._series[(method, route, status)] = _Series(values, labels, self._bounds)
+        offsets = series.offsets
+        values.add(offsets[bisect_left(self.buckets, seconds)], 1)
+        values.add(offsets[-4], seconds)
+        values.add(offsets[-3], 1)
+        if request_bytes:
+            values.add(offsets[-2], request_bytes)
+        if response_bytes:
+            values.add(offsets[-1], response_bytes)
+
+    def collect(self) -> Dict[str, float]:
+        """Every sample key summed over the processes sharing the directory"""
+        totals: Dict[str, float] = {}
+        directory = self.directory
+        for name in os.listdir(directory):
+            if not (name.startswith("metrics-") and name.endswith(".db")):
+                continue
+            pid = int(name[len("metrics-"):-len(".db")])
+            live = _alive(pid)
+            try:
+                with open(os.path.join(directory, name), "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                continue
+            if len(data) < 8:
+                continue
+            for key, _, value in _entries(data):
+                if not live and key.startswith(f'["{IN_PROGRESS}"'):
+                    continue
+                totals[key] = totals.get(key, 0.0) + value
+        return totals
+
+    def render(self) -> str:
+        """Prometheus text exposition format, version 0.0.4"""
+        samples: Dict[str, list] = {family: [] for family in FAMILIES}
+        for key, value in self.collect().items():
+            family, suffix, labels, le = json.loads(key)
+            samples[family].append((suffix, tuple(map(tuple, labels)), le, value))
+
+        lines = []
+        for family, (kind, help_text) in FAMILIES.items():
+            lines.append(f"# HELP {family} {help_text}")
+            lines.append(f"# TYPE {family} {kind}")
+            if kind == "histogram":
+                lines.extend(self._histogram_lines(family, samples[family]))
+            else:
+                for _, labels, _, value in sorted(samples[family]):
+                    lines.append(f"{family}{_labels(labels)} {float(value)!r}")
+        return "\n".join(lines) + "\n"
+
+    def _histogram_lines(self, family: str, samples: list):
+        series: Dict[Tuple, Dict[str, dict]] = {}
+        for suffix, labels, le, value in samples:
+            series.setdefault(labels, {}).setdefault(suffix, {})[le] = value
+        for labels in sorted(series):
+            parts = series[labels]
+            buckets = parts.get("_bucket", {})
+            cumulative = 0.0
+            for le in self._bounds:
+                cumulative += buckets.get(le, 0.0)
+                yield f"{family}_bucket{_labels(labels + (('le', le),))} {cumulative!r}"
+            yield f"{family}_sum{_labels(labels)} {float(parts.get('_sum', {}).get(None, 0.0))!r}"
+            yield f"{family}_count{_labels(labels)} {float(parts.get('_count', {}).get(None, 0.0))!r}"
+
+
+def _alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels) -> str:
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+metrics_registry = MetricsRegistry()
+
+
+class MetricsMiddleware:
+    """ASGI middleware that times every HTTP request into ``registry``.
+
+    Plain ASGI rather than ``@app.middleware("http")``: it only wraps
+    ``receive`` and ``send``, so it counts request and response body bytes
+    as they stream and adds a few microseconds per request (see
+    ``benchmarks/metrics_overhead.py``). Requests are labelled with the
+    route template (``/accounts/{account_id}``), not the raw path.
+    """
+
+    def __init__(self, app, registry: Optional[MetricsRegistry] = None):
+        self.app = app
+        self.registry = registry or metrics_registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        registry = self.registry
+        method = scope["method"]
+        started = time.perf_counter()
+        status = 500
+        request_bytes = 0
+        response_bytes = 0
+
+        async def counting_receive():
+            nonlocal request_bytes
+            message = await receive()
+            if message["type"] == "http.request":
+                request_bytes += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal status, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        registry.track_in_progress(method, 1)
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            registry.track_in_progress(method, -1)
+            registry.observe(method, route_label(scope), status, time.perf_counter() - started,
+                             request_bytes, response_bytes)
+
+
+def route_label(scope) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if "endpoint" in scope:
+        # A mounted app (static files): label it with its mount point
+        return scope.get("root_path") or "/"
+    return UNMATCHED
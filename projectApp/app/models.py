@@ -1,8 +1,10 @@
 # app/models.py
 
-from sqlalchemy import Column, Integer, String, Float, Boolean, Enum as SQLAlchemyEnum, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, Text, Boolean, Enum as SQLAlchemyEnum, Date, DateTime, ForeignKey, Index, LargeBinary
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.sql import func
 from app.database import Base
+from app.money import MINOR_PER_MAJOR, to_major, to_minor
 import enum
 
 class Account(Base):
@@ -10,7 +12,21 @@ class Account(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     owner = Column(String, index=True)
-    balance = Column(Float, default=0.0)
+    # Cached projection of the account's ledger postings, in minor units; it is
+    # moved in the same statement that journals a transaction (app/services/balances.py)
+    balance_minor = Column(BigInteger, nullable=False, default=0)
+
+    @hybrid_property
+    def balance(self):
+        return to_major(self.balance_minor or 0)
+
+    @balance.setter
+    def balance(self, value):
+        self.balance_minor = to_minor(value)
+
+    @balance.expression
+    def balance(cls):
+        return cls.balance_minor / float(MINOR_PER_MAJOR)
 
 class KycStatusEnum(str, enum.Enum):
     pending = "pending"
@@ -27,6 +43,8 @@ class User(Base):
     kyc_status = Column(SQLAlchemyEnum(KycStatusEnum), default=KycStatusEnum.pending)
     is_admin = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # full_name and email also carry pg_trgm GIN indexes on PostgreSQL; they are
+    # created by Alembic only, since they need the pg_trgm extension
 
 class TransactionType(str, enum.Enum):
     deposit = "deposit"
@@ -39,10 +57,82 @@ class Transaction(Base):
     id = Column(Integer, primary_key=True, index=True)
     account_id = Column(Integer, ForeignKey("accounts.id"))
     transaction_type = Column(SQLAlchemyEnum(TransactionType))
-    amount = Column(Float)
+    amount_minor = Column(BigInteger, nullable=False)
+    # Transfers only: the account credited; account_id is the one debited
+    counter_account_id = Column(Integer, ForeignKey("accounts.id"), nullable=True)
     description = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        # Account history is paged newest-first on (created_at, id)
+        Index("ix_transactions_account_created_id", "account_id", "created_at", "id"),
+        # ... and includes the transfers the account received
+        Index("ix_transactions_counter_created_id", "counter_account_id", "created_at", "id",
+              postgresql_where=counter_account_id.isnot(None),
+              sqlite_where=counter_account_id.isnot(None)),
+    )
+
+    @hybrid_property
+    def amount(self):
+        return None if self.amount_minor is None else to_major(self.amount_minor)
+
+    @amount.setter
+    def amount(self, value):
+        self.amount_minor = to_minor(value)
+
+    @amount.expression
+    def amount(cls):
+        return cls.amount_minor / float(MINOR_PER_MAJOR)
+
+class LedgerEntry(Base):
+    """One posting of the append-only journal (see app/services/ledger.py).
+
+    Every deposit or withdrawal posts two entries that sum to zero: one on the
+    customer account and the opposite one on the bank's settlement side
+    (account_id NULL). A transfer debits account_id and credits
+    counter_account_id instead. Rows are never updated or deleted.
+    """
+    __tablename__ = "ledger_entries"
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    transaction_id = Column(Integer, ForeignKey("transactions.id"), nullable=False, index=True)
+    account_id = Column(Integer, ForeignKey("accounts.id"), nullable=True)
+    amount_minor = Column(BigInteger, nullable=False)  # signed; positive credits the account
+    created_at = Column(DateTime(timezone=True), nullable=False)  # copied from the transaction
+
+    __table_args__ = (
+        # Per-account sums and as-of replays
+        Index("ix_ledger_entries_account_created_id", "account_id", "created_at", "id"),
+    )
+
+class BalanceCheckpoint(Base):
+    """An account's balance after every ledger entry up to and including ``as_of``.
+
+    Written by app/services/checkpoints.py, every N postings of the account
+    and at the end of each day; never changed afterwards.
+    """
+    __tablename__ = "balance_checkpoints"
+
+    account_id = Column(Integer, ForeignKey("accounts.id"), primary_key=True)
+    as_of = Column(DateTime(timezone=True), primary_key=True)  # created_at of the last entry covered
+    balance_minor = Column(BigInteger, nullable=False)
+
+class IdempotencyKey(Base):
+    """The stored response of a money-moving POST, replayed for retries (see app/services/idempotency.py).
+
+    Written in the same database transaction as the change it describes, so
+    a committed change always has its record and a rolled-back one never does.
+    """
+    __tablename__ = "idempotency_keys"
+
+    scope = Column(String, primary_key=True)  # route and caller: keys of different clients never collide
+    key = Column(String(255), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)  # SHA-256 of the request body
+    status_code = Column(Integer, nullable=False)
+    response_body = Column(Text, nullable=False)  # JSON
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
 class KYCRequest(Base):
     __tablename__ = "kyc_requests"
 
@@ -61,13 +151,70 @@ class SystemLog(Base):
     service = Column(String)
     message = Column(String)
 
+    __table_args__ = (
+        # Admin log browsing: newest first, optionally by level. On PostgreSQL the
+        # table is range-partitioned by month on timestamp (see Alembic)
+        Index("ix_system_logs_timestamp_level", "timestamp", "level"),
+    )
+
 class KycDocument(Base):
     __tablename__ = "kyc_documents"
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     file_name = Column(String, nullable=False)
-    file_path = Column(String, nullable=False)
+    file_path = Column(String, nullable=False)  # document store key (see app/services/document_store.py)
     file_type = Column(String, nullable=False)
+    # Measured while the upload streams to disk; NULL for documents stored before that
+    size_bytes = Column(BigInteger, nullable=True)
+    sha256 = Column(String(64), nullable=True)
     doc_status = Column(SQLAlchemyEnum(KycStatusEnum), default=KycStatusEnum.pending)
     uploaded_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Set while a KYC dispatcher holds the document; see app/services/kyc_dispatcher.py
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
+
+class DocumentBlob(Base):
+    """One stored file per distinct content, shared by the documents that reference it"""
+    __tablename__ = "document_blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    size_bytes = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)  # 0: unreferenced, removed by the next collection
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Garbage collection only ever looks for the few unreferenced blobs
+        Index("ix_document_blobs_unreferenced", "sha256",
+              postgresql_where=ref_count <= 0, sqlite_where=ref_count <= 0),
+    )
+
+class StatCounter(Base):
+    """Running totals behind the admin dashboard (see app/services/stats.py)"""
+    __tablename__ = "stat_counters"
+
+    name = Column(String, primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
+
+class TransactionHourlyCount(Base):
+    """Transactions created per hour, for the dashboard's last-24h figure"""
+    __tablename__ = "transaction_hourly_counts"
+
+    hour = Column(DateTime(timezone=True), primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
+
+class DailyTransactionRollup(Base):
+    """Per-day, per-type transaction count and amount (see app/services/rollups.py)"""
+    __tablename__ = "daily_transaction_rollups"
+
+    day = Column(Date, primary_key=True)
+    transaction_type = Column(SQLAlchemyEnum(TransactionType), primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
+    total_minor = Column(BigInteger, nullable=False, default=0)
+
+class DailyActiveUserSketch(Base):
+    """Distinct transacting users for one closed UTC day (see app/services/activity.py)"""
+    __tablename__ = "daily_active_user_sketches"
+
+    day = Column(Date, primary_key=True)
+    active_users = Column(Integer, nullable=False)  # exact count for the day
+    registers = Column(LargeBinary, nullable=False)  # HyperLogLog registers, mergeable across days
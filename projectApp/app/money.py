@@ -0,0 +1,31 @@
+# app/money.py
+"""Amounts are stored as signed 64-bit integers of minor units (cents); the
+API keeps speaking decimal major units. Convert only at those edges."""
+
+from decimal import Decimal, InvalidOperation
+
+MINOR_PER_MAJOR = 100
+_MAX_MINOR = 2 ** 63 - 1
+
+
+def to_minor(amount) -> int:
+    """Exact major -> minor conversion. Sub-cent precision is an error, not rounded away."""
+    try:
+        # str() first, so 19.99 is read as written rather than as its binary expansion
+        value = Decimal(str(amount)) * MINOR_PER_MAJOR
+    except InvalidOperation:
+        raise ValueError(f"{amount!r} is not an amount")
+    if not value.is_finite() or value != value.to_integral_value():
+        raise ValueError(f"{amount} has more than 2 decimal places")
+    minor = int(value)
+    if abs(minor) > _MAX_MINOR:
+        raise ValueError(f"{amount} is out of range")
+    return minor
+
+
+def to_major(minor: int) -> float:
+    return minor / MINOR_PER_MAJOR
+
+
+def to_decimal(minor: int) -> Decimal:
+    return Decimal(minor).scaleb(-2)
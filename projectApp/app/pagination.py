@@ -0,0 +1,34 @@
+# app/pagination.py
+
+import base64
+import json
+from datetime import datetime
+from typing import Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import String, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Opaque keyset cursor for a (timestamp, id) position"""
+    raw = json.dumps([created_at.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def cursor_timestamp(db: AsyncSession, value: datetime):
+    """Bind a cursor timestamp so it compares correctly against stored values.
+
+    SQLite stores timestamps as text: server defaults (CURRENT_TIMESTAMP) have
+    no fractional part while bound datetimes always carry ``.ffffff``, which
+    would sort a whole second out of place.
+    """
+    if db.bind.dialect.name == "sqlite" and not value.microsecond:
+        return literal(value.strftime("%Y-%m-%d %H:%M:%S"), String)
+    return value
@@ -0,0 +1,181 @@
+# app/pool_metrics.py
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional, Type
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _percentile(ordered, fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class PoolMetrics:
+    """Connection pool usage of one engine, gathered from pool events.
+
+    Counts checkouts, new connections, invalidations and checkout timeouts.
+    Also tracks how long a checkout waited for a connection, how far the pool
+    ran into overflow, and how long each connection stayed checked out.
+    Checkouts held longer than ``slow_hold`` are counted and logged, since
+    those are what drain a pool. Waits are timed by the pool class from
+    ``pool_class``, because no pool event fires before a checkout starts
+    waiting. They include opening a new connection when the pool grows.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        slow_hold: float = settings.DB_POOL_SLOW_HOLD,
+        samples: int = settings.DB_POOL_WAIT_SAMPLES,
+    ):
+        self.name = name
+        self.slow_hold = slow_hold
+        self._engine: Optional[Engine] = None
+        # Sync engines check out from threadpool threads
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=samples)
+        self._held: Dict[int, float] = {}  # id(connection record) -> checkout time
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._waits.clear()
+            self.checkouts = 0
+            self.connects = 0
+            self.invalidations = 0
+            self.timeouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.overflow_checkouts = 0
+            self.peak_overflow = 0
+            self.peak_checked_out = len(self._held)
+            self.hold_count = 0
+            self.hold_total = 0.0
+            self.hold_max = 0.0
+            self.slow_holds = 0
+
+    def pool_class(self, base: Type[Pool]) -> Type[Pool]:
+        """``base`` with checkout waits timed into these metrics; survives ``engine.dispose()``"""
+        metrics = self
+
+        class TimedPool(base):
+            def _do_get(self):
+                started = time.perf_counter()
+                try:
+                    return super()._do_get()
+                except exc.TimeoutError:
+                    with metrics._lock:
+                        metrics.timeouts += 1
+                    raise
+                finally:
+                    metrics._record_wait(time.perf_counter() - started)
+
+        TimedPool.__name__ = TimedPool.__qualname__ = f"Timed{base.__name__}"
+        return TimedPool
+
+    def attach(self, engine: Engine) -> Engine:
+        """Listen to the pool events of ``engine``; pass ``engine.sync_engine`` for async engines"""
+        self._engine = engine
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        event.listen(engine, "invalidate", self._on_invalidate)
+        return engine
+
+    def _record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self._waits.append(seconds)
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def _on_connect(self, dbapi_connection, connection_record) -> None:
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy) -> None:
+        overflow = self._overflow()
+        with self._lock:
+            self.checkouts += 1
+            self._held[id(connection_record)] = time.monotonic()
+            self.peak_checked_out = max(self.peak_checked_out, len(self._held))
+            if overflow > 0:
+                self.overflow_checkouts += 1
+                self.peak_overflow = max(self.peak_overflow, overflow)
+
+    def _on_checkin(self, dbapi_connection, connection_record) -> None:
+        with self._lock:
+            started = self._held.pop(id(connection_record), None)
+            if started is None:
+                return
+            held = time.monotonic() - started
+            self.hold_count += 1
+            self.hold_total += held
+            self.hold_max = max(self.hold_max, held)
+            slow = held >= self.slow_hold
+            if slow:
+                self.slow_holds += 1
+        if slow:
+            logger.warning("%s pool connection was held for %.3fs", self.name, held)
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception) -> None:
+        with self._lock:
+            self.invalidations += 1
+
+    def _overflow(self) -> int:
+        pool = self._engine.pool if self._engine is not None else None
+        return pool.overflow() if hasattr(pool, "overflow") else 0
+
+    def stats(self) -> dict:
+        pool = self._engine.pool if self._engine is not None else None
+        now = time.monotonic()
+        with self._lock:
+            waits = sorted(self._waits)
+            oldest = now - min(self._held.values()) if self._held else 0.0
+            return {
+                "pool": {
+                    "class": type(pool).__name__ if pool is not None else None,
+                    "size": pool.size() if hasattr(pool, "size") else None,
+                    "checked_in": pool.checkedin() if hasattr(pool, "checkedin") else None,
+                    "checked_out": len(self._held),
+                    "overflow": max(self._overflow(), 0),
+                    "max_overflow": getattr(pool, "_max_overflow", None),
+                    "timeout": getattr(pool, "_timeout", None),
+                    "recycle": getattr(pool, "_recycle", None),
+                    "pre_ping": getattr(pool, "_pre_ping", None),
+                },
+                "checkouts": self.checkouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_ms": {
+                    "samples": len(waits),
+                    "avg": round(1000 * sum(waits) / len(waits), 3) if waits else 0.0,
+                    "p50": round(1000 * _percentile(waits, 0.50), 3),
+                    "p95": round(1000 * _percentile(waits, 0.95), 3),
+                    "p99": round(1000 * _percentile(waits, 0.99), 3),
+                    "max": round(1000 * self.wait_max, 3),
+                },
+                "overflow": {
+                    "checkouts": self.overflow_checkouts,
+                    "peak": self.peak_overflow,
+                },
+                "held_ms": {
+                    "peak_checked_out": self.peak_checked_out,
+                    "avg": round(1000 * self.hold_total / self.hold_count, 3) if self.hold_count else 0.0,
+                    "max": round(1000 * self.hold_max, 3),
+                    "oldest_open": round(1000 * oldest, 3),
+                    "slow_threshold": round(1000 * self.slow_hold, 3),
+                    "slow": self.slow_holds,
+                },
+            }
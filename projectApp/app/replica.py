@@ -0,0 +1,259 @@
+# app/replica.py
+
+import asyncio
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from fastapi import Depends, Request, Response
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import database
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Set on responses to writes; browsers send it back while it lives, so
+# read-your-writes also holds when the next read lands on another worker
+PRIMARY_COOKIE = "bankfin_read_primary"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# Seconds the replica is behind: 0 once it has replayed everything it received.
+# A second primary (two local instances, no replication) reports 0.
+PG_LAG_QUERY = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0"
+    " WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+def client_key(request: Request) -> str:
+    """Who a read-your-writes window belongs to: the bearer token, else the client address"""
+    authorization = request.headers.get("authorization")
+    if authorization:
+        return "token:" + hashlib.sha256(authorization.encode()).hexdigest()
+    return "client:" + (request.client.host if request.client else "")
+
+
+def is_unavailable(exc: BaseException) -> bool:
+    """Errors that mean the database is unreachable, not that the query was wrong"""
+    if isinstance(exc, OSError):
+        return True
+    return exc.connection_invalidated or isinstance(exc, (OperationalError, InterfaceError))
+
+
+class ReplicaRouter:
+    """Sends read-only handlers to the replica while it is healthy and caught up.
+
+    A background probe checks the replica every ``check_interval`` seconds.
+    It measures replication lag on PostgreSQL; other databases only get a
+    reachability check. Reads go to the primary when no replica is configured,
+    when the last probe failed, when the lag exceeds ``max_lag``, or when the
+    client wrote within the last ``sticky_seconds``. Reads start on the
+    primary until the first probe succeeds. A connection error on a replica
+    session marks the replica down at once instead of waiting for the next
+    probe, and the read that hit it is retried on the primary (see
+    ``ReplicaSession``). Primary reads use the request's own session from
+    ``get_async_db``, so the router only holds the replica's factory.
+    """
+
+    def __init__(
+        self,
+        replica_factory: Optional[Callable] = None,
+        max_lag: float = settings.REPLICA_MAX_LAG,
+        sticky_seconds: float = settings.REPLICA_STICKY_SECONDS,
+        max_clients: int = settings.REPLICA_STICKY_CLIENTS,
+        check_interval: float = settings.REPLICA_CHECK_INTERVAL,
+    ):
+        self.replica_factory = replica_factory
+        self.max_lag = max_lag
+        self.sticky_seconds = sticky_seconds
+        self.max_clients = max_clients
+        self.check_interval = check_interval
+        self.healthy = False
+        self.lag: Optional[float] = None
+        self.last_error: Optional[str] = None
+        # client key -> monotonic time its reads may return to the replica
+        self._sticky: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._stop_event: Optional[asyncio.Event] = None
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.sticky_reads = 0
+        self.fallbacks = 0
+        self.failovers = 0
+
+    def mark_written(self, key: str) -> None:
+        """Keep ``key``'s reads on the primary until the replica has surely seen its write"""
+        if self.sticky_seconds <= 0:
+            return
+        with self._lock:
+            self._sticky[key] = time.monotonic() + self.sticky_seconds
+            self._sticky.move_to_end(key)
+            while len(self._sticky) > self.max_clients:
+                self._sticky.popitem(last=False)
+
+    def after_request(self, request: Request, response: Response) -> None:
+        """Middleware hook: a successful write pins the client's reads to the primary for a while"""
+        if self.replica_factory is None or request.method in SAFE_METHODS or response.status_code >= 400:
+            return
+        self.mark_written(client_key(request))
+        response.set_cookie(PRIMARY_COOKIE, "1", max_age=math.ceil(self.sticky_seconds), httponly=True, samesite="lax")
+
+    def _is_sticky(self, key: str) -> bool:
+        with self._lock:
+            until = self._sticky.get(key)
+            if until is None:
+                return False
+            if until <= time.monotonic():
+                del self._sticky[key]
+                return False
+            return True
+
+    def choose(self, request: Request) -> Optional[Callable]:
+        """The replica's session factory for a read-only request, or None to read from the primary"""
+        if self.replica_factory is None:
+            self.primary_reads += 1
+            return None
+        if request.cookies.get(PRIMARY_COOKIE) or self._is_sticky(client_key(request)):
+            self.sticky_reads += 1
+            return None
+        if not self.healthy or self.lag is None or self.lag > self.max_lag:
+            self.fallbacks += 1
+            return None
+        self.replica_reads += 1
+        return self.replica_factory
+
+    def mark_down(self, exc: BaseException) -> None:
+        if self.healthy:
+            logger.warning("Read replica unavailable, reading from the primary: %s", exc)
+        self.healthy = False
+        self.last_error = str(exc)
+
+    async def check(self) -> bool:
+        """Probe the replica once; returns whether reads may use it"""
+        if self.replica_factory is None:
+            return False
+        try:
+            async with self.replica_factory() as db:
+                if db.bind.dialect.name == "postgresql":
+                    lag = await db.scalar(PG_LAG_QUERY)
+                else:
+                    await db.execute(text("SELECT 1"))
+                    lag = 0
+        except Exception as exc:
+            self.lag = None
+            self.mark_down(exc)
+            return False
+        self.lag = float(lag) if lag is not None else None
+        if not self.healthy:
+            logger.info("Read replica available (lag %s s)", self.lag)
+        self.healthy = True
+        self.last_error = None
+        return self.lag is not None and self.lag <= self.max_lag
+
+    async def start(self) -> None:
+        if self.replica_factory is None or (self._task is not None and not self._task.done()):
+            return
+        self._stop_event = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stop_event.set()
+        await self._task
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await self.check()
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), self.check_interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sticky.clear()
+
+    def stats(self) -> dict:
+        return {
+            "configured": self.replica_factory is not None,
+            "healthy": self.healthy,
+            "lag_seconds": self.lag,
+            "max_lag_seconds": self.max_lag,
+            "last_error": self.last_error,
+            "sticky_clients": len(self._sticky),
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+            "sticky_reads": self.sticky_reads,
+            "fallbacks": self.fallbacks,
+            "failovers": self.failovers,
+        }
+
+
+replica_router = ReplicaRouter(replica_factory=database.ReplicaSessionLocal)
+
+
+class ReplicaSession:
+    """A replica session whose reads move to the primary when the replica fails.
+
+    ``execute``, ``scalar``, ``scalars`` and ``get`` that fail because the
+    replica is unreachable mark it down and run again on ``primary``, as do
+    all later reads in the request. Anything else is the replica session's
+    own attribute. Only the first failure of a read is retried; errors from
+    the query itself are raised as usual.
+    """
+
+    def __init__(self, replica: AsyncSession, primary: AsyncSession):
+        self._replica = replica
+        self._primary = primary
+        self._target = replica
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+    async def execute(self, *args, **kwargs):
+        return await self._read("execute", args, kwargs)
+
+    async def scalar(self, *args, **kwargs):
+        return await self._read("scalar", args, kwargs)
+
+    async def scalars(self, *args, **kwargs):
+        return await self._read("scalars", args, kwargs)
+
+    async def get(self, *args, **kwargs):
+        return await self._read("get", args, kwargs)
+
+    async def _read(self, name: str, args, kwargs):
+        if self._target is self._replica:
+            try:
+                return await getattr(self._replica, name)(*args, **kwargs)
+            except (DBAPIError, OSError) as exc:
+                if not is_unavailable(exc):
+                    raise
+                replica_router.mark_down(exc)
+                replica_router.failovers += 1
+                self._target = self._primary
+        return await getattr(self._primary, name)(*args, **kwargs)
+
+
+async def get_read_db(request: Request, primary_db: AsyncSession = Depends(database.get_async_db)):
+    """Session for read-only handlers: the replica when ``replica_router`` allows it, else the primary"""
+    factory = replica_router.choose(request)
+    if factory is None:
+        # The request's own primary session (auth already holds it), so a read
+        # never waits on a second pooled connection while holding the first
+        yield primary_db
+        return
+    async with factory() as db:
+        yield ReplicaSession(db, primary_db)
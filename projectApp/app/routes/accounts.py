@@ -1,9 +1,17 @@
 # app/routes/accounts.py
 
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app import database, models, schemas
 from app.auth.jwt import get_current_user
+from app.money import to_major
+from app.replica import get_read_db
+from app.services.balances import InsufficientFunds, post_transaction
+from app.services.checkpoints import as_utc, balance_as_of
 
 router = APIRouter(prefix="/accounts", tags=["accounts"])
 
@@ -12,26 +20,37 @@ def get_profile(user: dict = Depends(get_current_user)):
     return {"msg": f"Welcome, user #{user['sub']}"}
 
 @router.post("/", response_model=schemas.AccountResponse)
-def create_account(
+async def create_account(
     req: schemas.AccountCreateRequest,
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_async_db)
 ):
-    account = models.Account(owner=str(req.user_id), balance=req.initial_deposit)
+    # The opening balance is journaled like any deposit, so the cached
+    # balance always equals the sum of the account's ledger postings
+    account = models.Account(owner=str(req.user_id), balance_minor=0)
     db.add(account)
-    db.commit()
-    db.refresh(account)
+    await db.flush()
+    balance = 0.0
+    if req.initial_deposit:
+        try:
+            posted = await post_transaction(
+                db, account.id, models.TransactionType.deposit, req.initial_deposit, "Opening deposit"
+            )
+        except InsufficientFunds:
+            raise HTTPException(status_code=400, detail="Initial deposit cannot be negative")
+        balance = posted.balance
+    await db.commit()
     return schemas.AccountResponse(
         account_id=account.id,
         user_id=int(account.owner),
-        balance=account.balance
+        balance=balance
     )
 
 @router.get("/{account_id}", response_model=schemas.AccountResponse)
-def get_account(
+async def get_account(
     account_id: int,
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    account = db.query(models.Account).filter(models.Account.id == account_id).first()
+    account = await db.scalar(select(models.Account).where(models.Account.id == account_id))
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
     return schemas.AccountResponse(
@@ -40,3 +59,21 @@ def get_account(
         balance=account.balance
     )
 
+
+@router.get("/{account_id}/balance", response_model=schemas.AccountBalanceResponse)
+async def get_balance_as_of(
+    account_id: int,
+    as_of: Optional[datetime] = Query(None, description="Point in time (ISO 8601, UTC if no offset); default now"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    if not await db.scalar(select(models.Account.id).where(models.Account.id == account_id)):
+        raise HTTPException(status_code=404, detail="Account not found")
+    as_of = as_utc(as_of) if as_of else datetime.now(timezone.utc)
+    result = await balance_as_of(db, account_id, as_of)
+    return schemas.AccountBalanceResponse(
+        account_id=account_id,
+        as_of=as_of,
+        balance=to_major(result.balance_minor),
+        checkpoint_at=result.checkpoint_at,
+        replayed_entries=result.replayed_entries,
+    )
@@ -1,140 +1,202 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Optional
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
-from ..database import get_db
-from ..models import User, Transaction, KYCRequest, SystemLog
-from ..schemas import UserResponse, TransactionResponse, KYCResponse, SystemLogResponse, AdminStats
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import async_pool_metrics, get_async_db, replica_pool_metrics, sync_pool_metrics
+from ..models import User, KYCRequest, SystemLog
+from ..schemas import UserResponse, TransactionResponse, KYCResponse, SystemLogPage, AdminStats
 from ..auth.jwt import get_admin_user
+from ..auth.principal_cache import principal_cache
+from ..config import settings
+from ..pagination import cursor_timestamp, decode_cursor, encode_cursor
+from ..replica import get_read_db, replica_router
+from ..sql_profiler import sql_profiler
+from ..services.activity import active_users
+from ..services.idempotency import idempotency_store
+from ..services.kyc_dispatcher import kyc_dispatcher
+from ..services.log_retention import log_maintenance
+from ..services.log_writer import system_log_writer
+from ..services.rollups import read_rollups
+from ..services import user_search
+from ..services.stats import KYC_PENDING, TRANSACTIONS, USERS_TOTAL, stats_service
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
 @router.get("/stats", response_model=AdminStats)
-async def get_admin_stats(db: Session = Depends(get_db), _: dict = Depends(get_admin_user)):
-    now = datetime.utcnow()
-    day_ago = now - timedelta(days=1)
-    
+async def get_admin_stats(db: AsyncSession = Depends(get_read_db), _: dict = Depends(get_admin_user)):
+    # Maintained counters: a few primary-key reads however big the tables get
+    counters = await stats_service.snapshot(db)
     stats = {
-        "totalUsers": db.query(User).count(),
-        "transactionsLast24h": db.query(Transaction).filter(Transaction.created_at >= day_ago).count(),
-        "pendingKYC": db.query(KYCRequest).filter(KYCRequest.status == "pending").count(),
+        "totalUsers": counters[USERS_TOTAL],
+        "transactionsLast24h": counters[TRANSACTIONS],
+        "pendingKYC": counters[KYC_PENDING],
         "systemHealth": "Healthy"  # You can implement more sophisticated health checks
     }
     return stats
 
+@router.get("/stats/counters")
+async def get_stats_counters(_: dict = Depends(get_admin_user)):
+    return stats_service.stats()
+
+@router.post("/stats/reconcile")
+async def reconcile_stats(_: dict = Depends(get_admin_user)):
+    """Recount the dashboard counters now; returns the drift that was corrected"""
+    return {"drift": await stats_service.reconcile()}
+
 @router.get("/transactions/chart")
-async def get_transaction_chart(db: Session = Depends(get_db), _: dict = Depends(get_admin_user)):
-    now = datetime.utcnow()
-    week_ago = now - timedelta(days=7)
-    
-    transactions = db.query(Transaction).filter(Transaction.created_at >= week_ago).all()
-    
-    # Group by day
-    daily_counts = {}
-    for tx in transactions:
-        day = tx.created_at.date()
-        daily_counts[day] = daily_counts.get(day, 0) + 1
-    
-    # Sort by date
-    sorted_days = sorted(daily_counts.keys())
-    return {
-        "labels": [day.strftime("%Y-%m-%d") for day in sorted_days],
-        "values": [daily_counts[day] for day in sorted_days]
-    }
+async def get_transaction_chart(
+    days: int = Query(7, ge=1, le=366),
+    db: AsyncSession = Depends(get_read_db),
+    _: dict = Depends(get_admin_user)
+):
+    # Served from daily_transaction_rollups: one row per day and type, not per transaction
+    today = datetime.utcnow().date()
+    return await read_rollups(db, today - timedelta(days=days - 1), today + timedelta(days=1))
 
 @router.get("/users", response_model=List[UserResponse])
 async def get_users(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     _: dict = Depends(get_admin_user)
 ):
-    users = db.query(User).offset(skip).limit(limit).all()
+    users = (await db.scalars(select(User).offset(skip).limit(limit))).all()
     return users
 
 @router.get("/users/search", response_model=List[UserResponse])
 async def search_users(
-    q: str,
-    db: Session = Depends(get_db),
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(settings.USER_SEARCH_PAGE_SIZE, ge=1, le=settings.USER_SEARCH_MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0, le=10000),
+    db: AsyncSession = Depends(get_read_db),
     _: dict = Depends(get_admin_user)
 ):
-    users = db.query(User).filter(
-        User.email.ilike(f"%{q}%") | User.name.ilike(f"%{q}%")
-    ).all()
-    return users
+    # Substring match on full_name or email, best matches first
+    return await user_search.search_users(db, q, limit, offset)
 
 @router.get("/users/activity")
-async def get_user_activity(db: Session = Depends(get_db), _: dict = Depends(get_admin_user)):
-    now = datetime.utcnow()
-    week_ago = now - timedelta(days=7)
-    
-    # Get daily active users (users who made transactions)
-    active_users = db.query(Transaction.created_at, Transaction.user_id)\
-        .filter(Transaction.created_at >= week_ago)\
-        .distinct(Transaction.user_id)\
-        .all()
-    
-    # Group by day
-    daily_users = {}
-    for tx_date, _ in active_users:
-        day = tx_date.date()
-        daily_users[day] = daily_users.get(day, 0) + 1
-    
-    # Sort by date
-    sorted_days = sorted(daily_users.keys())
-    return {
-        "labels": [day.strftime("%Y-%m-%d") for day in sorted_days],
-        "values": [daily_users[day] for day in sorted_days]
-    }
+async def get_user_activity(
+    days: int = Query(7, ge=1, le=366),
+    db: AsyncSession = Depends(get_async_db),
+    _: dict = Depends(get_admin_user)
+):
+    # Users are active on a day when one of their accounts transacted; long
+    # ranges come back approximate (merged per-day HyperLogLog sketches)
+    today = datetime.utcnow().date()
+    return await active_users(db, today - timedelta(days=days - 1), today + timedelta(days=1))
 
 @router.get("/kyc", response_model=List[KYCResponse])
 async def get_kyc_requests(
     status: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     _: dict = Depends(get_admin_user)
 ):
-    query = db.query(KYCRequest)
+    query = select(KYCRequest)
     if status:
-        query = query.filter(KYCRequest.status == status)
-    return query.all()
+        query = query.where(KYCRequest.status == status)
+    return (await db.scalars(query)).all()
 
 @router.post("/kyc/{request_id}/approve")
 async def approve_kyc(
     request_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: dict = Depends(get_admin_user)
 ):
-    kyc_request = db.query(KYCRequest).filter(KYCRequest.id == request_id).first()
+    kyc_request = await db.scalar(select(KYCRequest).where(KYCRequest.id == request_id))
     if not kyc_request:
         raise HTTPException(status_code=404, detail="KYC request not found")
     
     kyc_request.status = "approved"
     kyc_request.reviewed_at = datetime.utcnow()
-    db.commit()
+    await db.commit()
     return {"message": "KYC request approved"}
 
-@router.get("/logs", response_model=List[SystemLogResponse])
+@router.get("/logs", response_model=SystemLogPage)
 async def get_system_logs(
     level: Optional[str] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-    db: Session = Depends(get_db),
+    after: Optional[str] = Query(None, description="Cursor from the previous page's next_cursor"),
+    limit: int = Query(settings.LOGS_PAGE_SIZE, ge=1, le=settings.LOGS_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db),
     _: dict = Depends(get_admin_user)
 ):
-    query = db.query(SystemLog)
+    query = select(SystemLog)
     if level:
-        query = query.filter(SystemLog.level == level)
+        query = query.where(SystemLog.level == level)
     if start_date:
-        query = query.filter(SystemLog.timestamp >= start_date)
+        query = query.where(SystemLog.timestamp >= cursor_timestamp(db, start_date))
     if end_date:
-        query = query.filter(SystemLog.timestamp <= end_date)
-    
-    return query.order_by(SystemLog.timestamp.desc()).all()
+        query = query.where(SystemLog.timestamp <= cursor_timestamp(db, end_date))
+    if after:
+        timestamp, log_id = decode_cursor(after)
+        query = query.where(
+            tuple_(SystemLog.timestamp, SystemLog.id) < tuple_(cursor_timestamp(db, timestamp), log_id)
+        )
+    # Newest first off the (timestamp, level) index; on PostgreSQL the time
+    # bounds also prune whole monthly partitions
+    logs = (await db.scalars(
+        query.order_by(SystemLog.timestamp.desc(), SystemLog.id.desc()).limit(limit + 1)
+    )).all()
+
+    next_cursor = None
+    if len(logs) > limit:
+        logs = logs[:limit]
+        next_cursor = encode_cursor(logs[-1].timestamp, logs[-1].id)
+    return SystemLogPage(items=logs, next_cursor=next_cursor)
+
+@router.post("/logs/maintenance")
+async def run_log_maintenance_now(_: dict = Depends(get_admin_user)):
+    """Create upcoming log partitions and apply retention now"""
+    return await log_maintenance.run_once()
+
+@router.get("/logs/writer")
+async def get_log_writer_stats(_: dict = Depends(get_admin_user)):
+    return system_log_writer.stats()
+
+@router.get("/kyc/dispatcher")
+async def get_kyc_dispatcher_stats(_: dict = Depends(get_admin_user)):
+    return kyc_dispatcher.stats()
+
+@router.get("/auth-cache")
+async def get_auth_cache_stats(_: dict = Depends(get_admin_user)):
+    return principal_cache.stats()
+
+@router.get("/idempotency")
+async def get_idempotency_stats(_: dict = Depends(get_admin_user)):
+    return idempotency_store.stats()
+
+@router.get("/db-pool")
+async def get_db_pool_stats(_: dict = Depends(get_admin_user)):
+    pools = {"async": async_pool_metrics.stats(), "sync": sync_pool_metrics.stats()}
+    if replica_router.replica_factory is not None:
+        pools["replica"] = replica_pool_metrics.stats()
+    return pools
+
+@router.get("/replica")
+async def get_replica_stats(_: dict = Depends(get_admin_user)):
+    return replica_router.stats()
+
+@router.get("/sql-profile")
+async def get_sql_profile(_: dict = Depends(get_admin_user)):
+    return sql_profiler.stats()
+
+@router.post("/sql-profile")
+async def set_sql_profile(enabled: bool, reset: bool = False, _: dict = Depends(get_admin_user)):
+    """Switch per-request SQL profiling on or off in this worker"""
+    if enabled:
+        sql_profiler.enable()
+    else:
+        sql_profiler.disable()
+    if reset:
+        sql_profiler.reset()
+    return sql_profiler.stats()
 
 @router.post("/settings")
 async def update_settings(
     settings: dict,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: dict = Depends(get_admin_user)
 ):
     # Update system settings in database or cache
@@ -1,12 +1,19 @@
 # app/routes/auth.py
 
+import logging
 import os
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Form, File, UploadFile
-from sqlalchemy.orm import Session
-import httpx
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, Form, File, UploadFile
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app import schemas, models, database
 from app.auth import jwt as auth
 from app.config import settings
+from app.services.kyc_dispatcher import document_url, kyc_dispatcher
+from app.services.document_store import document_store
+from app.services.uploads import UploadTooLarge, discard_upload, receive_upload
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/auth",
@@ -16,10 +23,10 @@ router = APIRouter(
 @router.post("/login", response_model=schemas.Token)
 async def login(
     credentials: schemas.LoginRequest,
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_async_db)
 ):
-    user = db.query(models.User).filter(models.User.email == credentials.email).first()
-    if not user or not auth.verify_password(credentials.password, user.password_hash):
+    user = await db.scalar(select(models.User).where(models.User.email == credentials.email))
+    if not user or not await auth.verify_password_async(credentials.password, user.password_hash):
         raise HTTPException(
             status_code=401,
             detail="Incorrect email or password",
@@ -30,79 +37,69 @@ async def login(
 
 @router.post("/register", response_model=schemas.RegisterResponse, status_code=201)
 async def register_with_kyc(
-    background_tasks: BackgroundTasks,
     full_name: str = Form(...),
     email: str = Form(...),
     password: str = Form(...),
     id_document: UploadFile = File(...),
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_async_db)
 ):
     # 1) Check for duplicate email
-    if db.query(models.User).filter(models.User.email == email).first():
+    if await db.scalar(select(models.User).where(models.User.email == email)):
         raise HTTPException(400, "Email already registered")
     
-    # 2) Create user record with pending KYC
-    pw_hash = auth.get_password_hash(password)
-    user = models.User(full_name=full_name, email=email, password_hash=pw_hash)
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-    
-    # 3) Save the uploaded file
-    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
-    filename = f"{user.id}_{id_document.filename}"
-    save_path = os.path.join(settings.UPLOAD_DIR, filename)
-    
-    # Save file to disk
-    with open(save_path, "wb") as f:
-        content = id_document.file.read()
-        f.write(content)
+    # 2) Stream the document to disk before touching the database, so an
+    # oversized upload is rejected without leaving a user behind
+    try:
+        upload = await receive_upload(
+            id_document, settings.UPLOAD_DIR,
+            max_bytes=settings.UPLOAD_MAX_BYTES, chunk_size=settings.UPLOAD_CHUNK_SIZE,
+        )
+    except UploadTooLarge as exc:
+        raise HTTPException(413, f"ID document exceeds {exc.max_bytes} bytes")
 
-    # Create KYC document record
-    kyc_doc = models.KycDocument(
-        user_id=user.id,
-        file_name=filename,
-        file_path=save_path,
-        file_type=id_document.content_type,
-        doc_status=models.KycStatusEnum.pending
-    )
-    db.add(kyc_doc)
-    db.commit()
-    db.refresh(kyc_doc)
+    # 3) Create the user and its pending KYC document in one transaction
+    try:
+        pw_hash = await auth.get_password_hash_async(password)
+        user = models.User(full_name=full_name, email=email, password_hash=pw_hash)
+        db.add(user)
+        await db.flush()
 
-    # 5) Enqueue a background verification call
-    def call_kyc_provider(document_id: int, url: str):
-        resp = httpx.post(
-            settings.KYC_API_URL,
-            headers={"Authorization": f"Bearer {settings.KYC_API_KEY}"},
-            json={"user_id": user.id, "document_url": url}
+        filename = f"{user.id}_{os.path.basename(id_document.filename or 'document')}"
+        kyc_doc = models.KycDocument(
+            user_id=user.id,
+            file_name=filename,
+            file_path=await document_store.put(db, upload),
+            file_type=id_document.content_type,
+            size_bytes=upload.size,
+            sha256=upload.sha256,
+            doc_status=models.KycStatusEnum.pending,
+            # Claimed for this process's dispatcher, so no other worker requeues it
+            claimed_at=datetime.now(timezone.utc),
         )
-        data = resp.json()
-        # update DB based on provider\'s response
-        db2 = next(database.get_db())
-        doc = db2.query(models.KycDocument).get(document_id)
-        if resp.status_code == 200 and data.get("status") == "verified":
-            doc.doc_status = models.KycStatusEnum.verified
-            doc.verified_at = data.get("verified_at")
-            # also update the user\'s kyc_status
-            user_rec = db2.query(models.User).get(user.id)
-            user_rec.kyc_status = models.KycStatusEnum.verified
-        else:
-            doc.doc_status = models.KycStatusEnum.failed
-            user_rec = db2.query(models.User).get(user.id)
-            user_rec.kyc_status = models.KycStatusEnum.failed
-        db2.commit()
-        db2.close()
+        db.add(kyc_doc)
+        await db.commit()
+    except BaseException:
+        # A blob already placed stays; without a committed reference it is an orphan file only
+        await discard_upload(upload.path)
+        raise
 
-    file_url = f"{settings.KYC_API_URL}/files/{filename}"
-    background_tasks.add_task(call_kyc_provider, kyc_doc.id, file_url)
+    # 4) Queue the provider check; the dispatcher writes the verdict back.
+    # If it cannot take the document now, it stays pending and is retried on restart.
+    if not kyc_dispatcher.submit(kyc_doc.id, user.id, document_url(filename)):
+        logger.warning("KYC queue unavailable; document %d left pending", kyc_doc.id)
+        await kyc_dispatcher.release([kyc_doc.id])
 
-    # 6) Return immediately
-    return schemas.RegisterResponse(user_id=user.id, kyc_status=user.kyc_status.value)
+    # 5) Return immediately
+    access_token = auth.create_access_token(data={"sub": str(user.id)})
+    return schemas.RegisterResponse(
+        user_id=user.id,
+        kyc_status=user.kyc_status.value,
+        access_token=access_token
+    )
 
 @router.get("/auth/kyc-status", response_model=schemas.KycStatusResponse)
-def kyc_status(user_id: int, db: Session = Depends(database.get_db)):
-    user = db.query(models.User).get(user_id)
+async def kyc_status(user_id: int, db: AsyncSession = Depends(database.get_async_db)):
+    user = await db.get(models.User, user_id)
     if not user:
         raise HTTPException(404, "User not found")
     return schemas.KycStatusResponse(kyc_status=user.kyc_status.value)
@@ -110,10 +107,10 @@ def kyc_status(user_id: int, db: Session = Depends(database.get_db)):
 @router.post("/admin/login", response_model=schemas.Token)
 async def admin_login(
     credentials: schemas.LoginRequest,
-    db: Session = Depends(database.get_db)
+    db: AsyncSession = Depends(database.get_async_db)
 ):
-    user = db.query(models.User).filter(models.User.email == credentials.email).first()
-    if not user or not auth.verify_password(credentials.password, user.password_hash):
+    user = await db.scalar(select(models.User).where(models.User.email == credentials.email))
+    if not user or not await auth.verify_password_async(credentials.password, user.password_hash):
         raise HTTPException(
             status_code=401,
             detail="Incorrect email or password",
@@ -128,12 +125,12 @@ async def admin_login(
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/admin/init", response_model=schemas.Token)
-async def init_admin(db: Session = Depends(database.get_db)):
+async def init_admin(db: AsyncSession = Depends(database.get_async_db)):
     """Initialize the first admin user if none exists"""
-    if db.query(models.User).filter(models.User.is_admin == True).first():
+    if await db.scalar(select(models.User).where(models.User.is_admin == True)):
         raise HTTPException(400, "Admin user already exists")
     
-    pw_hash = auth.get_password_hash(settings.DEFAULT_ADMIN_PASSWORD)
+    pw_hash = await auth.get_password_hash_async(settings.DEFAULT_ADMIN_PASSWORD)
     admin = models.User(
         full_name="System Admin",
         email=settings.DEFAULT_ADMIN_EMAIL,
@@ -142,8 +139,8 @@ async def init_admin(db: Session = Depends(database.get_db)):
         kyc_status=models.KycStatusEnum.verified
     )
     db.add(admin)
-    db.commit()
-    db.refresh(admin)
+    await db.commit()
+    await db.refresh(admin)
     
     access_token = auth.create_admin_token(admin)
     return {"access_token": access_token, "token_type": "bearer"}
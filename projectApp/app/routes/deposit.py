@@ -1,8 +1,13 @@
 # app/routes/deposit.py
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from app import schemas, models, database
+from app.replica import client_key
+from app.services.balances import AccountNotFound, InsufficientFunds, post_transaction
+from app.services.idempotency import IDEMPOTENCY_HEADER, idempotent_response
 
 router = APIRouter(
     prefix="/deposit",
@@ -10,23 +15,33 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=schemas.DepositResponse)
-def make_deposit(
+async def make_deposit(
     deposit: schemas.DepositRequest,
-    db: Session = Depends(database.get_db)
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER, max_length=255),
+    db: AsyncSession = Depends(database.get_async_db)
 ):
-    # 1) Look up the account
-    account = db.query(models.Account).filter(models.Account.id == deposit.account_id).first()
-    if not account:
-        raise HTTPException(status_code=404, detail="Account not found")
-
-    # 2) Add funds
-    account.balance += deposit.amount
-    db.add(account)
-    db.commit()
-    db.refresh(account)
+    async def apply():
+        # Add funds and record the deposit in one atomic step
+        try:
+            posted = await post_transaction(
+                db, deposit.account_id, models.TransactionType.deposit, deposit.amount
+            )
+        except AccountNotFound:
+            raise HTTPException(status_code=404, detail="Account not found")
+        except InsufficientFunds:
+            raise HTTPException(status_code=400, detail="Insufficient funds")
+        return schemas.DepositResponse(
+            account_id=posted.account_id,
+            new_balance=posted.balance
+        )
 
-    # 3) Return a response
-    return schemas.DepositResponse(
-        account_id=account.id,
-        new_balance=account.balance
-    )
+    if idempotency_key is not None:
+        # Commits with the stored response; retries get that response back.
+        # Deposits are unauthenticated, so keys are per account and per client
+        # (bearer token, else address): callers picking the same key never meet
+        scope = f"POST /deposit/ account:{deposit.account_id} {client_key(request)}"
+        return await idempotent_response(db, scope, idempotency_key, deposit, apply)
+    response = await apply()
+    await db.commit()
+    return response
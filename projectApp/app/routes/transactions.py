@@ -1,8 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from datetime import datetime
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, tuple_, union_all
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Callable, List, Literal, Optional
 from app import schemas, models, database
 from app.auth.jwt import get_current_user
+from app.config import settings
+from app.pagination import cursor_timestamp, decode_cursor, encode_cursor
+from app.replica import get_read_db
+from app.services.balances import (
+    AccountNotFound,
+    InsufficientFunds,
+    post_transaction,
+    post_transaction_batch,
+)
+from app.services.exports import MEDIA_TYPES, stream_transactions
+from app.services.idempotency import IDEMPOTENCY_HEADER, idempotent_response
+from app.services.transfers import is_retryable, transfer
 
 router = APIRouter(
     prefix="/transactions",
@@ -10,58 +26,156 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=schemas.TransactionResponse)
-def create_transaction(
+async def create_transaction(
     transaction: schemas.TransactionCreate,
-    db: Session = Depends(database.get_db),
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER, max_length=255),
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: dict = Depends(get_current_user)
+):
+    async def apply():
+        # Balance check, balance update and the transaction record happen in SQL;
+        # the owner condition keeps other users' accounts invisible
+        try:
+            posted = await post_transaction(
+                db,
+                transaction.account_id,
+                transaction.transaction_type,
+                transaction.amount,
+                transaction.description,
+                owner=str(current_user.id),
+            )
+        except AccountNotFound:
+            raise HTTPException(status_code=404, detail="Account not found")
+        except InsufficientFunds:
+            raise HTTPException(status_code=400, detail="Insufficient funds")
+        return schemas.TransactionResponse.model_validate(posted)
+
+    if idempotency_key is not None:
+        # Keys are per user, so two clients can never replay each other's responses
+        scope = f"POST /transactions/ user:{current_user.id}"
+        return await idempotent_response(db, scope, idempotency_key, transaction, apply)
+    response = await apply()
+    await db.commit()
+    return response
+
+@router.post("/batch", response_model=schemas.TransactionBatchResponse)
+async def create_transaction_batch(
+    transactions: List[schemas.TransactionCreate],
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: dict = Depends(get_current_user)
+):
+    if len(transactions) > settings.TRANSACTION_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch exceeds {settings.TRANSACTION_BATCH_MAX_ITEMS} items"
+        )
+    results = await post_transaction_batch(db, transactions, owner=str(current_user.id))
+    await db.commit()
+    applied = sum(1 for result in results if result.status == "applied")
+    return schemas.TransactionBatchResponse(
+        applied=applied,
+        rejected=len(results) - applied,
+        results=[schemas.TransactionBatchItemResult.model_validate(r) for r in results]
+    )
+
+@router.post("/transfer", response_model=schemas.TransferResponse)
+async def create_transfer(
+    request: schemas.TransferRequest,
+    session_factory: Callable = Depends(database.get_async_session_factory),
+    current_user: dict = Depends(get_current_user)
+):
+    # Runs in its own session: a retry needs a fresh transaction, not the request's
+    try:
+        posted = await transfer(
+            session_factory,
+            request.from_account_id,
+            request.to_account_id,
+            request.amount,
+            request.description,
+            owner=str(current_user.id),
+        )
+    except AccountNotFound as exc:
+        if exc.args[0] == request.to_account_id:
+            raise HTTPException(status_code=404, detail="Destination account not found")
+        raise HTTPException(status_code=404, detail="Account not found")
+    except InsufficientFunds:
+        raise HTTPException(status_code=400, detail="Insufficient funds")
+    except DBAPIError as exc:
+        if not is_retryable(exc):
+            raise
+        # Still contended after every attempt
+        raise HTTPException(status_code=503, detail="Transfer could not be completed, please retry")
+    return schemas.TransferResponse.model_validate(posted)
+
+@router.get("/{account_id}", response_model=schemas.TransactionPage)
+async def get_account_transactions(
+    account_id: int,
+    after: Optional[str] = Query(None, description="Cursor from the previous page's next_cursor"),
+    limit: int = Query(settings.TRANSACTIONS_PAGE_SIZE, ge=1, le=settings.TRANSACTIONS_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db),
     current_user: dict = Depends(get_current_user)
 ):
     # Check if account exists and belongs to user
-    account = db.query(models.Account).filter(
-        models.Account.id == transaction.account_id
-    ).first()
+    account = await db.scalar(select(models.Account).where(
+        models.Account.id == account_id
+    ))
     
     if not account or str(account.owner) != str(current_user.id):
         raise HTTPException(status_code=404, detail="Account not found")
     
-    # Validate sufficient funds for withdrawals
-    if transaction.transaction_type == "withdrawal" and account.balance < transaction.amount:
-        raise HTTPException(status_code=400, detail="Insufficient funds")
-    
-    # Update account balance
-    if transaction.transaction_type == "withdrawal":
-        account.balance -= transaction.amount
-    elif transaction.transaction_type == "deposit":
-        account.balance += transaction.amount
-    
-    # Create transaction record
-    db_transaction = models.Transaction(
-        account_id=transaction.account_id,
-        transaction_type=transaction.transaction_type,
-        amount=transaction.amount,
-        description=transaction.description
+    # Newest first; the (account_id, created_at, id) index serves every page
+    # with a range seek, so deep pages cost the same as the first one.
+    # Transfers received come from the counter_account_id index the same way;
+    # each side gives at most a page and the two are merged
+    keyset = tuple_(models.Transaction.created_at, models.Transaction.id)
+    newest_first = (models.Transaction.created_at.desc(), models.Transaction.id.desc())
+    sides = []
+    for side in (models.Transaction.account_id, models.Transaction.counter_account_id):
+        page = select(models.Transaction.id).where(side == account_id)
+        if after:
+            created_at, tx_id = decode_cursor(after)
+            page = page.where(keyset < tuple_(cursor_timestamp(db, created_at), tx_id))
+        sides.append(select(page.order_by(*newest_first).limit(limit + 1).subquery()))
+    page_ids = union_all(*sides).subquery()
+    query = (
+        select(models.Transaction)
+        .join(page_ids, page_ids.c.id == models.Transaction.id)
+        .order_by(*newest_first)
+        .limit(limit + 1)
     )
-    
-    db.add(db_transaction)
-    db.commit()
-    db.refresh(db_transaction)
-    return db_transaction
+    transactions = (await db.scalars(query)).all()
+
+    next_cursor = None
+    if len(transactions) > limit:
+        transactions = transactions[:limit]
+        last = transactions[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return schemas.TransactionPage(items=transactions, next_cursor=next_cursor)
 
-@router.get("/{account_id}", response_model=List[schemas.TransactionResponse])
-def get_account_transactions(
+@router.get("/{account_id}/export")
+async def export_account_transactions(
     account_id: int,
-    db: Session = Depends(database.get_db),
+    format: Literal["csv", "ndjson"] = "ndjson",
+    start: Optional[datetime] = Query(None, description="Inclusive lower bound on created_at"),
+    end: Optional[datetime] = Query(None, description="Exclusive upper bound on created_at"),
+    gzip: bool = False,
+    db: AsyncSession = Depends(database.get_async_db),
+    session_factory: Callable = Depends(database.get_async_session_factory),
     current_user: dict = Depends(get_current_user)
 ):
-    # Check if account exists and belongs to user
-    account = db.query(models.Account).filter(
+    account = await db.scalar(select(models.Account).where(
         models.Account.id == account_id
-    ).first()
-    
+    ))
     if not account or str(account.owner) != str(current_user.id):
         raise HTTPException(status_code=404, detail="Account not found")
-    
-    transactions = db.query(models.Transaction).filter(
-        models.Transaction.account_id == account_id
-    ).all()
-    
-    return transactions
+
+    headers = {
+        "Content-Disposition": f'attachment; filename="account-{account_id}-transactions.{format}"'
+    }
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        stream_transactions(session_factory, account_id, format, start, end, compress=gzip),
+        media_type=MEDIA_TYPES[format],
+        headers=headers,
+    )
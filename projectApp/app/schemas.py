@@ -1,9 +1,19 @@
 # app/schemas.py
 
-from pydantic import BaseModel, EmailStr, ConfigDict
-from typing import Literal, Optional
+from pydantic import AliasChoices, AfterValidator, BaseModel, EmailStr, ConfigDict, Field, model_validator
+from typing import Annotated, List, Literal, Optional
 from datetime import datetime
 from app.models import KycStatusEnum
+from app.money import to_minor
+
+def _whole_cents(amount: float) -> float:
+    to_minor(amount)  # raises ValueError (a 422) for sub-cent or out-of-range amounts
+    return amount
+
+# Money in requests: a decimal amount in major units, exact to the cent
+Amount = Annotated[float, AfterValidator(_whole_cents)]
+PositiveAmount = Annotated[float, Field(gt=0), AfterValidator(_whole_cents)]
+NonNegativeAmount = Annotated[float, Field(ge=0), AfterValidator(_whole_cents)]
 
 class ErrorResponse(BaseModel):
     code: int
@@ -31,16 +41,23 @@ class KycStatusResponse(BaseModel):
 
 class AccountCreateRequest(BaseModel):
     user_id: int
-    initial_deposit: float
+    initial_deposit: NonNegativeAmount
 
 class AccountResponse(BaseModel):
     account_id: int
     user_id: int
     balance: float
 
+class AccountBalanceResponse(BaseModel):
+    account_id: int
+    as_of: datetime
+    balance: float
+    checkpoint_at: Optional[datetime] = None  # the snapshot the balance was replayed from
+    replayed_entries: int
+
 class DepositRequest(BaseModel):
     account_id: int
-    amount: float
+    amount: PositiveAmount
 
 class DepositResponse(BaseModel):
     account_id: int
@@ -54,22 +71,70 @@ class DepositResponse(BaseModel):
 # ——— Transactions ———
 
 class TransactionBase(BaseModel):
-    amount: float
+    amount: Amount
     description: Optional[str] = None
 
 class TransactionCreate(TransactionBase):
+    amount: PositiveAmount
     account_id: int
     transaction_type: Literal["deposit", "withdrawal", "transfer"]
 
+    @model_validator(mode="after")
+    def _not_a_transfer(self):
+        # Accepted by the type only to answer with a pointer rather than a bare enum error
+        if self.transaction_type == "transfer":
+            raise ValueError("transfers need a destination account: use POST /transactions/transfer")
+        return self
+
 class TransactionResponse(TransactionBase):
     id: int
     account_id: int
+    counter_account_id: Optional[int] = None  # transfers: the account credited
     transaction_type: str
     created_at: datetime
 
     class Config:
         from_attributes = True
 
+class TransactionPage(BaseModel):
+    items: List[TransactionResponse]
+    next_cursor: Optional[str] = None
+
+class TransferRequest(BaseModel):
+    from_account_id: int
+    to_account_id: int
+    amount: PositiveAmount
+    description: Optional[str] = None
+
+    @model_validator(mode="after")
+    def _distinct_accounts(self):
+        if self.from_account_id == self.to_account_id:
+            raise ValueError("Cannot transfer to the same account")
+        return self
+
+class TransferResponse(BaseModel):
+    id: int
+    from_account_id: int = Field(validation_alias=AliasChoices("account_id", "from_account_id"))
+    to_account_id: int = Field(validation_alias=AliasChoices("counter_account_id", "to_account_id"))
+    amount: float
+    description: Optional[str] = None
+    created_at: datetime
+    balance: float  # the sender's balance after the transfer
+    model_config = ConfigDict(from_attributes=True)
+
+class TransactionBatchItemResult(BaseModel):
+    index: int
+    status: Literal["applied", "rejected"]
+    transaction_id: Optional[int] = None
+    balance: Optional[float] = None
+    error: Optional[str] = None
+    model_config = ConfigDict(from_attributes=True)
+
+class TransactionBatchResponse(BaseModel):
+    applied: int
+    rejected: int
+    results: List[TransactionBatchItemResult]
+
 # ——— Admin ———
 
 class AdminStats(BaseModel):
@@ -80,10 +145,10 @@ class AdminStats(BaseModel):
 
 class UserResponse(BaseModel):
     id: int
-    name: str
+    name: str = Field(validation_alias=AliasChoices("full_name", "name"))
     email: EmailStr
     kyc_status: str
-    join_date: datetime
+    join_date: datetime = Field(validation_alias=AliasChoices("created_at", "join_date"))
     model_config = ConfigDict(from_attributes=True)
 
 class KYCResponse(BaseModel):
@@ -101,3 +166,7 @@ class SystemLogResponse(BaseModel):
     service: str
     message: str
     model_config = ConfigDict(from_attributes=True)
+
+class SystemLogPage(BaseModel):
+    items: List[SystemLogResponse]
+    next_cursor: Optional[str] = None
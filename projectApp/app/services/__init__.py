@@ -0,0 +1 @@
+"""Application services shared by the routers and the app lifecycle"""
@@ -0,0 +1,130 @@
+# app/services/activity.py
+
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Tuple
+
+from sqlalchemy import delete, distinct, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import Account, DailyActiveUserSketch, Transaction
+from app.pagination import cursor_timestamp
+from app.services.hll import HyperLogLog
+from app.services.rollups import utc_date, utc_midnight
+
+# A user is active on a day when any of their accounts has a transaction that
+# day (UTC, as in the rollups); accounts.owner holds the user id as a string
+_DAY = utc_date(Transaction.created_at)
+
+
+def _as_date(value) -> date:
+    # SQLite's date() returns text, PostgreSQL a date
+    return value if isinstance(value, date) else date.fromisoformat(value)
+
+
+def _days(start: date, end: date):
+    return [start + timedelta(days=i) for i in range((end - start).days)]
+
+
+def _activity(db: AsyncSession, start: date, end: date, *columns):
+    return (
+        select(*columns)
+        .join_from(Transaction, Account, Account.id == Transaction.account_id)
+        .where(
+            Transaction.created_at >= cursor_timestamp(db, utc_midnight(start)),
+            Transaction.created_at < cursor_timestamp(db, utc_midnight(end)),
+        )
+    )
+
+
+async def exact_daily_active(db: AsyncSession, start: date, end: date) -> Dict[date, int]:
+    """COUNT(DISTINCT owner) per day in [start, end), grouped in SQL"""
+    rows = await db.execute(
+        _activity(db, start, end, _DAY, func.count(distinct(Account.owner))).group_by(_DAY)
+    )
+    return {_as_date(day): count for day, count in rows.all()}
+
+
+async def exact_unique_active(db: AsyncSession, start: date, end: date) -> int:
+    return await db.scalar(_activity(db, start, end, func.count(distinct(Account.owner))))
+
+
+async def _day_sketches(db: AsyncSession, start: date, end: date) -> Dict[date, Tuple[int, HyperLogLog]]:
+    """(exact count, sketch) for every day in [start, end), empty days included"""
+    sketches = {day: [0, HyperLogLog()] for day in _days(start, end)}
+    result = await db.stream(
+        _activity(db, start, end, _DAY, Account.owner)
+        .distinct()
+        .execution_options(yield_per=settings.EXPORT_CHUNK_ROWS)
+    )
+    async for day, owner in result:
+        entry = sketches[_as_date(day)]
+        entry[0] += 1
+        entry[1].add(owner)
+    return {day: (count, sketch) for day, (count, sketch) in sketches.items()}
+
+
+async def build_sketches(db: AsyncSession, start: date, end: date) -> Dict[date, Tuple[int, HyperLogLog]]:
+    """(Re)compute and store the sketch rows for days in [start, end). The caller commits."""
+    sketches = await _day_sketches(db, start, end)
+    await db.execute(
+        delete(DailyActiveUserSketch).where(
+            DailyActiveUserSketch.day >= start, DailyActiveUserSketch.day < end
+        )
+    )
+    if sketches:
+        await db.execute(insert(DailyActiveUserSketch), [
+            {"day": day, "active_users": count, "registers": sketch.to_bytes()}
+            for day, (count, sketch) in sketches.items()
+        ])
+    return sketches
+
+
+async def active_users(db: AsyncSession, start: date, end: date) -> dict:
+    """Daily active users for [start, end) plus distinct users over the whole range.
+
+    Ranges up to ACTIVITY_EXACT_MAX_DAYS are answered exactly with two
+    GROUP BY / COUNT(DISTINCT) queries. Longer ranges read one stored
+    HyperLogLog sketch per closed day (building and storing any that are
+    missing) and merge them, so a 365-day query is a few hundred small reads
+    instead of a year-long scan; only today is computed from transactions.
+    """
+    days = _days(start, end)
+    if len(days) <= settings.ACTIVITY_EXACT_MAX_DAYS:
+        daily = await exact_daily_active(db, start, end)
+        return {
+            "labels": [day.strftime("%Y-%m-%d") for day in days],
+            "values": [daily.get(day, 0) for day in days],
+            "unique_users": await exact_unique_active(db, start, end),
+            "approximate": False,
+        }
+
+    today = datetime.now(timezone.utc).date()
+    closed_end = max(start, min(end, today))
+    stored = {
+        day: (count, HyperLogLog.from_bytes(registers))
+        for day, count, registers in (await db.execute(
+            select(
+                DailyActiveUserSketch.day,
+                DailyActiveUserSketch.active_users,
+                DailyActiveUserSketch.registers,
+            ).where(DailyActiveUserSketch.day >= start, DailyActiveUserSketch.day < closed_end)
+        )).all()
+    }
+    missing = [day for day in _days(start, closed_end) if day not in stored]
+    if missing:
+        # Closed days never change, so what is built here is kept for next time
+        stored.update(await build_sketches(db, min(missing), max(missing) + timedelta(days=1)))
+        await db.commit()
+    if end > today:
+        stored.update(await _day_sketches(db, today, end))
+
+    merged = HyperLogLog()
+    for _, sketch in stored.values():
+        merged.merge(sketch)
+    return {
+        "labels": [day.strftime("%Y-%m-%d") for day in days],
+        "values": [stored[day][0] for day in days],
+        "unique_users": merged.count(),
+        "approximate": True,
+    }
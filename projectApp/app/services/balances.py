@@ -0,0 +1,241 @@
+# app/services/balances.py
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import bindparam, cast, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Account, LedgerEntry, Transaction, TransactionType
+from app.money import to_major, to_minor
+from app.services.ledger import POSTING_COLUMNS, journal_transactions, postings
+from app.services.stats import stats_service
+
+
+class AccountNotFound(Exception):
+    """The account does not exist (or is not owned by the caller)"""
+
+
+class InsufficientFunds(Exception):
+    """Applying the change would take the balance below zero"""
+
+
+@dataclass
+class PostedTransaction:
+    """The inserted Transaction row plus the account balance after it"""
+    id: int
+    account_id: int
+    counter_account_id: Optional[int]
+    transaction_type: TransactionType
+    amount_minor: int
+    description: Optional[str]
+    created_at: datetime
+    balance_minor: int
+
+    @property
+    def amount(self) -> float:
+        return to_major(self.amount_minor)
+
+    @property
+    def balance(self) -> float:
+        return to_major(self.balance_minor)
+
+
+def signed_delta(transaction_type: TransactionType, amount_minor: int) -> int:
+    """How much a single-account transaction moves the balance, in minor units.
+
+    Must agree with the posting rule in ``app.services.ledger.postings``.
+    """
+    if transaction_type == TransactionType.withdrawal:
+        return -amount_minor
+    if transaction_type == TransactionType.deposit:
+        return amount_minor
+    # Transfers move money between two accounts: app.services.transfers
+    raise ValueError(f"not a single-account transaction type: {transaction_type}")
+
+
+async def post_transaction(
+    db: AsyncSession,
+    account_id: int,
+    transaction_type: TransactionType,
+    amount: float,
+    description: Optional[str] = None,
+    owner: Optional[str] = None,
+) -> PostedTransaction:
+    """Journal a transaction and move the account's cached balance atomically.
+
+    ``amount`` is in major units and must be exact to the cent. The balance
+    is changed in SQL with ``balance_minor = balance_minor + :delta`` guarded
+    by ``balance_minor + :delta >= 0``, so concurrent writers never lose
+    updates and no row lock is held across a Python round trip. On PostgreSQL
+    the update, the Transaction insert and its ledger postings go out as one
+    statement (data-modifying CTEs); other backends run UPDATE ... RETURNING,
+    the insert and the postings in the same transaction. The caller commits.
+    """
+    transaction_type = TransactionType(transaction_type)
+    amount_minor = to_minor(amount)
+    delta = signed_delta(transaction_type, amount_minor)
+
+    conditions = [Account.id == account_id, Account.balance_minor + delta >= 0]
+    if owner is not None:
+        conditions.append(Account.owner == owner)
+    updated = (
+        update(Account)
+        .where(*conditions)
+        .values(balance_minor=Account.balance_minor + delta)
+        .returning(Account.id, Account.balance_minor)
+    )
+    returned = (
+        Transaction.id,
+        Transaction.account_id,
+        Transaction.counter_account_id,
+        Transaction.transaction_type,
+        Transaction.amount_minor,
+        Transaction.description,
+        Transaction.created_at,
+    )
+
+    if db.bind.dialect.name == "postgresql":
+        updated_cte = updated.cte("updated")
+        # Explicit casts: parameters in a SELECT list would otherwise be typed as text
+        inserted_cte = (
+            insert(Transaction)
+            .from_select(
+                ["account_id", "transaction_type", "amount_minor", "description"],
+                select(
+                    updated_cte.c.id,
+                    cast(transaction_type, Transaction.transaction_type.type),
+                    cast(amount_minor, Transaction.amount_minor.type),
+                    cast(description, Transaction.description.type),
+                ),
+            )
+            .returning(*returned)
+            .cte("inserted")
+        )
+        # Nothing reads the postings; add_cte makes sure the INSERT is still emitted
+        posted_cte = insert(LedgerEntry).from_select(POSTING_COLUMNS, postings(inserted_cte)).cte("posted")
+        row = (await db.execute(
+            select(updated_cte.c.balance_minor, inserted_cte)
+            .join_from(updated_cte, inserted_cte, inserted_cte.c.account_id == updated_cte.c.id)
+            .add_cte(posted_cte)
+        )).one_or_none()
+        if row is None:
+            await _raise_rejection(db, account_id, owner)
+        stats_service.record_transaction(db, transaction_type, amount_minor)
+        return PostedTransaction(**row._mapping)
+
+    balance_row = (await db.execute(updated)).one_or_none()
+    if balance_row is None:
+        await _raise_rejection(db, account_id, owner)
+    row = (await db.execute(
+        insert(Transaction)
+        .values(
+            account_id=account_id,
+            transaction_type=transaction_type,
+            amount_minor=amount_minor,
+            description=description,
+        )
+        .returning(*returned)
+    )).one()
+    await journal_transactions(db, [row.id])
+    stats_service.record_transaction(db, transaction_type, amount_minor)
+    return PostedTransaction(balance_minor=balance_row.balance_minor, **row._mapping)
+
+
+async def _raise_rejection(db: AsyncSession, account_id: int, owner: Optional[str]) -> None:
+    # Only reached when the guarded UPDATE matched nothing
+    account_owner = await db.scalar(select(Account.owner).where(Account.id == account_id))
+    if account_owner is None or (owner is not None and account_owner != owner):
+        raise AccountNotFound(account_id)
+    raise InsufficientFunds(account_id)
+
+
+@dataclass
+class BatchItemResult:
+    index: int
+    status: str  # "applied" | "rejected"
+    transaction_id: Optional[int] = None
+    balance: Optional[float] = None
+    error: Optional[str] = None
+
+
+async def lock_accounts(db: AsyncSession, account_ids: Iterable[int]) -> Dict[int, Account]:
+    """Lock the given accounts for the rest of the transaction and load them.
+
+    Locks are always taken in ascending id order so two writers touching the
+    same accounts cannot deadlock. SQLite has no row locks; a no-op UPDATE
+    takes its database write lock up front so the reads below stay valid.
+    """
+    ids = sorted(set(account_ids))
+    if not ids:
+        return {}
+    query = select(Account).where(Account.id.in_(ids)).order_by(Account.id)
+    if db.bind.dialect.name == "postgresql":
+        query = query.with_for_update()
+    else:
+        await db.execute(
+            update(Account).where(Account.id.in_(ids)).values(balance_minor=Account.balance_minor)
+        )
+    # populate_existing: a locked read must not be served from the identity map
+    accounts = (await db.scalars(query.execution_options(populate_existing=True))).all()
+    return {account.id: account for account in accounts}
+
+
+async def post_transaction_batch(db: AsyncSession, items: List, owner: Optional[str] = None) -> List[BatchItemResult]:
+    """Apply many single-account transactions in one database transaction.
+
+    Items are grouped per account and checked for funds in submission order
+    against the locked balance; rejected items do not affect later ones. Each
+    touched account gets one net ``balance_minor + :delta`` update, all
+    accepted rows go out as a single multi-row INSERT and their ledger
+    postings as one INSERT ... SELECT. The caller commits.
+    """
+    accounts = await lock_accounts(db, (item.account_id for item in items))
+    running = {account_id: account.balance_minor for account_id, account in accounts.items()}
+    net: Dict[int, int] = {}
+    results: List[BatchItemResult] = []
+    accepted = []
+
+    for index, item in enumerate(items):
+        account = accounts.get(item.account_id)
+        if account is None or (owner is not None and account.owner != owner):
+            results.append(BatchItemResult(index=index, status="rejected", error="Account not found"))
+            continue
+        transaction_type = TransactionType(item.transaction_type)
+        amount_minor = to_minor(item.amount)
+        delta = signed_delta(transaction_type, amount_minor)
+        if running[item.account_id] + delta < 0:
+            results.append(BatchItemResult(index=index, status="rejected", error="Insufficient funds"))
+            continue
+        running[item.account_id] += delta
+        net[item.account_id] = net.get(item.account_id, 0) + delta
+        result = BatchItemResult(index=index, status="applied", balance=to_major(running[item.account_id]))
+        results.append(result)
+        accepted.append((result, {
+            "account_id": item.account_id,
+            "transaction_type": transaction_type,
+            "amount_minor": amount_minor,
+            "description": item.description,
+        }))
+
+    changes = [{"b_id": account_id, "b_delta": delta} for account_id, delta in net.items() if delta]
+    if changes:
+        accounts_table = Account.__table__
+        await db.execute(
+            update(accounts_table)
+            .where(accounts_table.c.id == bindparam("b_id"))
+            .values(balance_minor=accounts_table.c.balance_minor + bindparam("b_delta")),
+            changes,
+        )
+    if accepted:
+        inserted = await db.execute(
+            insert(Transaction).returning(Transaction.id, sort_by_parameter_order=True),
+            [row for _, row in accepted],
+        )
+        for (result, _), transaction_id in zip(accepted, inserted.scalars()):
+            result.transaction_id = transaction_id
+        await journal_transactions(db, [result.transaction_id for result, _ in accepted])
+        for _, row in accepted:
+            stats_service.record_transaction(db, row["transaction_type"], row["amount_minor"])
+    return results
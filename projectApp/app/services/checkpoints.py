@@ -0,0 +1,211 @@
+# app/services/checkpoints.py
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from sqlalchemy import BigInteger, and_, cast, func, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import database
+from app.config import settings
+from app.models import Account, BalanceCheckpoint, LedgerEntry
+from app.pagination import cursor_timestamp
+from app.services.rollups import utc_date
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PointInTimeBalance:
+    balance_minor: int
+    checkpoint_at: Optional[datetime]  # None: replayed from the first entry
+    replayed_entries: int
+
+
+def as_utc(moment: datetime) -> datetime:
+    """Naive timestamps are taken as UTC, like everything stored"""
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+
+async def balance_as_of(db: AsyncSession, account_id: int, as_of: datetime) -> PointInTimeBalance:
+    """The account's balance after every ledger entry created at or before ``as_of``.
+
+    Starts from the newest checkpoint at or before ``as_of`` and sums only
+    the entries after it, a range scan of ix_ledger_entries_account_created_id.
+    The work is bounded by the checkpoint spacing, not by the account's age.
+    """
+    as_of = as_utc(as_of)
+    checkpoint = (await db.execute(
+        select(BalanceCheckpoint.as_of, BalanceCheckpoint.balance_minor)
+        .where(BalanceCheckpoint.account_id == account_id, BalanceCheckpoint.as_of <= cursor_timestamp(db, as_of))
+        .order_by(BalanceCheckpoint.as_of.desc())
+        .limit(1)
+    )).first()
+    total = cast(func.coalesce(func.sum(LedgerEntry.amount_minor), 0), BigInteger)
+    tail = select(total, func.count()).where(
+        LedgerEntry.account_id == account_id,
+        LedgerEntry.created_at <= cursor_timestamp(db, as_of),
+    )
+    if checkpoint is not None:
+        tail = tail.where(LedgerEntry.created_at > cursor_timestamp(db, as_utc(checkpoint.as_of)))
+    total, replayed = (await db.execute(tail)).one()
+    base = checkpoint.balance_minor if checkpoint is not None else 0
+    return PointInTimeBalance(
+        balance_minor=base + total,
+        checkpoint_at=as_utc(checkpoint.as_of) if checkpoint is not None else None,
+        replayed_entries=replayed,
+    )
+
+
+def pending_checkpoints(db: AsyncSession, cutoff: datetime, every: int, first_account: int, last_account: int):
+    """SELECT the checkpoints due for accounts in [first_account, last_account].
+
+    Looks only at entries after each account's latest checkpoint and no newer
+    than ``cutoff``. Entries sharing a timestamp are grouped first, so a
+    checkpoint always covers all of them. A running sum then gives the
+    balance at each timestamp. A checkpoint is due where the running entry
+    count crosses a multiple of ``every``, and at the last timestamp of each
+    UTC day (``utc_date``, whatever the server's TimeZone). The current day only counts once ``cutoff`` has passed midnight.
+    """
+    latest = (
+        select(BalanceCheckpoint.account_id, func.max(BalanceCheckpoint.as_of).label("as_of"))
+        .where(BalanceCheckpoint.account_id.between(first_account, last_account))
+        .group_by(BalanceCheckpoint.account_id)
+        .subquery()
+    )
+    base = (
+        select(BalanceCheckpoint.account_id, BalanceCheckpoint.as_of, BalanceCheckpoint.balance_minor)
+        .join(latest, and_(latest.c.account_id == BalanceCheckpoint.account_id,
+                           latest.c.as_of == BalanceCheckpoint.as_of))
+        .subquery()
+    )
+    grouped = (
+        select(
+            LedgerEntry.account_id,
+            LedgerEntry.created_at,
+            func.sum(LedgerEntry.amount_minor).label("amount_minor"),
+            func.count().label("entries"),
+            func.coalesce(func.max(base.c.balance_minor), 0).label("opening_minor"),
+        )
+        .outerjoin(base, base.c.account_id == LedgerEntry.account_id)
+        .where(
+            LedgerEntry.account_id.between(first_account, last_account),
+            LedgerEntry.created_at <= cursor_timestamp(db, cutoff),
+            or_(base.c.as_of.is_(None), LedgerEntry.created_at > base.c.as_of),
+        )
+        .group_by(LedgerEntry.account_id, LedgerEntry.created_at)
+        .subquery()
+    )
+    window = {"partition_by": grouped.c.account_id, "order_by": grouped.c.created_at}
+    running = select(
+        grouped.c.account_id,
+        grouped.c.created_at,
+        (grouped.c.opening_minor + func.sum(grouped.c.amount_minor).over(**window)).label("balance_minor"),
+        # PostgreSQL sums integers as numeric; the count must divide as an integer
+        cast(func.sum(grouped.c.entries).over(**window), BigInteger).label("covered"),
+        grouped.c.entries,
+        func.lead(grouped.c.created_at).over(**window).label("next_at"),
+    ).subquery()
+
+    midnight = datetime.combine(cutoff.date(), datetime.min.time(), tzinfo=timezone.utc)
+    day_ends = or_(
+        utc_date(running.c.created_at) != utc_date(running.c.next_at),
+        and_(running.c.next_at.is_(None), running.c.created_at < cursor_timestamp(db, midnight)),
+    )
+    every_n = running.c.covered // every > (running.c.covered - running.c.entries) // every
+    return select(running.c.account_id, running.c.created_at, running.c.balance_minor).where(or_(every_n, day_ends))
+
+
+async def write_checkpoints(
+    session_factory: Optional[Callable] = None,
+    now: Optional[datetime] = None,
+    every: int = settings.BALANCE_CHECKPOINT_EVERY,
+    settle: float = settings.BALANCE_CHECKPOINT_SETTLE,
+    batch_accounts: int = settings.BALANCE_CHECKPOINT_BATCH_ACCOUNTS,
+) -> int:
+    """Bring every account's checkpoints up to date; returns how many were written.
+
+    Entries younger than ``settle`` seconds are left for a later run.
+    ``created_at`` is taken when the posting transaction starts, so an entry
+    may commit after a newer one. The settle delay keeps a checkpoint from
+    passing over an entry that has not committed yet. Accounts are handled
+    ``batch_accounts`` at a time, one INSERT ... SELECT and one short
+    transaction each. A repeated or concurrent run inserts nothing twice.
+    """
+    cutoff = as_utc(now or datetime.now(timezone.utc)) - timedelta(seconds=settle)
+    written = 0
+    last_id = 0
+    async with (session_factory or database.AsyncSessionLocal)() as db:
+        dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+        while True:
+            ids = (await db.scalars(
+                select(Account.id).where(Account.id > last_id).order_by(Account.id).limit(batch_accounts)
+            )).all()
+            if not ids:
+                break
+            last_id = ids[-1]
+            result = await db.execute(
+                dialect.insert(BalanceCheckpoint)
+                .from_select(["account_id", "as_of", "balance_minor"],
+                             pending_checkpoints(db, cutoff, every, ids[0], ids[-1]))
+                .on_conflict_do_nothing(index_elements=["account_id", "as_of"])
+            )
+            await db.commit()
+            written += max(result.rowcount, 0)
+    return written
+
+
+class BalanceCheckpointer:
+    """Runs ``write_checkpoints`` in the background: right away, then every ``interval`` seconds.
+
+    The first run of a fresh deployment backfills all history, so unlike log
+    maintenance it does not hold up startup (``app.cli checkpoint-balances``
+    does the same ahead of time).
+    """
+
+    def __init__(self, session_factory: Optional[Callable] = None,
+                 interval: float = settings.BALANCE_CHECKPOINT_INTERVAL):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.last_written: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop_event: Optional[asyncio.Event] = None
+
+    async def run_once(self) -> Optional[int]:
+        try:
+            self.last_written = await write_checkpoints(self.session_factory)
+        except Exception:
+            logger.exception("Balance checkpointing failed")
+            return None
+        return self.last_written
+
+    async def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        self._stop_event = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stop_event.set()
+        await self._task
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await self.run_once()
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), self.interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+
+
+balance_checkpointer = BalanceCheckpointer()
@@ -0,0 +1,209 @@
+# app/services/document_store.py
+
+import asyncio
+import hashlib
+import os
+import shutil
+from typing import Callable, Optional
+
+import aiofiles.os
+from sqlalchemy import bindparam, delete, event, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import database
+from app.config import settings
+from app.models import DocumentBlob, KycDocument
+from app.services.uploads import StoredUpload, commit_upload, discard_upload
+
+BLOBS_DIR = "blobs"
+
+
+class DocumentStore:
+    """Content-addressed file store behind ``KycDocument.file_path``.
+
+    A file is stored once per SHA-256 digest at ``blobs/ab/cd/abcd…`` under
+    the store root: ``shard_depth`` levels of ``shard_width`` hex characters,
+    so no directory holds more than 16 ** shard_width entries plus a small
+    share of the files. ``file_path`` holds that key, relative to the root;
+    legacy absolute paths still resolve to themselves.
+
+    ``document_blobs`` counts the documents referencing each digest. Identical
+    uploads share one file. A count that drops to zero only marks the blob:
+    ``collect_garbage`` removes it later under a row lock, so a concurrent
+    upload of the same content either waits for the removal or keeps the blob.
+    """
+
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        shard_depth: int = settings.DOCUMENT_STORE_SHARD_DEPTH,
+        shard_width: int = settings.DOCUMENT_STORE_SHARD_WIDTH,
+    ):
+        self._root = root
+        self.shard_depth = shard_depth
+        self.shard_width = shard_width
+
+    @property
+    def root(self) -> str:
+        # Read late so a changed UPLOAD_DIR (tests, scripts) is honoured
+        return self._root or settings.UPLOAD_DIR
+
+    def key(self, sha256: str) -> str:
+        w = self.shard_width
+        shards = [sha256[i * w:(i + 1) * w] for i in range(self.shard_depth)]
+        return "/".join([BLOBS_DIR, *shards, sha256])
+
+    def path(self, key: str) -> str:
+        if os.path.isabs(key):
+            return key
+        return os.path.join(self.root, *key.split("/"))
+
+    async def put(self, db: AsyncSession, upload: StoredUpload) -> str:
+        """Take a received upload into the store and return its key.
+
+        Adds one reference in the caller's transaction; the caller commits.
+        The blob row is written before the file is placed so that, until
+        commit, the row lock keeps ``collect_garbage`` away from it.
+        """
+        await _add_references(db, {upload.sha256: (upload.size, 1)})
+        key = self.key(upload.sha256)
+        path = self.path(key)
+        if await aiofiles.os.path.exists(path):
+            await discard_upload(upload.path)
+        else:
+            await commit_upload(upload, path)
+        return key
+
+    async def collect_garbage(self, session_factory: Optional[Callable] = None, limit: int = 1000) -> int:
+        """Remove up to ``limit`` unreferenced blobs, files first. Returns how many."""
+        async with (session_factory or database.AsyncSessionLocal)() as db:
+            digests = (await db.scalars(
+                select(DocumentBlob.sha256)
+                .where(DocumentBlob.ref_count <= 0)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            )).all()
+            for sha256 in digests:
+                await discard_upload(self.path(self.key(sha256)))
+            if digests:
+                await db.execute(
+                    delete(DocumentBlob).where(DocumentBlob.sha256.in_(digests), DocumentBlob.ref_count <= 0)
+                )
+            await db.commit()
+        return len(digests)
+
+
+document_store = DocumentStore()
+
+
+async def _add_references(db: AsyncSession, counts: dict) -> None:
+    """Upsert ``{sha256: (size, references)}`` into document_blobs"""
+    dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+    stmt = dialect.insert(DocumentBlob)
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[DocumentBlob.sha256],
+            set_={"ref_count": DocumentBlob.ref_count + stmt.excluded.ref_count},
+        ),
+        [
+            {"sha256": sha256, "size_bytes": size, "ref_count": references}
+            for sha256, (size, references) in sorted(counts.items())
+        ],
+    )
+
+
+def _hash_file(path: str, chunk_size: int) -> tuple:
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            size += len(chunk)
+            digest.update(chunk)
+    return digest.hexdigest(), size
+
+
+def _place(source: str, destination: str) -> None:
+    """Hard-link ``source`` into the store (copy across filesystems); the original stays until commit"""
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    try:
+        os.link(source, destination)
+    except FileExistsError:
+        pass
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+async def migrate_documents(
+    session_factory: Optional[Callable] = None,
+    store: Optional[DocumentStore] = None,
+    batch_size: int = 500,
+    chunk_size: int = settings.UPLOAD_CHUNK_SIZE,
+    progress: Optional[Callable[[dict], None]] = None,
+) -> dict:
+    """Re-home every KycDocument that is not yet in the store.
+
+    Documents are processed in id order, ``batch_size`` per transaction:
+    files are hashed and linked into their blob path, references for the
+    whole batch go in with one upsert and the rows with one executemany, and
+    only after commit are the old files removed. An interrupted run is
+    safe to repeat. Documents whose file is missing are counted and left alone.
+    """
+    store = store or document_store
+    summary = {"migrated": 0, "deduplicated": 0, "missing": 0}
+    last_id = 0
+    async with (session_factory or database.AsyncSessionLocal)() as db:
+        while True:
+            rows = (await db.execute(
+                select(KycDocument.id, KycDocument.file_path)
+                .where(KycDocument.id > last_id, ~KycDocument.file_path.startswith(f"{BLOBS_DIR}/"))
+                .order_by(KycDocument.id)
+                .limit(batch_size)
+            )).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            counts, updates, originals = {}, [], []
+            for document_id, file_path in rows:
+                source = store.path(file_path)
+                if not os.path.isfile(source):
+                    summary["missing"] += 1
+                    continue
+                sha256, size = await asyncio.to_thread(_hash_file, source, chunk_size)
+                key = store.key(sha256)
+                destination = store.path(key)
+                if sha256 in counts or os.path.exists(destination):
+                    summary["deduplicated"] += 1
+                await asyncio.to_thread(_place, source, destination)
+                counts[sha256] = (size, counts.get(sha256, (size, 0))[1] + 1)
+                updates.append({"doc_id": document_id, "key": key, "digest": sha256, "size": size})
+                originals.append(source)
+
+            if updates:
+                await _add_references(db, counts)
+                documents = KycDocument.__table__
+                await db.execute(
+                    update(documents)
+                    .where(documents.c.id == bindparam("doc_id"))
+                    .values(file_path=bindparam("key"), sha256=bindparam("digest"), size_bytes=bindparam("size")),
+                    updates,
+                )
+            await db.commit()
+            for source in originals:
+                await discard_upload(source)
+            summary["migrated"] += len(updates)
+            if progress is not None:
+                progress(summary)
+    return summary
+
+
+@event.listens_for(KycDocument, "after_delete")
+def _release_blob(_mapper, connection, target):
+    # Unreferenced blobs are left for DocumentStore.collect_garbage
+    if target.sha256 and (target.file_path or "").startswith(f"{BLOBS_DIR}/"):
+        connection.execute(
+            update(DocumentBlob)
+            .where(DocumentBlob.sha256 == target.sha256)
+            .values(ref_count=DocumentBlob.ref_count - 1)
+        )
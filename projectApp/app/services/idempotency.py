@@ -0,0 +1,291 @@
+# app/services/idempotency.py
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+from pydantic import BaseModel
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import database
+from app.config import settings
+from app.models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+class IdempotencyKeyReused(Exception):
+    """The key was first used with a different request body"""
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    fingerprint: str
+    status_code: int
+    body: str  # JSON text, replayed byte for byte
+    expires_at: float  # epoch seconds
+
+
+def fingerprint(payload: BaseModel) -> str:
+    return hashlib.sha256(payload.model_dump_json().encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """Stored responses of money-moving POSTs, keyed by (scope, Idempotency-Key).
+
+    The ``idempotency_keys`` row is written in the caller's transaction,
+    together with the change it records, so a response is stored exactly
+    when its change committed. Completed responses are also kept in a
+    bounded in-memory LRU until they expire, so a retry storm costs one
+    dictionary lookup per request. Concurrent duplicates in this process
+    wait on the first one instead of racing it. In another process, the
+    loser's insert of the same key fails and its whole transaction rolls
+    back, money movement included, before the winner's response is replayed.
+
+    Only successful responses are stored. A request that fails leaves
+    nothing behind, and its retry runs again.
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable] = None,
+        ttl: float = settings.IDEMPOTENCY_TTL,
+        max_entries: int = settings.IDEMPOTENCY_CACHE_SIZE,
+        purge_interval: float = settings.IDEMPOTENCY_PURGE_INTERVAL,
+    ):
+        self.session_factory = session_factory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.purge_interval = purge_interval
+        self._entries: "OrderedDict[Tuple[str, str], StoredResponse]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._stop_event: Optional[asyncio.Event] = None
+        self.cache_hits = 0
+        self.db_hits = 0
+        self.coalesced = 0
+        self.executed = 0
+        self.races_lost = 0
+        self.purged = 0
+
+    async def execute(
+        self,
+        db: AsyncSession,
+        scope: str,
+        key: str,
+        request_fingerprint: str,
+        work: Callable[[], Awaitable[Tuple[int, object]]],
+    ) -> Tuple[StoredResponse, bool]:
+        """Run ``work`` once per (scope, key); returns the response and whether it was replayed.
+
+        ``work`` applies the change in ``db`` without committing and returns
+        (status code, JSON-able body). This commits it together with the
+        stored response. Raises ``IdempotencyKeyReused`` when the key comes
+        back with a different request.
+        """
+        ident = (scope, key)
+        waited = False
+        while True:
+            stored = self._lookup(ident)
+            if stored is not None:
+                self.cache_hits += 1
+                return self._replay(stored, request_fingerprint), True
+            pending = self._inflight.get(ident)
+            if pending is None:
+                break
+            if not waited:
+                self.coalesced += 1
+                waited = True
+            await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[ident] = future
+        try:
+            return await self._execute(db, ident, request_fingerprint, work)
+        finally:
+            del self._inflight[ident]
+            # Waiters re-check the cache; after a failure they run the request themselves
+            future.set_result(None)
+
+    async def _execute(self, db, ident, request_fingerprint, work) -> Tuple[StoredResponse, bool]:
+        now = datetime.now(timezone.utc)
+        stored = await self._load(db, ident, now)
+        if stored is not None:
+            self.db_hits += 1
+            return self._replay(stored, request_fingerprint), True
+
+        try:
+            status_code, body = await work()
+        except BaseException:
+            await db.rollback()
+            raise
+        expires_at = now + timedelta(seconds=self.ttl)
+        stored = StoredResponse(request_fingerprint, status_code, json.dumps(body), expires_at.timestamp())
+        dialect = postgresql if db.bind.dialect.name == "postgresql" else sqlite
+        values = {
+            "scope": ident[0],
+            "key": ident[1],
+            "fingerprint": stored.fingerprint,
+            "status_code": stored.status_code,
+            "response_body": stored.body,
+            "expires_at": expires_at,
+        }
+        insert = dialect.insert(IdempotencyKey).values(**values)
+        # An expired record of the same key is taken over; a live one means we lost a race
+        upsert = insert.on_conflict_do_update(
+            index_elements=[IdempotencyKey.scope, IdempotencyKey.key],
+            set_={name: insert.excluded[name] for name in values if name not in ("scope", "key")},
+            where=IdempotencyKey.expires_at <= now,
+        )
+        try:
+            claimed = (await db.execute(upsert)).rowcount == 1
+            if claimed:
+                await db.commit()
+        except IntegrityError:
+            claimed = False
+        if not claimed:
+            # Another process committed the same key first: undo ours, replay theirs
+            await db.rollback()
+            self.races_lost += 1
+            stored = await self._load(db, ident, now)
+            if stored is None:
+                raise RuntimeError(f"idempotency key {ident} is claimed but not readable")
+            return self._replay(stored, request_fingerprint), True
+        self.executed += 1
+        self._remember(ident, stored)
+        return stored, False
+
+    async def _load(self, db: AsyncSession, ident, now: datetime) -> Optional[StoredResponse]:
+        record = (await db.execute(
+            select(IdempotencyKey.fingerprint, IdempotencyKey.status_code,
+                   IdempotencyKey.response_body, IdempotencyKey.expires_at)
+            .where(IdempotencyKey.scope == ident[0], IdempotencyKey.key == ident[1],
+                   IdempotencyKey.expires_at > now)
+        )).first()
+        if record is None:
+            return None
+        expires_at = record.expires_at
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        stored = StoredResponse(record.fingerprint, record.status_code, record.response_body, expires_at.timestamp())
+        self._remember(ident, stored)
+        return stored
+
+    @staticmethod
+    def _replay(stored: StoredResponse, request_fingerprint: str) -> StoredResponse:
+        if stored.fingerprint != request_fingerprint:
+            raise IdempotencyKeyReused()
+        return stored
+
+    def _lookup(self, ident) -> Optional[StoredResponse]:
+        stored = self._entries.get(ident)
+        if stored is None:
+            return None
+        if stored.expires_at <= time.time():
+            del self._entries[ident]
+            return None
+        self._entries.move_to_end(ident)
+        return stored
+
+    def _remember(self, ident, stored: StoredResponse) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[ident] = stored
+        self._entries.move_to_end(ident)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    async def purge_expired(self) -> int:
+        """Delete expired keys from the table; returns how many"""
+        async with (self.session_factory or database.AsyncSessionLocal)() as db:
+            result = await db.execute(
+                delete(IdempotencyKey).where(IdempotencyKey.expires_at <= datetime.now(timezone.utc))
+            )
+            await db.commit()
+        self.purged += result.rowcount
+        return result.rowcount
+
+    async def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        self._stop_event = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stop_event.set()
+        await self._task
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), self.purge_interval)
+                return
+            except asyncio.TimeoutError:
+                try:
+                    await self.purge_expired()
+                except Exception:
+                    logger.exception("Purging expired idempotency keys failed")
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "in_flight": len(self._inflight),
+            "cache_hits": self.cache_hits,
+            "db_hits": self.db_hits,
+            "coalesced": self.coalesced,
+            "executed": self.executed,
+            "races_lost": self.races_lost,
+            "purged": self.purged,
+        }
+
+
+idempotency_store = IdempotencyStore()
+
+
+async def idempotent_response(
+    db: AsyncSession,
+    scope: str,
+    key: str,
+    payload: BaseModel,
+    work: Callable[[], Awaitable[BaseModel]],
+):
+    """Route helper: run ``work`` under ``key`` and answer with the stored response.
+
+    ``work`` returns the response model without committing. Replays carry an
+    ``Idempotent-Replayed: true`` header.
+    """
+    async def run():
+        response = await work()
+        return 200, response.model_dump(mode="json")
+
+    try:
+        stored, replayed = await idempotency_store.execute(db, scope, key, fingerprint(payload), run)
+    except IdempotencyKeyReused:
+        raise HTTPException(status_code=422, detail=f"{IDEMPOTENCY_HEADER} was already used with a different request")
+    return Response(
+        content=stored.body,
+        status_code=stored.status_code,
+        media_type="application/json",
+        headers={REPLAYED_HEADER: "true"} if replayed else None,
+    )
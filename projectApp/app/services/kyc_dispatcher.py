@@ -0,0 +1,393 @@
+# app/services/kyc_dispatcher.py
+
+import asyncio
+import logging
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import httpx
+from sqlalchemy import or_, select, update
+
+from app import database
+from app.auth.principal_cache import principal_cache
+from app.config import settings
+from app.models import KycDocument, KycStatusEnum, User
+
+logger = logging.getLogger(__name__)
+
+
+class KycJob(NamedTuple):
+    document_id: int
+    user_id: int
+    document_url: str
+
+
+def document_url(file_name: str) -> str:
+    """Where the provider fetches an uploaded document from"""
+    return f"{str(settings.KYC_API_URL).rstrip('/')}/files/{file_name}"
+
+
+class _Retry(Exception):
+    pass
+
+
+class KycDispatcher:
+    """Sends uploaded KYC documents to the provider and records the verdicts.
+
+    ``submit`` queues a document without blocking. ``concurrency`` workers
+    share one ``httpx.AsyncClient`` whose connection pool is the same size, so
+    keep-alive connections are reused across documents. Transport errors,
+    429s and 5xx responses are retried with exponential backoff and full
+    jitter, up to ``max_attempts`` calls. Verdicts are buffered and written
+    in bulk: one UPDATE per table and status for every ``batch_size`` results
+    or ``flush_interval`` seconds.
+
+    A document whose calls all fail, or that is still queued or in flight
+    when the app stops, stays pending. On start, pending documents are
+    queued again. A batch whose write fails is kept for the next flush.
+
+    Every queued document is claimed first: ``claimed_at`` is set by the
+    process that will send it (the register route for new documents), so
+    several workers starting at once never queue the same document twice.
+    Requeue claims ``requeue_page_size`` documents at a time with ``FOR UPDATE
+    SKIP LOCKED`` and only while half the queue is free, leaving room for new
+    registrations; later pages follow in the background as the queue drains.
+    Give-ups and documents still queued or in flight at stop release their claim. A claim
+    older than ``claim_timeout`` belongs to a worker that died and is taken
+    over by the next requeue.
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable] = None,
+        concurrency: int = settings.KYC_CONCURRENCY,
+        timeout: float = settings.KYC_TIMEOUT,
+        max_attempts: int = settings.KYC_MAX_ATTEMPTS,
+        backoff_base: float = settings.KYC_BACKOFF_BASE,
+        backoff_max: float = settings.KYC_BACKOFF_MAX,
+        max_queue_size: int = settings.KYC_QUEUE_MAX_SIZE,
+        batch_size: int = settings.KYC_WRITE_BATCH_SIZE,
+        flush_interval: float = settings.KYC_WRITE_FLUSH_INTERVAL,
+        drain_timeout: float = settings.KYC_DRAIN_TIMEOUT,
+        requeue_pending: bool = settings.KYC_REQUEUE_PENDING,
+        requeue_page_size: int = settings.KYC_REQUEUE_PAGE_SIZE,
+        claim_timeout: float = settings.KYC_CLAIM_TIMEOUT,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.session_factory = session_factory
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.drain_timeout = drain_timeout
+        self.requeue_pending = requeue_pending
+        self.requeue_page_size = max(1, requeue_page_size)
+        self.claim_timeout = claim_timeout
+        # Tests and benchmarks point this at the stub provider (app/kyc_stub.py)
+        self.transport = transport
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._writer: Optional[asyncio.Task] = None
+        self._requeuer: Optional[asyncio.Task] = None
+        # A None status releases the document's claim instead of writing a verdict
+        self._results: List[Tuple[KycJob, Optional[KycStatusEnum]]] = []
+        # Taken off the queue and awaiting the provider, by document id
+        self._in_flight: Dict[int, KycJob] = {}
+        self._batch_ready: Optional[asyncio.Event] = None
+        self._stopping = False
+
+        self.enqueued = 0
+        self.requeued = 0
+        self.dropped = 0
+        self.calls = 0
+        self.retries = 0
+        self.verified = 0
+        self.failed = 0
+        self.gave_up = 0
+        self.written = 0
+        self.write_errors = 0
+        self.flushes = 0
+
+    @property
+    def running(self) -> bool:
+        return self._writer is not None and not self._writer.done()
+
+    def submit(self, document_id: int, user_id: int, url: str) -> bool:
+        """Queue a document for verification. Returns False if it was not queued."""
+        if self._queue is None or self._stopping:
+            self.dropped += 1
+            return False
+        try:
+            self._queue.put_nowait(KycJob(document_id, user_id, url))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        # Queue, event and client bind to the running loop, so they are created here
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._batch_ready = asyncio.Event()
+        self._stopping = False
+        self._client = httpx.AsyncClient(
+            transport=self.transport,
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.concurrency,
+                max_keepalive_connections=self.concurrency,
+            ),
+            headers={"Authorization": f"Bearer {settings.KYC_API_KEY}"},
+        )
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+        self._writer = asyncio.create_task(self._write())
+        if self.requeue_pending:
+            # The first page is queued before start returns; the rest as the queue drains
+            try:
+                more = await self._requeue_page()
+            except Exception:
+                logger.exception("Could not queue pending KYC documents")
+                more = False
+            if more:
+                self._requeuer = asyncio.create_task(self._requeue_rest())
+
+    async def stop(self) -> None:
+        """Stop accepting documents, give in-flight ones ``drain_timeout`` seconds, write all verdicts"""
+        if self._writer is None:
+            return
+        self._stopping = True
+        if self._requeuer is not None:
+            self._requeuer.cancel()
+            await asyncio.gather(self._requeuer, return_exceptions=True)
+            self._requeuer = None
+        try:
+            await asyncio.wait_for(self._queue.join(), self.drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("KYC dispatcher stopped with %d documents still pending", self._queue.qsize())
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        # Cut off mid-call or never sent: let the next requeue, here or in another worker, have them
+        self._results.extend((job, None) for job in self._in_flight.values())
+        self._in_flight.clear()
+        while not self._queue.empty():
+            self._results.append((self._queue.get_nowait(), None))
+        self._batch_ready.set()
+        await self._writer
+        await self._client.aclose()
+        self._workers, self._writer, self._client, self._queue = [], None, None, None
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "unwritten": len(self._results),
+            "enqueued": self.enqueued,
+            "requeued": self.requeued,
+            "dropped": self.dropped,
+            "calls": self.calls,
+            "retries": self.retries,
+            "verified": self.verified,
+            "failed": self.failed,
+            "gave_up": self.gave_up,
+            "written": self.written,
+            "write_errors": self.write_errors,
+            "flushes": self.flushes,
+        }
+
+    def _session(self):
+        return (self.session_factory or database.AsyncSessionLocal)()
+
+    def _requeue_room(self) -> int:
+        """Documents the next page may claim: half the queue stays free for registrations"""
+        room = self.requeue_page_size
+        if self.max_queue_size > 0:
+            room = min(room, self.max_queue_size // 2 - self._queue.qsize())
+        return room
+
+    async def _claim(self, limit: int) -> List[KycJob]:
+        """Claim up to ``limit`` pending documents nobody holds, oldest first"""
+        now = datetime.now(timezone.utc)
+        async with self._session() as db:
+            claimable = (
+                select(KycDocument.id)
+                .where(
+                    KycDocument.doc_status == KycStatusEnum.pending,
+                    or_(KycDocument.claimed_at.is_(None),
+                        KycDocument.claimed_at < now - timedelta(seconds=self.claim_timeout)),
+                )
+                .order_by(KycDocument.id)
+                .limit(limit)
+                # Rows another worker is claiming right now are skipped, not waited for
+                .with_for_update(skip_locked=True)
+            )
+            rows = (await db.execute(
+                update(KycDocument)
+                .where(KycDocument.id.in_(claimable.scalar_subquery()))
+                .values(claimed_at=now)
+                .returning(KycDocument.id, KycDocument.user_id, KycDocument.file_name)
+                .execution_options(synchronize_session=False)
+            )).all()
+            await db.commit()
+        return [KycJob(document_id, user_id, document_url(file_name))
+                for document_id, user_id, file_name in sorted(rows)]
+
+    async def _requeue_page(self) -> bool:
+        """Claim and queue one page of pending documents. Returns whether more may be waiting."""
+        room = self._requeue_room()
+        if room <= 0:
+            return True
+        jobs = await self._claim(room)
+        refused = [job.document_id for job in jobs if not self.submit(*job)]
+        if refused:
+            await self.release(refused)
+        self.requeued += len(jobs) - len(refused)
+        if jobs:
+            logger.info("Queued %d pending KYC documents", len(jobs) - len(refused))
+        return len(jobs) == room
+
+    async def _requeue_rest(self) -> None:
+        while not self._stopping:
+            try:
+                if not await self._requeue_page():
+                    return
+            except Exception:
+                logger.exception("Could not queue pending KYC documents")
+                return
+            await asyncio.sleep(self.flush_interval)
+
+    async def release(self, document_ids: Iterable[int]) -> None:
+        """Drop the claim on documents this process will not send, so a requeue picks them up"""
+        document_ids = list(document_ids)
+        try:
+            async with self._session() as db:
+                await db.execute(
+                    update(KycDocument)
+                    .where(KycDocument.id.in_(document_ids), KycDocument.doc_status == KycStatusEnum.pending)
+                    .values(claimed_at=None)
+                )
+                await db.commit()
+        except Exception:
+            # They are taken over once the claim times out
+            logger.exception("Could not release %d KYC documents", len(document_ids))
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+            self._in_flight[job.document_id] = job
+            try:
+                status = await self._verify(job)
+            except Exception:
+                logger.exception("KYC verification of document %d failed", job.document_id)
+                status = None
+            finally:
+                self._queue.task_done()
+            # Left in place when cancelled, for stop to release
+            del self._in_flight[job.document_id]
+            if status is None:
+                self.gave_up += 1
+                self._results.append((job, None))
+                continue
+            if status is KycStatusEnum.verified:
+                self.verified += 1
+            else:
+                self.failed += 1
+            self._results.append((job, status))
+            if len(self._results) >= self.batch_size:
+                self._batch_ready.set()
+
+    async def _verify(self, job: KycJob) -> Optional[KycStatusEnum]:
+        """The provider's verdict, or None when it never gave one"""
+        for attempt in range(self.max_attempts):
+            if attempt:
+                self.retries += 1
+                delay = min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))
+                await asyncio.sleep(random.uniform(0, delay))
+            self.calls += 1
+            try:
+                response = await self._client.post(
+                    str(settings.KYC_API_URL),
+                    json={"user_id": job.user_id, "document_url": job.document_url},
+                )
+            except httpx.TransportError as exc:
+                logger.warning("KYC provider unreachable for document %d: %s", job.document_id, exc)
+                continue
+            if response.status_code == 429 or response.status_code >= 500:
+                continue
+            if response.is_success:
+                verdict = response.json().get("status")
+                return KycStatusEnum.verified if verdict == "verified" else KycStatusEnum.failed
+            # 401, 404...: a configuration problem, not a verdict on the user
+            logger.error("KYC provider rejected document %d with %d", job.document_id, response.status_code)
+            return None
+        logger.warning("KYC provider gave no verdict for document %d after %d calls",
+                       job.document_id, self.max_attempts)
+        return None
+
+    async def _write(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+            if self._results:
+                await self._flush()
+            if self._stopping and not self._workers_alive():
+                if self._results:
+                    await self._flush()
+                return
+
+    def _workers_alive(self) -> bool:
+        return any(not worker.done() for worker in self._workers)
+
+    async def _flush(self) -> None:
+        batch, self._results = self._results, []
+        by_status: Dict[Optional[KycStatusEnum], List[KycJob]] = {}
+        for job, status in batch:
+            by_status.setdefault(status, []).append(job)
+        released = by_status.pop(None, [])
+        verdicts = [(job, status) for job, status in batch if status is not None]
+        try:
+            async with self._session() as db:
+                if released:
+                    await db.execute(
+                        update(KycDocument)
+                        .where(KycDocument.id.in_([job.document_id for job in released]),
+                               KycDocument.doc_status == KycStatusEnum.pending)
+                        .values(claimed_at=None)
+                    )
+                for status, jobs in by_status.items():
+                    await db.execute(
+                        update(KycDocument)
+                        .where(KycDocument.id.in_([job.document_id for job in jobs]))
+                        .values(doc_status=status)
+                    )
+                    await db.execute(
+                        update(User)
+                        .where(User.id.in_({job.user_id for job in jobs}))
+                        .values(kyc_status=status)
+                    )
+                await db.commit()
+        except Exception:
+            self.write_errors += len(verdicts)
+            logger.exception("Failed to write %d KYC verdicts", len(verdicts))
+            # Retried on the next flush, ahead of anything that arrived meanwhile
+            self._results[:0] = batch
+        else:
+            self.written += len(verdicts)
+            # Core UPDATEs skip the ORM hooks that normally evict cached principals
+            for user_id in {job.user_id for job, _ in verdicts}:
+                principal_cache.invalidate_user(user_id)
+        self.flushes += 1
+
+
+kyc_dispatcher = KycDispatcher()
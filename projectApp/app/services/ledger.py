@@ -0,0 +1,106 @@
+# app/services/ledger.py
+
+from typing import Dict, Iterable, List
+
+from sqlalchemy import BigInteger, and_, case, cast, event, func, insert, or_, select, union_all, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Account, LedgerEntry, Transaction, TransactionType
+
+POSTING_COLUMNS = ["transaction_id", "account_id", "amount_minor", "created_at"]
+
+
+class LedgerIntegrityError(Exception):
+    """Something tried to change a journal entry after it was written"""
+
+
+def postings(source):
+    """SELECT the journal entries for the transaction rows in ``source``.
+
+    ``source`` is anything with the columns id, account_id,
+    counter_account_id, transaction_type, amount_minor and created_at: the
+    transactions table itself, or the RETURNING of an INSERT used as a CTE. A
+    deposit credits the account and debits settlement, a withdrawal the
+    reverse, a transfer debits the account and credits the counter account;
+    each pair sums to zero. The second leg goes to counter_account_id, which
+    is NULL (settlement) for anything but a transfer. Transfers without a
+    counter account move no money and post nothing.
+    """
+    c = source.c
+    signed = case(
+        (c.transaction_type.in_([TransactionType.withdrawal, TransactionType.transfer]), -c.amount_minor),
+        else_=c.amount_minor,
+    )
+    moves_money = or_(
+        c.transaction_type.in_([TransactionType.deposit, TransactionType.withdrawal]),
+        and_(c.transaction_type == TransactionType.transfer, c.counter_account_id.is_not(None)),
+    )
+    return union_all(
+        select(c.id, c.account_id, cast(signed, BigInteger), c.created_at).where(moves_money),
+        select(c.id, c.counter_account_id, cast(-signed, BigInteger), c.created_at).where(moves_money),
+    )
+
+
+async def journal_transactions(db: AsyncSession, transaction_ids: Iterable[int]) -> None:
+    """Post the entries for already-inserted transactions, as one INSERT ... SELECT.
+
+    created_at is copied in SQL, so entries carry exactly the stored
+    timestamp of their transaction. The caller commits.
+    """
+    ids = list(transaction_ids)
+    if not ids:
+        return
+    source = select(Transaction).where(Transaction.id.in_(ids)).subquery()
+    await db.execute(insert(LedgerEntry).from_select(POSTING_COLUMNS, postings(source)))
+
+
+async def verify_ledger(db: AsyncSession, sample: int = 20) -> Dict[str, List]:
+    """Integer checks of the journal against itself and the cached balances.
+
+    ``unbalanced``: transactions whose postings do not sum to zero.
+    ``drifted``: (account id, cached balance, journal balance) where they differ.
+    """
+    unbalanced = (await db.scalars(
+        select(LedgerEntry.transaction_id)
+        .group_by(LedgerEntry.transaction_id)
+        .having(func.sum(LedgerEntry.amount_minor) != 0)
+        .limit(sample)
+    )).all()
+    journal = (
+        select(LedgerEntry.account_id, func.sum(LedgerEntry.amount_minor).label("total"))
+        .where(LedgerEntry.account_id.is_not(None))
+        .group_by(LedgerEntry.account_id)
+        .subquery()
+    )
+    total = func.coalesce(journal.c.total, 0)
+    drifted = (await db.execute(
+        select(Account.id, Account.balance_minor, total)
+        .outerjoin(journal, journal.c.account_id == Account.id)
+        .where(Account.balance_minor != total)
+        .order_by(Account.id)
+        .limit(sample)
+    )).all()
+    return {"unbalanced": list(unbalanced), "drifted": [tuple(row) for row in drifted]}
+
+
+async def rebuild_balances(db: AsyncSession) -> int:
+    """Recompute every cached balance from the journal; returns the rows corrected. The caller commits."""
+    journal_total = (
+        select(func.coalesce(func.sum(LedgerEntry.amount_minor), 0))
+        .where(LedgerEntry.account_id == Account.id)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        update(Account)
+        .where(Account.balance_minor != journal_total)
+        .values(balance_minor=journal_total)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+@event.listens_for(LedgerEntry, "before_update")
+@event.listens_for(LedgerEntry, "before_delete")
+def _refuse_journal_changes(_mapper, _connection, target):
+    # PostgreSQL enforces the same with a trigger (see the Alembic revision)
+    raise LedgerIntegrityError(f"ledger entry {target.id} is append-only")
@@ -0,0 +1,204 @@
+# app/services/log_retention.py
+
+import asyncio
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, text
+
+from app import database
+from app.config import settings
+from app.models import SystemLog
+
+logger = logging.getLogger(__name__)
+
+TABLE = SystemLog.__tablename__
+_UPPER_BOUND = re.compile(r"TO \('([^']+)'\)")
+
+
+def month_start(moment: datetime) -> datetime:
+    return moment.astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, count: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{TABLE}_{month.year:04d}_{month.month:02d}"
+
+
+def partition_bounds(bound_expressions: Dict[str, str]) -> Dict[str, Optional[datetime]]:
+    """Upper bound of each range partition, from pg_get_expr(relpartbound); None for DEFAULT"""
+    bounds = {}
+    for name, expression in bound_expressions.items():
+        match = _UPPER_BOUND.search(expression or "")
+        bounds[name] = datetime.fromisoformat(match.group(1)) if match else None
+    return bounds
+
+
+async def is_partitioned(db) -> bool:
+    if db.bind.dialect.name != "postgresql":
+        return False
+    kind = await db.scalar(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)"), {"table": TABLE}
+    )
+    return kind == "p"
+
+
+async def list_partitions(db) -> Dict[str, Optional[datetime]]:
+    rows = await db.execute(text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+        "FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:table)"
+    ), {"table": TABLE})
+    return partition_bounds(dict(rows.all()))
+
+
+async def split_default(db, default: str, name: str, month: datetime, following: datetime) -> int:
+    """Give a month that already has rows in the DEFAULT partition its own partition.
+
+    PostgreSQL refuses ``CREATE TABLE ... PARTITION OF`` while DEFAULT holds
+    rows in the new range, so the month is built as a plain table, the rows
+    are moved over and the table is attached. Returns the rows moved.
+    """
+    window = {"start": month, "end": following}
+    # Writers wait until the month is attached, so nothing new lands in DEFAULT meanwhile
+    await db.execute(text(f'LOCK TABLE "{default}" IN EXCLUSIVE MODE'))
+    await db.execute(text(f'CREATE TABLE "{name}" (LIKE "{TABLE}" INCLUDING DEFAULTS)'))
+    moved = await db.execute(text(
+        f'WITH moved AS (DELETE FROM "{default}" WHERE timestamp >= :start AND timestamp < :end RETURNING *) '
+        f'INSERT INTO "{name}" SELECT * FROM moved'
+    ), window)
+    await db.execute(text(
+        f'ALTER TABLE "{TABLE}" ATTACH PARTITION "{name}" '
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')"
+    ))
+    return moved.rowcount
+
+
+async def ensure_partitions(db, now: datetime, months_ahead: int) -> List[str]:
+    """Create the monthly partitions for this month and ``months_ahead`` more.
+
+    Months already covered by an existing partition (including the legacy
+    one attached by the migration) are skipped. A month whose rows already
+    went to the DEFAULT partition is split out of it. Returns the names created.
+    """
+    existing = await list_partitions(db)
+    covered_until = max((bound for bound in existing.values() if bound is not None), default=None)
+    default = next((name for name, bound in existing.items() if bound is None), None)
+    created = []
+    month = month_start(now)
+    for _ in range(months_ahead + 1):
+        name = partition_name(month)
+        following = add_months(month, 1)
+        if name not in existing and (covered_until is None or month >= covered_until):
+            if default is not None and await db.scalar(text(
+                f'SELECT EXISTS (SELECT 1 FROM "{default}" WHERE timestamp >= :start AND timestamp < :end)'
+            ), {"start": month, "end": following}):
+                moved = await split_default(db, default, name, month, following)
+                logger.warning("Moved %d system log rows from %s into new partition %s", moved, default, name)
+            else:
+                await db.execute(text(
+                    f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{TABLE}" '
+                    f"FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')"
+                ))
+            created.append(name)
+        month = following
+    return created
+
+
+async def expire_partitions(db, cutoff: datetime, archive: bool) -> List[Tuple[str, str]]:
+    """Detach every partition that ends at or before ``cutoff`` and drop it (or keep
+    it as a standalone table when archiving). Whole partitions go at once: no
+    row-by-row DELETE, no table bloat."""
+    expired = []
+    for name, upper in sorted((await list_partitions(db)).items()):
+        if upper is None or upper > cutoff:
+            continue
+        await db.execute(text(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{name}"'))
+        if archive:
+            expired.append((name, "archived"))
+        else:
+            await db.execute(text(f'DROP TABLE "{name}"'))
+            expired.append((name, "dropped"))
+    return expired
+
+
+async def run_log_maintenance(
+    session_factory: Optional[Callable] = None,
+    now: Optional[datetime] = None,
+    retention_days: int = settings.LOG_RETENTION_DAYS,
+    months_ahead: int = settings.LOG_PARTITION_MONTHS_AHEAD,
+    archive: bool = settings.LOG_ARCHIVE_EXPIRED,
+) -> dict:
+    """Roll the system log store forward and apply retention.
+
+    On a partitioned PostgreSQL table (see the Alembic revision) this creates
+    upcoming monthly partitions and detaches/drops the expired ones. Anywhere
+    else it falls back to a single range DELETE on the indexed timestamp.
+    ``retention_days`` <= 0 keeps everything.
+    """
+    now = now or datetime.now(timezone.utc)
+    cutoff = now - timedelta(days=retention_days) if retention_days > 0 else None
+    summary = {"partitioned": False, "created": [], "expired": [], "deleted_rows": 0}
+    async with (session_factory or database.AsyncSessionLocal)() as db:
+        if await is_partitioned(db):
+            summary["partitioned"] = True
+            summary["created"] = await ensure_partitions(db, now, months_ahead)
+            if cutoff is not None:
+                summary["expired"] = await expire_partitions(db, cutoff, archive)
+        elif cutoff is not None:
+            result = await db.execute(delete(SystemLog).where(SystemLog.timestamp < cutoff))
+            summary["deleted_rows"] = result.rowcount
+        await db.commit()
+    return summary
+
+
+class LogMaintenance:
+    """Runs ``run_log_maintenance`` at startup and every ``interval`` seconds"""
+
+    def __init__(self, session_factory: Optional[Callable] = None,
+                 interval: float = settings.LOG_MAINTENANCE_INTERVAL):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.last_run: Optional[dict] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop_event: Optional[asyncio.Event] = None
+
+    async def run_once(self) -> Optional[dict]:
+        try:
+            self.last_run = await run_log_maintenance(self.session_factory)
+        except Exception:
+            logger.exception("System log maintenance failed")
+            return None
+        return self.last_run
+
+    async def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        self._stop_event = asyncio.Event()
+        await self.run_once()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stop_event.set()
+        await self._task
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), self.interval)
+                return
+            except asyncio.TimeoutError:
+                await self.run_once()
+
+
+log_maintenance = LogMaintenance()
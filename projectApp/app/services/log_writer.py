@@ -0,0 +1,162 @@
+# app/services/log_writer.py
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+
+from sqlalchemy import insert
+
+from app import database
+from app.config import settings
+from app.models import SystemLog
+
+logger = logging.getLogger(__name__)
+
+
+class SystemLogWriter:
+    """Buffers SystemLog rows in memory and writes them to the database in bulk.
+
+    The request middleware calls ``submit`` which never blocks; a background task
+    flushes the queue whenever ``batch_size`` rows are waiting or ``flush_interval``
+    seconds have passed. When the queue fills up INFO records are sampled and,
+    once it is full, new records are dropped. Every decision is counted.
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable] = None,
+        max_queue_size: int = settings.LOG_QUEUE_MAX_SIZE,
+        batch_size: int = settings.LOG_BATCH_SIZE,
+        flush_interval: float = settings.LOG_FLUSH_INTERVAL,
+        sample_high_water: float = settings.LOG_SAMPLE_HIGH_WATER,
+        sample_rate: int = settings.LOG_SAMPLE_RATE,
+    ):
+        self.session_factory = session_factory
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sample_high_water = sample_high_water
+        self.sample_rate = max(1, sample_rate)
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._waiting = False
+        self._sample_tick = 0
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self.failed = 0
+        self.flushes = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def submit(self, level: str, service: str, message: str) -> bool:
+        """Queue a log record without blocking. Returns False if it was dropped."""
+        if self._queue is None or self._stopping:
+            self.dropped += 1
+            return False
+
+        size = self._queue.qsize()
+        if level == "INFO" and size >= self.max_queue_size * self.sample_high_water:
+            self._sample_tick += 1
+            if self._sample_tick % self.sample_rate:
+                self.sampled_out += 1
+                return False
+
+        try:
+            self._queue.put_nowait({
+                "timestamp": datetime.now(timezone.utc),
+                "level": level,
+                "service": service,
+                "message": message,
+            })
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        # The queue binds to the running loop, so it is created here rather than in __init__
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop accepting records and flush everything that is still queued."""
+        if self._task is None:
+            return
+        self._stopping = True
+        if self._waiting:
+            self._task.cancel()
+        await self._task
+        self._task = None
+        self._queue = None
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "sampled_out": self.sampled_out,
+            "failed": self.failed,
+            "flushes": self.flushes,
+        }
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            if batch:
+                await self._flush(batch)
+            if self._stopping and self._queue.empty():
+                return
+
+    async def _collect(self) -> List[dict]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        batch: List[dict] = []
+        while len(batch) < self.batch_size:
+            if self._stopping:
+                while len(batch) < self.batch_size and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                break
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            self._waiting = True
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+            except asyncio.CancelledError:
+                # stop() only cancels us while we are idle on the queue
+                if not self._stopping:
+                    raise
+            finally:
+                self._waiting = False
+        return batch
+
+    async def _flush(self, batch: List[dict]) -> None:
+        factory = self.session_factory or database.AsyncSessionLocal
+        try:
+            async with factory() as db:
+                await db.execute(insert(SystemLog), batch)
+                await db.commit()
+        except Exception:
+            self.failed += len(batch)
+            logger.exception("Failed to write %d system log records", len(batch))
+        else:
+            self.written += len(batch)
+        self.flushes += 1
+
+
+system_log_writer = SystemLogWriter()
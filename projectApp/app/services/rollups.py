@@ -0,0 +1,109 @@
+# app/services/rollups.py
+
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List
+
+from sqlalchemy import Date, delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+from app.models import DailyTransactionRollup, Transaction, TransactionType
+from app.money import to_major
+from app.pagination import cursor_timestamp
+
+
+def utc_midnight(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+
+class utc_date(FunctionElement):
+    """The UTC calendar day of a timestamp column, as SQL.
+
+    On PostgreSQL ``date(timestamptz)`` uses the session ``TimeZone``, so the
+    value is shifted to UTC first; SQLite stores timestamps as UTC text
+    already. Matches ``hour_of(...).date()`` in app/services/stats.py, so
+    rebuilt and incrementally maintained days agree on any server.
+    """
+    type = Date()
+    inherit_cache = True
+
+
+@compiles(utc_date)
+def _compile_utc_date(element, compiler, **kw):
+    return f"date({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(utc_date, "postgresql")
+def _compile_utc_date_postgresql(element, compiler, **kw):
+    return f"date(timezone('UTC', {compiler.process(element.clauses, **kw)}))"
+
+
+def daily_totals(db: AsyncSession, start: date, end: date):
+    """SELECT day, type, count, sum(amount_minor) over transactions in [start, end).
+
+    Bucketing happens in SQL by UTC day (``utc_date``), so only one row per
+    day and type ever leaves the database.
+    """
+    day = utc_date(Transaction.created_at)
+    lower = cursor_timestamp(db, utc_midnight(start))
+    upper = cursor_timestamp(db, utc_midnight(end))
+    return (
+        select(
+            day.label("day"),
+            Transaction.transaction_type,
+            func.count().label("count"),
+            func.coalesce(func.sum(Transaction.amount_minor), 0).label("total_minor"),
+        )
+        .where(Transaction.created_at >= lower, Transaction.created_at < upper)
+        .group_by(day, Transaction.transaction_type)
+    )
+
+
+async def rebuild_rollups(db: AsyncSession, start: date, end: date) -> int:
+    """Recompute the rollup rows for days in [start, end) from ``transactions``.
+
+    Runs as DELETE + INSERT ... SELECT, so the aggregation never leaves the
+    database. The caller commits; keep ranges modest (see ``app.cli
+    backfill-rollups``) so each transaction stays short. Returns the number of
+    rollup rows written.
+    """
+    await db.execute(
+        delete(DailyTransactionRollup).where(
+            DailyTransactionRollup.day >= start, DailyTransactionRollup.day < end
+        )
+    )
+    result = await db.execute(
+        insert(DailyTransactionRollup).from_select(
+            ["day", "transaction_type", "count", "total_minor"],
+            daily_totals(db, start, end),
+        )
+    )
+    return result.rowcount
+
+
+async def read_rollups(db: AsyncSession, start: date, end: date) -> Dict[str, List]:
+    """Chart series for days in [start, end): one entry per day, zero-filled"""
+    rows = (await db.execute(
+        select(
+            DailyTransactionRollup.day,
+            DailyTransactionRollup.transaction_type,
+            DailyTransactionRollup.count,
+            DailyTransactionRollup.total_minor,
+        ).where(DailyTransactionRollup.day >= start, DailyTransactionRollup.day < end)
+    )).all()
+
+    days = [start + timedelta(days=i) for i in range((end - start).days)]
+    position = {day: i for i, day in enumerate(days)}
+    counts = [0] * len(days)
+    totals = {t.value: [0] * len(days) for t in TransactionType}
+    for day, transaction_type, count, total_minor in rows:
+        i = position[day]
+        counts[i] += count
+        totals[transaction_type.value][i] += total_minor
+    return {
+        "labels": [day.strftime("%Y-%m-%d") for day in days],
+        "values": counts,
+        # Summed as integers; converted to major units only for the response
+        "amounts": {name: [to_major(total) for total in series] for name, series in totals.items()},
+    }
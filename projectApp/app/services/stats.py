@@ -0,0 +1,397 @@
+# app/services/stats.py
+
+import asyncio
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import delete, event, func, inspect, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app import database
+from app.config import settings
+from app.models import (
+    DailyTransactionRollup,
+    KYCRequest,
+    StatCounter,
+    Transaction,
+    TransactionHourlyCount,
+    TransactionType,
+    User,
+)
+from app.pagination import cursor_timestamp
+from app.services.rollups import rebuild_rollups
+
+logger = logging.getLogger(__name__)
+
+USERS_TOTAL = "users_total"
+KYC_PENDING = "kyc_pending"
+TRANSACTIONS = "transactions"
+
+# Hourly buckets summed for "last 24h": the current hour plus the 23 before it
+WINDOW_HOURS = 24
+# Buckets older than this are deleted by reconcile()
+RETAIN_HOURS = 48
+# reconcile() rebuilds the daily rollups for today and the days before it;
+# older days only change through app.cli backfill-rollups
+RECONCILE_ROLLUP_DAYS = 2
+# pg_try_advisory_xact_lock key held by the worker running reconcile()
+RECONCILE_LOCK_KEY = 0x5354_4154  # "STAT"
+
+_DIALECT_INSERTS = {"postgresql": pg_insert, "sqlite": sqlite_insert}
+
+
+def hour_of(moment: Optional[datetime] = None) -> datetime:
+    moment = moment or datetime.now(timezone.utc)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _hour_expression(dialect_name: str, column):
+    # UTC hours like hour_of(); date_trunc on timestamptz follows the session TimeZone
+    if dialect_name == "postgresql":
+        return func.date_trunc("hour", func.timezone("UTC", column))
+    return func.strftime("%Y-%m-%d %H:00:00", column)
+
+
+class StatsService:
+    """Incrementally maintained counters for GET /api/admin/stats.
+
+    Writers never touch the counter rows themselves: committed sessions hand
+    their deltas to an in-process buffer (see the session hooks below, and
+    ``record_transaction`` for Core inserts) and a background task adds them
+    to ``stat_counters`` / ``transaction_hourly_counts`` /
+    ``daily_transaction_rollups`` in one statement per table. Hot counter rows are therefore locked once per flush rather than
+    once per deposit. ``snapshot`` reads a handful of rows behind a short TTL
+    cache; ``reconcile`` recounts from the source tables to repair drift from
+    crashes, raw SQL or anything else that bypassed the hooks.
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable] = None,
+        cache_ttl: float = settings.STATS_CACHE_TTL,
+        flush_interval: float = settings.STATS_FLUSH_INTERVAL,
+        reconcile_interval: float = settings.STATS_RECONCILE_INTERVAL,
+    ):
+        self.session_factory = session_factory
+        self.cache_ttl = cache_ttl
+        self.flush_interval = flush_interval
+        self.reconcile_interval = reconcile_interval
+
+        # Sync sessions (KYC callbacks, scripts) commit from worker threads
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[str, Optional[datetime]], int] = {}
+        # (day, transaction type) -> (count, amount in minor units)
+        self._pending_rollups: Dict[Tuple[date, str], Tuple[int, int]] = {}
+        self._cached: Optional[Tuple[float, dict]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop_event: Optional[asyncio.Event] = None
+
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.reconciles = 0
+        self.skipped_reconciles = 0
+        self.last_drift: Dict[str, int] = {}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def record(self, session, name: str, delta: int = 1, hour: Optional[datetime] = None) -> None:
+        """Count a change made in ``session``; applied only if it commits."""
+        session = getattr(session, "sync_session", session)
+        key = (name, hour_of(hour) if name == TRANSACTIONS else None)
+        deltas = session.info.setdefault("stats_deltas", {})
+        deltas[key] = deltas.get(key, 0) + delta
+
+    def record_transaction(
+        self,
+        session,
+        transaction_type,
+        amount_minor: int,
+        created_at: Optional[datetime] = None,
+        sign: int = 1,
+    ) -> None:
+        """Count one Transaction row; Core inserts must call this, the hooks cannot see them"""
+        hour = hour_of(created_at)
+        self.record(session, TRANSACTIONS, sign, hour=hour)
+        if transaction_type is None:
+            return
+        session = getattr(session, "sync_session", session)
+        key = (hour.date(), TransactionType(transaction_type).value)
+        rollups = session.info.setdefault("rollup_deltas", {})
+        count, total = rollups.get(key, (0, 0))
+        rollups[key] = (count + sign, total + sign * (amount_minor or 0))
+
+    def _apply(self, deltas, rollups=None) -> None:
+        with self._lock:
+            for key, delta in deltas.items():
+                self._pending[key] = self._pending.get(key, 0) + delta
+            for key, (count, total) in (rollups or {}).items():
+                pending_count, pending_total = self._pending_rollups.get(key, (0, 0))
+                self._pending_rollups[key] = (pending_count + count, pending_total + total)
+
+    def _take_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            rollups, self._pending_rollups = self._pending_rollups, {}
+        return (
+            {key: delta for key, delta in pending.items() if delta},
+            {key: delta for key, delta in rollups.items() if delta[0] or delta[1]},
+        )
+
+    def _session(self):
+        return (self.session_factory or database.AsyncSessionLocal)()
+
+    async def flush(self) -> int:
+        """Add buffered deltas to the counter tables. Returns how many keys were written."""
+        pending, rollups = self._take_pending()
+        if not pending and not rollups:
+            return 0
+        counters = [{"name": name, "value": delta} for (name, hour), delta in pending.items() if hour is None]
+        hourly = [{"hour": hour, "count": delta} for (name, hour), delta in pending.items() if hour is not None]
+        try:
+            async with self._session() as db:
+                insert = _DIALECT_INSERTS[db.bind.dialect.name]
+                if counters:
+                    stmt = insert(StatCounter)
+                    await db.execute(stmt.on_conflict_do_update(
+                        index_elements=[StatCounter.name],
+                        set_={"value": StatCounter.value + stmt.excluded.value},
+                    ), counters)
+                if hourly:
+                    stmt = insert(TransactionHourlyCount)
+                    await db.execute(stmt.on_conflict_do_update(
+                        index_elements=[TransactionHourlyCount.hour],
+                        set_={"count": TransactionHourlyCount.count + stmt.excluded.count},
+                    ), hourly)
+                if rollups:
+                    stmt = insert(DailyTransactionRollup)
+                    await db.execute(stmt.on_conflict_do_update(
+                        index_elements=[DailyTransactionRollup.day, DailyTransactionRollup.transaction_type],
+                        set_={
+                            "count": DailyTransactionRollup.count + stmt.excluded.count,
+                            "total_minor": DailyTransactionRollup.total_minor + stmt.excluded.total_minor,
+                        },
+                    ), [
+                        {"day": day, "transaction_type": TransactionType(type_), "count": count, "total_minor": total}
+                        for (day, type_), (count, total) in rollups.items()
+                    ])
+                await db.commit()
+        except Exception:
+            # Keep the deltas for the next attempt
+            self._apply(pending, rollups)
+            self.failed_flushes += 1
+            logger.exception("Failed to flush %d stats counters", len(pending) + len(rollups))
+            return 0
+        self.flushes += 1
+        return len(pending) + len(rollups)
+
+    async def reconcile(self) -> Dict[str, int]:
+        """Recount every counter from its source table and overwrite the stored values.
+
+        Buffered deltas are dropped once the recount has run, in the same
+        transaction: they belong to commits the recount already sees, and a
+        commit landing mid-recount is counted or buffered, never both. Commits
+        between the last recount read and the drop are lost until the next
+        reconcile; that window is a few statements wide.
+
+        On Postgres an advisory lock lets one worker reconcile at a time; the
+        others skip the round and return ``{}``. Deltas still buffered in other
+        workers are added on top of the recount when they flush, so drift of up
+        to one flush interval of their commits can remain until the next
+        reconcile. Returns the drift that was corrected, per counter.
+        """
+        now_hour = hour_of()
+        since = now_hour - timedelta(hours=RETAIN_HOURS)
+        pending = rollups = None
+        try:
+            async with self._session() as db:
+                dialect_name = db.bind.dialect.name
+                insert = _DIALECT_INSERTS[dialect_name]
+                if dialect_name == "postgresql" and not await db.scalar(
+                    select(func.pg_try_advisory_xact_lock(RECONCILE_LOCK_KEY))
+                ):
+                    self.skipped_reconciles += 1
+                    return {}
+                actual = {
+                    USERS_TOTAL: await db.scalar(select(func.count()).select_from(User)),
+                    KYC_PENDING: await db.scalar(
+                        select(func.count()).select_from(KYCRequest).where(KYCRequest.status == "pending")
+                    ),
+                }
+                bucket = _hour_expression(dialect_name, Transaction.created_at)
+                hourly = {}
+                for hour, count in (await db.execute(
+                    select(bucket, func.count())
+                    .where(Transaction.created_at >= cursor_timestamp(db, since))
+                    .group_by(bucket)
+                )).all():
+                    if isinstance(hour, str):
+                        hour = datetime.fromisoformat(hour)
+                    hourly[hour_of(hour)] = count
+                today = now_hour.date()
+                await rebuild_rollups(db, today - timedelta(days=RECONCILE_ROLLUP_DAYS - 1), today + timedelta(days=1))
+                pending, rollups = self._take_pending()
+
+                stored = dict((await db.execute(select(StatCounter.name, StatCounter.value))).all())
+                drift = {name: value - stored.get(name, 0) for name, value in actual.items()}
+
+                stmt = insert(StatCounter)
+                await db.execute(stmt.on_conflict_do_update(
+                    index_elements=[StatCounter.name], set_={"value": stmt.excluded.value},
+                ), [{"name": name, "value": value} for name, value in actual.items()])
+                await db.execute(delete(TransactionHourlyCount))
+                if hourly:
+                    await db.execute(
+                        TransactionHourlyCount.__table__.insert(),
+                        [{"hour": hour, "count": count} for hour, count in hourly.items()],
+                    )
+                await db.commit()
+        except BaseException:
+            if pending is not None:
+                # The recount never landed; the deltas are still owed
+                self._apply(pending, rollups)
+            raise
+
+        self._cached = None
+        self.reconciles += 1
+        self.last_drift = drift
+        return drift
+
+    async def snapshot(self, db) -> dict:
+        """Counter values for the dashboard; at most ``cache_ttl`` seconds old."""
+        cached = self._cached
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        counters = dict((await db.execute(select(StatCounter.name, StatCounter.value))).all())
+        window_start = hour_of() - timedelta(hours=WINDOW_HOURS - 1)
+        recent = await db.scalar(
+            select(func.coalesce(func.sum(TransactionHourlyCount.count), 0))
+            .where(TransactionHourlyCount.hour >= window_start)
+        )
+        values = {
+            USERS_TOTAL: int(counters.get(USERS_TOTAL, 0)),
+            KYC_PENDING: int(counters.get(KYC_PENDING, 0)),
+            TRANSACTIONS: int(recent or 0),
+        }
+        self._cached = (time.monotonic() + self.cache_ttl, values)
+        return values
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = len(self._pending) + len(self._pending_rollups)
+        return {
+            "pending_keys": pending,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "reconciles": self.reconciles,
+            "skipped_reconciles": self.skipped_reconciles,
+            "last_drift": self.last_drift,
+        }
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._cached = None
+        self._stop_event = asyncio.Event()
+        # Counters start from a recount, so they are right even after a crash
+        try:
+            await self.reconcile()
+        except Exception:
+            logger.exception("Initial stats reconciliation failed")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task and flush whatever is still buffered."""
+        if self._task is None:
+            return
+        self._stop_event.set()
+        await self._task
+        self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_reconcile = loop.time() + self.reconcile_interval
+        while not self._stop_event.is_set():
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            if self._stop_event.is_set():
+                return
+            if loop.time() >= next_reconcile:
+                next_reconcile = loop.time() + self.reconcile_interval
+                try:
+                    await self.reconcile()
+                except Exception:
+                    logger.exception("Stats reconciliation failed")
+            else:
+                await self.flush()
+
+
+stats_service = StatsService()
+
+
+def _loaded(obj, name: str):
+    # Never trigger a load from inside a flush (and an AsyncSession cannot lazy-load);
+    # server defaults such as created_at are simply absent here
+    return inspect(obj).dict.get(name)
+
+
+def _kyc_pending_delta(obj: KYCRequest) -> int:
+    history = inspect(obj).attrs.status.history
+    if not history.has_changes():
+        return 0
+    was_pending = "pending" in (history.deleted or ())
+    is_pending = _loaded(obj, "status") == "pending"
+    return int(is_pending) - int(was_pending)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_stat_deltas(session, _flush_context):
+    for obj in session.new:
+        if isinstance(obj, User):
+            stats_service.record(session, USERS_TOTAL, 1)
+        elif isinstance(obj, Transaction):
+            stats_service.record_transaction(
+                session, _loaded(obj, "transaction_type"), _loaded(obj, "amount_minor"), _loaded(obj, "created_at")
+            )
+        elif isinstance(obj, KYCRequest) and _loaded(obj, "status") in (None, "pending"):
+            # status defaults to "pending" on insert
+            stats_service.record(session, KYC_PENDING, 1)
+    for obj in session.dirty:
+        if isinstance(obj, KYCRequest):
+            delta = _kyc_pending_delta(obj)
+            if delta:
+                stats_service.record(session, KYC_PENDING, delta)
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            stats_service.record(session, USERS_TOTAL, -1)
+        elif isinstance(obj, Transaction):
+            stats_service.record_transaction(
+                session, _loaded(obj, "transaction_type"), _loaded(obj, "amount_minor"), _loaded(obj, "created_at"), sign=-1
+            )
+        elif isinstance(obj, KYCRequest) and _loaded(obj, "status") == "pending":
+            stats_service.record(session, KYC_PENDING, -1)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_stat_deltas(session):
+    deltas = session.info.pop("stats_deltas", None)
+    rollups = session.info.pop("rollup_deltas", None)
+    if deltas or rollups:
+        stats_service._apply(deltas or {}, rollups)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_stat_deltas(session):
+    session.info.pop("stats_deltas", None)
+    session.info.pop("rollup_deltas", None)
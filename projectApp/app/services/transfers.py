@@ -0,0 +1,137 @@
+# app/services/transfers.py
+
+import asyncio
+import logging
+import random
+from typing import Callable, Optional
+
+from sqlalchemy import BigInteger, case, insert, literal, select, update
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import Account, LedgerEntry, Transaction, TransactionType
+from app.money import to_minor
+from app.services.balances import AccountNotFound, InsufficientFunds, PostedTransaction, lock_accounts
+from app.services.ledger import POSTING_COLUMNS, journal_transactions, postings
+from app.services.stats import stats_service
+
+logger = logging.getLogger(__name__)
+
+# serialization_failure, deadlock_detected
+RETRYABLE_SQLSTATES = {"40001", "40P01"}
+
+
+def is_retryable(exc: DBAPIError) -> bool:
+    """Failures that say "run the whole transaction again", not "this transfer is wrong" """
+    code = getattr(exc.orig, "sqlstate", None) or getattr(exc.orig, "pgcode", None)
+    if code in RETRYABLE_SQLSTATES:
+        return True
+    # SQLite gives up on its busy timeout with this
+    return "database is locked" in str(exc.orig)
+
+
+async def post_transfer(
+    db: AsyncSession,
+    from_account_id: int,
+    to_account_id: int,
+    amount: float,
+    description: Optional[str] = None,
+    owner: Optional[str] = None,
+) -> PostedTransaction:
+    """Move ``amount`` from one account to another; the caller commits.
+
+    Both accounts are locked with ``lock_accounts``, lowest id first, so two
+    transfers in opposite directions queue on the same first row instead of
+    deadlocking. The funds check then reads a balance nobody else can move.
+    Both balances change in one UPDATE, and one Transaction row
+    (account_id debited, counter_account_id credited) is journaled as a
+    debit and a credit. On PostgreSQL those go out as one statement, so the
+    locks are held for two round trips plus the commit. Returns the row and
+    the sender's new balance.
+    """
+    amount_minor = to_minor(amount)
+    accounts = await lock_accounts(db, [from_account_id, to_account_id])
+    source = accounts.get(from_account_id)
+    if source is None or (owner is not None and source.owner != owner):
+        raise AccountNotFound(from_account_id)
+    if to_account_id not in accounts:
+        raise AccountNotFound(to_account_id)
+    if source.balance_minor < amount_minor:
+        raise InsufficientFunds(from_account_id)
+
+    updated = (
+        update(Account)
+        .where(Account.id.in_([from_account_id, to_account_id]))
+        .values(balance_minor=Account.balance_minor + case(
+            (Account.id == from_account_id, literal(-amount_minor, BigInteger)),
+            else_=literal(amount_minor, BigInteger),
+        ))
+        .returning(Account.id, Account.balance_minor)
+    )
+    inserted = insert(Transaction).values(
+        account_id=from_account_id,
+        counter_account_id=to_account_id,
+        transaction_type=TransactionType.transfer,
+        amount_minor=amount_minor,
+        description=description,
+    ).returning(
+        Transaction.id,
+        Transaction.account_id,
+        Transaction.counter_account_id,
+        Transaction.transaction_type,
+        Transaction.amount_minor,
+        Transaction.description,
+        Transaction.created_at,
+    )
+
+    if db.bind.dialect.name == "postgresql":
+        updated_cte = updated.cte("updated")
+        inserted_cte = inserted.cte("inserted")
+        posted_cte = insert(LedgerEntry).from_select(POSTING_COLUMNS, postings(inserted_cte)).cte("posted")
+        row = (await db.execute(
+            select(updated_cte.c.balance_minor, inserted_cte)
+            .join_from(updated_cte, inserted_cte, inserted_cte.c.account_id == updated_cte.c.id)
+            .add_cte(posted_cte)
+        )).one()
+        posted = PostedTransaction(**row._mapping)
+    else:
+        balances = dict((await db.execute(updated)).all())
+        row = (await db.execute(inserted)).one()
+        await journal_transactions(db, [row.id])
+        posted = PostedTransaction(balance_minor=balances[from_account_id], **row._mapping)
+    stats_service.record_transaction(db, TransactionType.transfer, amount_minor)
+    return posted
+
+
+async def transfer(
+    session_factory: Callable,
+    from_account_id: int,
+    to_account_id: int,
+    amount: float,
+    description: Optional[str] = None,
+    owner: Optional[str] = None,
+    max_attempts: int = settings.TRANSFER_MAX_ATTEMPTS,
+    backoff_base: float = settings.TRANSFER_BACKOFF_BASE,
+    backoff_max: float = settings.TRANSFER_BACKOFF_MAX,
+) -> PostedTransaction:
+    """``post_transfer`` in its own transaction, committed, retried on serialization failures.
+
+    Each attempt gets a fresh session, so a retry starts from a clean
+    snapshot. Attempts are spaced by exponential backoff with full jitter,
+    so colliding transfers do not collide again in lockstep. Business errors
+    (AccountNotFound, InsufficientFunds) are never retried.
+    """
+    for attempt in range(1, max_attempts + 1):
+        async with session_factory() as db:
+            try:
+                posted = await post_transfer(db, from_account_id, to_account_id, amount, description, owner)
+                await db.commit()
+                return posted
+            except DBAPIError as exc:
+                await db.rollback()
+                if attempt >= max_attempts or not is_retryable(exc):
+                    raise
+                logger.info("Transfer %s -> %s hit %s; retrying (attempt %d)",
+                            from_account_id, to_account_id, type(exc.orig).__name__, attempt)
+        await asyncio.sleep(random.uniform(0, min(backoff_max, backoff_base * 2 ** (attempt - 1))))
@@ -0,0 +1,152 @@
+# app/services/uploads.py
+
+import hashlib
+import json
+import os
+import uuid
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+import aiofiles
+import aiofiles.os
+from fastapi import UploadFile
+
+from app.config import settings
+
+INCOMING_DIR = ".incoming"
+
+
+class UploadTooLarge(Exception):
+    """The upload went past the size limit; nothing was kept"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"upload exceeds {max_bytes} bytes")
+        self.max_bytes = max_bytes
+
+
+@dataclass
+class StoredUpload:
+    """A fully received upload, still under its temporary name"""
+    path: str
+    size: int
+    sha256: str
+
+
+async def receive_upload(
+    upload: UploadFile,
+    directory: str,
+    max_bytes: int = settings.UPLOAD_MAX_BYTES,
+    chunk_size: int = settings.UPLOAD_CHUNK_SIZE,
+) -> StoredUpload:
+    """Stream ``upload`` to a temporary file under ``directory``.
+
+    The file is copied ``chunk_size`` bytes at a time with non-blocking file
+    I/O, hashing and counting as it goes, so memory stays bounded by one chunk
+    whatever the upload size. Past ``max_bytes`` the partial file is removed
+    and ``UploadTooLarge`` raised. The caller moves the result into place with
+    ``commit_upload`` or drops it with ``discard_upload``.
+
+    By the time a handler runs, Starlette has already parsed (and spooled) the
+    whole multipart body; ``UploadLimitMiddleware`` is what stops an oversized
+    request while it is still arriving. This check is the exact one, on the
+    file part alone.
+    """
+    incoming = os.path.join(directory, INCOMING_DIR)
+    await aiofiles.os.makedirs(incoming, exist_ok=True)
+    path = os.path.join(incoming, f"{uuid.uuid4().hex}.part")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(path, "wb") as out:
+            while chunk := await upload.read(chunk_size):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                digest.update(chunk)
+                await out.write(chunk)
+    except BaseException:
+        await discard_upload(path)
+        raise
+    return StoredUpload(path=path, size=size, sha256=digest.hexdigest())
+
+
+async def commit_upload(stored: StoredUpload, destination: str) -> str:
+    await aiofiles.os.makedirs(os.path.dirname(destination), exist_ok=True)
+    await aiofiles.os.replace(stored.path, destination)
+    return destination
+
+
+async def discard_upload(path: str) -> None:
+    try:
+        await aiofiles.os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class UploadLimitMiddleware:
+    """ASGI middleware capping request bodies on upload routes while they arrive.
+
+    A ``Content-Length`` over the cap is answered with 413 before any body is
+    read. Otherwise received bytes are counted; once past the cap the client
+    gets a 413 and the app sees a disconnect, so the multipart parser stops
+    and never spools more than the cap. The cap defaults to
+    UPLOAD_MAX_BYTES plus UPLOAD_FORM_OVERHEAD for the other fields.
+    """
+
+    def __init__(self, app, paths: Iterable[str], max_bytes: Optional[int] = None):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        limit = self.max_bytes
+        if limit is None:
+            limit = settings.UPLOAD_MAX_BYTES + settings.UPLOAD_FORM_OVERHEAD
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                if value.isdigit() and int(value) > limit:
+                    await _reject(send, limit)
+                    return
+                break
+
+        received = 0
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    rejected = True
+                    await _reject(send, limit)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            if not rejected:
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            # The app failing over the disconnect we handed it; the 413 is already out
+            if not rejected:
+                raise
+
+
+async def _reject(send, limit: int) -> None:
+    body = json.dumps({"detail": f"Request body exceeds {limit} bytes"}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 413,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                    (b"connection", b"close")],
+    })
+    await send({"type": "http.response.body", "body": body})
+
@@ -0,0 +1,303 @@
+# app/services/user_search.py
+
+import asyncio
+import bisect
+import heapq
+import logging
+import threading
+import time
+from itertools import islice
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import case, event, func, inspect, or_, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import User
+
+logger = logging.getLogger(__name__)
+
+GRAM = 3
+
+
+def normalize(text: Optional[str]) -> str:
+    return " ".join((text or "").lower().split())
+
+
+def trigrams(text: str) -> Set[str]:
+    return {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+
+def _escape_like(q: str) -> str:
+    return q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class UserSearchIndex:
+    """In-process search index over users' full_name and email.
+
+    Used when the database cannot index substring search (SQLite); PostgreSQL
+    uses pg_trgm GIN indexes instead. Results come in tiers, best first:
+    email prefix, full-name prefix, name-word prefix (each read lazily from a
+    sorted key list, so a page costs a bisect plus ``limit`` steps), then
+    plain substring matches found by intersecting trigram posting sets and
+    verifying the survivors. The index is built from the users table on first
+    use, kept current by the session hooks below, and rebuilt after
+    ``max_age`` seconds to pick up writes from other processes.
+
+    ``ensure`` runs at most one build at a time, shared by every caller.
+    Only the first build is waited for; an expired index keeps answering
+    while its replacement is built in the background. Indexing the rows
+    runs in a thread, off the event loop. Changes that commit during a
+    build are journaled and replayed onto the new index before it is
+    swapped in.
+    """
+
+    def __init__(self, max_age: float = settings.USER_SEARCH_INDEX_MAX_AGE):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._docs: Dict[int, Tuple[str, str]] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        # Sorted (key, user id) lists for the prefix tiers
+        self._emails: List[Tuple[str, int]] = []
+        self._names: List[Tuple[str, int]] = []
+        self._words: List[Tuple[str, int]] = []
+        self._built_at: Optional[float] = None
+        # (user id, (full_name, email) or None for a removal) committed during a build
+        self._journal: Optional[List[Tuple[int, Optional[Tuple[str, str]]]]] = None
+        self._building: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._built_at is not None and time.monotonic() - self._built_at < self.max_age
+
+    async def ensure(self, engine: AsyncEngine) -> None:
+        """Build the index from ``engine`` if it is missing, refresh it in the background if expired"""
+        if self.ready:
+            return
+        loop = asyncio.get_running_loop()
+        task = self._building
+        # A task left by another event loop (tests, CLI) can never finish here
+        if task is None or task.done() or task.get_loop() is not loop:
+            task = self._building = loop.create_task(self._build_from(engine))
+            task.add_done_callback(self._built)
+        if self._built_at is None:
+            # Shielded: a cancelled request must not cancel the build others wait on
+            await asyncio.shield(task)
+
+    async def _build_from(self, engine: AsyncEngine) -> None:
+        async with AsyncSession(engine) as db:
+            await self.build(db)
+
+    @staticmethod
+    def _built(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Building the user search index failed", exc_info=task.exception())
+
+    async def build(self, db: AsyncSession) -> None:
+        with self._lock:
+            self._journal = []
+        try:
+            rows = (await db.execute(select(User.id, User.full_name, User.email).order_by(User.id))).all()
+            built = await asyncio.to_thread(self._index, rows)
+        except BaseException:
+            with self._lock:
+                self._journal = None
+            raise
+        with self._lock:
+            self._docs, self._postings, self._emails, self._names, self._words = built
+            for user_id, doc in self._journal:
+                if doc is None:
+                    self._remove(user_id)
+                else:
+                    self._upsert(user_id, *doc)
+            self._journal = None
+            self._built_at = time.monotonic()
+
+    @classmethod
+    def _index(cls, rows):
+        docs, postings = {}, {}
+        emails, names, words = [], [], []
+        for user_id, full_name, email in rows:
+            doc = docs[user_id] = (normalize(full_name), normalize(email))
+            for gram in trigrams(doc[0]) | trigrams(doc[1]):
+                posting = postings.get(gram)
+                if posting is None:
+                    postings[gram] = {user_id}
+                else:
+                    posting.add(user_id)
+            emails.append((doc[1], user_id))
+            names.append((doc[0], user_id))
+            words.extend((word, user_id) for word in cls._later_words(doc[0]))
+        emails.sort()
+        names.sort()
+        words.sort()
+        return docs, postings, emails, names, words
+
+    def upsert(self, user_id: int, full_name: str, email: str) -> None:
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append((user_id, (full_name, email)))
+            if self._built_at is not None:
+                self._upsert(user_id, full_name, email)
+
+    def remove(self, user_id: int) -> None:
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append((user_id, None))
+            if self._built_at is not None:
+                self._remove(user_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._docs, self._postings = {}, {}
+            self._emails, self._names, self._words = [], [], []
+            self._built_at = None
+        self._building = None
+
+    def search(self, q: str, limit: int, offset: int = 0) -> List[int]:
+        """User ids matching ``q`` as a substring of full_name or email, best first"""
+        q = normalize(q)
+        if not q:
+            return []
+        wanted = offset + limit
+        found: List[int] = []
+        seen: Set[int] = set()
+        with self._lock:
+            for keys in (self._emails, self._names, self._words):
+                i = bisect.bisect_left(keys, (q, -1))
+                while len(found) < wanted and i < len(keys) and keys[i][0].startswith(q):
+                    user_id = keys[i][1]
+                    if user_id not in seen:
+                        seen.add(user_id)
+                        found.append(user_id)
+                    i += 1
+            if len(found) < wanted and len(q) >= GRAM:
+                postings = sorted(
+                    (self._postings.get(gram, set()) for gram in trigrams(q)), key=len
+                )
+                docs, rarest = self._docs, postings[0]
+                if len(rarest) * 20 > len(docs):
+                    # Only common trigrams: walking users in id order fills a page
+                    # long before an intersection of huge sets would finish
+                    matches = (
+                        user_id for user_id in docs
+                        if user_id in rarest and user_id not in seen
+                        and (q in docs[user_id][0] or q in docs[user_id][1])
+                    )
+                    found.extend(islice(matches, wanted - len(found)))
+                else:
+                    matches = (
+                        user_id for user_id in rarest.intersection(*postings[1:])
+                        if user_id not in seen and (q in docs[user_id][0] or q in docs[user_id][1])
+                    )
+                    found.extend(heapq.nsmallest(wanted - len(found), matches))
+        return found[offset:wanted]
+
+    @staticmethod
+    def _later_words(full_name: str) -> Set[str]:
+        # The first word is already covered by the full-name prefix tier
+        return set(full_name.split()[1:])
+
+    def _upsert(self, user_id: int, full_name: str, email: str) -> None:
+        self._remove(user_id)
+        doc = self._docs[user_id] = (normalize(full_name), normalize(email))
+        for gram in trigrams(doc[0]) | trigrams(doc[1]):
+            self._postings.setdefault(gram, set()).add(user_id)
+        bisect.insort(self._emails, (doc[1], user_id))
+        bisect.insort(self._names, (doc[0], user_id))
+        for word in self._later_words(doc[0]):
+            bisect.insort(self._words, (word, user_id))
+
+    def _remove(self, user_id: int) -> None:
+        doc = self._docs.pop(user_id, None)
+        if doc is None:
+            return
+        for gram in trigrams(doc[0]) | trigrams(doc[1]):
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(user_id)
+                if not posting:
+                    del self._postings[gram]
+        self._discard(self._emails, (doc[1], user_id))
+        self._discard(self._names, (doc[0], user_id))
+        for word in self._later_words(doc[0]):
+            self._discard(self._words, (word, user_id))
+
+    @staticmethod
+    def _discard(keys: List[Tuple[str, int]], key: Tuple[str, int]) -> None:
+        i = bisect.bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            del keys[i]
+
+
+user_search_index = UserSearchIndex()
+
+
+async def search_users(db: AsyncSession, q: str, limit: int, offset: int = 0) -> List[User]:
+    """Users whose full_name or email contains ``q``, ranked, one page at a time.
+
+    PostgreSQL answers with ILIKE served by the pg_trgm GIN indexes and ranks
+    in SQL; other backends go through the in-process ``user_search_index``.
+    """
+    q = normalize(q)
+    if not q:
+        return []
+    if db.bind.dialect.name == "postgresql":
+        pattern = f"%{_escape_like(q)}%"
+        prefix = f"{_escape_like(q)}%"
+        full_name, email = func.lower(User.full_name), func.lower(User.email)
+        # Same tiers as UserSearchIndex; trigram similarity orders within a tier
+        tier = case(
+            (email.like(prefix), 0),
+            (full_name.like(prefix), 1),
+            (full_name.like(f"% {_escape_like(q)}%"), 2),
+            else_=3,
+        )
+        return (await db.scalars(
+            select(User)
+            .where(or_(User.full_name.ilike(pattern), User.email.ilike(pattern)))
+            .order_by(
+                tier,
+                func.greatest(func.similarity(User.full_name, q), func.similarity(User.email, q)).desc(),
+                User.id,
+            )
+            .limit(limit)
+            .offset(offset)
+        )).all()
+
+    await user_search_index.ensure(db.bind)
+    ids = user_search_index.search(q, limit, offset)
+    if not ids:
+        return []
+    users = {user.id: user for user in (await db.scalars(select(User).where(User.id.in_(ids)))).all()}
+    return [users[user_id] for user_id in ids if user_id in users]
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_search_changes(session, _flush_context):
+    changes = session.info.setdefault("user_search_changes", {})
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, User):
+            state = inspect(obj)
+            if obj in session.new or any(
+                state.attrs[name].history.has_changes() for name in ("full_name", "email")
+            ):
+                changes[obj.id] = (state.dict.get("full_name"), state.dict.get("email"))
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            changes[obj.id] = None
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_search_changes(session):
+    for user_id, doc in session.info.pop("user_search_changes", {}).items():
+        if doc is None:
+            user_search_index.remove(user_id)
+        else:
+            user_search_index.upsert(user_id, *doc)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_search_changes(session):
+    session.info.pop("user_search_changes", None)
@@ -0,0 +1,245 @@
+# app/sql_profiler.py
+
+import logging
+import random
+import re
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+from app.metrics import route_label
+
+logger = logging.getLogger(__name__)
+
+_STARTED = "sql_profiler_started"
+_IN_LIST = re.compile(r"\(\s*(?:\?|\$\d+|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|\$\d+|%\(\w+\)s|:\w+))*\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """``statement`` with whitespace collapsed and IN-lists of any length made alike"""
+    return _IN_LIST.sub("(...)", _SPACE.sub(" ", statement).strip())
+
+
+class RequestProfile:
+    """SQL issued on behalf of one request"""
+
+    __slots__ = ("queries", "seconds", "slowest", "slowest_statement", "shapes")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+        self.slowest = 0.0
+        self.slowest_statement: Optional[str] = None
+        self.shapes: Dict[str, int] = {}
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.queries += 1
+        self.seconds += seconds
+        if seconds >= self.slowest:
+            self.slowest = seconds
+            self.slowest_statement = statement
+        self.shapes[statement] = self.shapes.get(statement, 0) + 1
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Statement shapes run at least ``threshold`` times, most repeated first: likely N+1"""
+        counts: Dict[str, int] = {}
+        for statement, count in self.shapes.items():
+            shape = statement_shape(statement)
+            counts[shape] = counts.get(shape, 0) + count
+        return sorted(((shape, count) for shape, count in counts.items() if count >= threshold),
+                      key=lambda item: -item[1])
+
+    def server_timing(self, threshold: int) -> str:
+        metrics = [
+            f'db;dur={self.seconds * 1000:.2f};desc="{self.queries} queries"',
+            f"db-slowest;dur={self.slowest * 1000:.2f}",
+        ]
+        for shape, count in self.repeated(threshold)[:3]:
+            summary = shape[:60].replace("\\", "").replace('"', "'")
+            metrics.append(f'db-repeated;desc="{count}x {summary}"')
+        return ", ".join(metrics)
+
+
+_current: ContextVar[Optional[RequestProfile]] = ContextVar("sql_profile", default=None)
+
+
+class SqlProfiler:
+    """Attributes every SQL statement to the request that issued it.
+
+    ``before/after_cursor_execute`` listeners time each statement into the
+    ``RequestProfile`` of the current request, found through a context
+    variable. The variable follows the request into the threadpool and into
+    SQLAlchemy's async greenlets. Work outside a request (background flushes,
+    CLI) has no profile and is not counted.
+
+    Disabled, no listener is attached and the middleware passes requests
+    straight through, so the cost is one attribute check per request.
+    ``enable`` and ``disable`` work at runtime. Enabled, each finished
+    request updates per-route totals. A request slower than ``slow_request``,
+    or one that repeats a statement shape ``repeat_threshold`` times, is
+    logged through ``sink`` with probability ``log_sample``.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = settings.SQL_PROFILE,
+        server_timing: bool = settings.SQL_PROFILE_SERVER_TIMING,
+        slow_request: float = settings.SQL_PROFILE_SLOW_REQUEST,
+        log_sample: float = settings.SQL_PROFILE_LOG_SAMPLE,
+        repeat_threshold: int = settings.SQL_PROFILE_REPEAT_THRESHOLD,
+    ):
+        self.enabled = False
+        self.server_timing = server_timing
+        self.slow_request = slow_request
+        self.log_sample = log_sample
+        self.repeat_threshold = repeat_threshold
+        # (level, service, message); app.main points it at the SystemLog writer
+        self.sink: Callable[[str, str, str], object] = lambda level, service, message: logger.warning(message)
+        self._engines: List[Engine] = []
+        self._routes: Dict[str, Dict[str, float]] = {}
+        self.profiled = 0
+        self.slow_requests = 0
+        self.repeated_requests = 0
+        self.logged = 0
+        if enabled:
+            self.enable()
+
+    def watch(self, engine: Engine) -> Engine:
+        """Profile statements on ``engine`` while enabled; pass ``engine.sync_engine`` for async engines"""
+        self._engines.append(engine)
+        if self.enabled:
+            self._listen(engine)
+        return engine
+
+    def enable(self) -> None:
+        if not self.enabled:
+            for engine in self._engines:
+                self._listen(engine)
+            self.enabled = True
+
+    def disable(self) -> None:
+        if self.enabled:
+            self.enabled = False
+            for engine in self._engines:
+                event.remove(engine, "before_cursor_execute", _before_cursor_execute)
+                event.remove(engine, "after_cursor_execute", _after_cursor_execute)
+                event.remove(engine, "handle_error", _handle_error)
+
+    @staticmethod
+    def _listen(engine: Engine) -> None:
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+    def finish(self, scope, profile: RequestProfile, seconds: float) -> None:
+        route = f"{scope['method']} {route_label(scope)}"
+        totals = self._routes.get(route)
+        if totals is None:
+            totals = self._routes[route] = {"requests": 0, "queries": 0, "db_ms": 0.0, "max_queries": 0}
+        totals["requests"] += 1
+        totals["queries"] += profile.queries
+        totals["db_ms"] += profile.seconds * 1000
+        totals["max_queries"] = max(totals["max_queries"], profile.queries)
+        self.profiled += 1
+
+        slow = seconds >= self.slow_request
+        repeated = profile.repeated(self.repeat_threshold) if profile.queries >= self.repeat_threshold else []
+        self.slow_requests += slow
+        self.repeated_requests += bool(repeated)
+        if not (slow or repeated) or random.random() >= self.log_sample:
+            return
+        message = (
+            f"{route} took {seconds * 1000:.1f} ms: {profile.queries} queries, "
+            f"{profile.seconds * 1000:.1f} ms in SQL"
+        )
+        if profile.slowest_statement is not None:
+            message += f"; slowest {profile.slowest * 1000:.1f} ms: {statement_shape(profile.slowest_statement)[:300]}"
+        for shape, count in repeated[:3]:
+            message += f"; likely N+1, {count}x: {shape[:300]}"
+        self.logged += 1
+        self.sink("WARNING", "sql", message)
+
+    def stats(self) -> dict:
+        routes = {
+            route: {
+                "requests": totals["requests"],
+                "avg_queries": round(totals["queries"] / totals["requests"], 2),
+                "max_queries": totals["max_queries"],
+                "avg_db_ms": round(totals["db_ms"] / totals["requests"], 3),
+            }
+            for route, totals in sorted(self._routes.items(), key=lambda item: -item[1]["queries"])
+        }
+        return {
+            "enabled": self.enabled,
+            "server_timing": self.server_timing,
+            "profiled_requests": self.profiled,
+            "slow_requests": self.slow_requests,
+            "repeated_statement_requests": self.repeated_requests,
+            "logged": self.logged,
+            "routes": routes,
+        }
+
+    def reset(self) -> None:
+        self._routes.clear()
+        self.profiled = self.slow_requests = self.repeated_requests = self.logged = 0
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault(_STARTED, []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    started = conn.info.get(_STARTED)
+    if profile is not None and started:
+        profile.record(statement, time.perf_counter() - started.pop())
+
+
+def _handle_error(exception_context):
+    started = exception_context.connection.info.get(_STARTED) if exception_context.connection else None
+    if started and _current.get() is not None:
+        started.pop()
+
+
+sql_profiler = SqlProfiler()
+
+
+class SqlProfilingMiddleware:
+    """ASGI middleware giving each request its ``RequestProfile`` while ``profiler`` is enabled.
+
+    With ``server_timing`` on, the totals so far go out in a ``Server-Timing``
+    header when the response starts. Statements run while a body streams
+    count toward the log and route totals, not toward the header.
+    """
+
+    def __init__(self, app, profiler: Optional[SqlProfiler] = None):
+        self.app = app
+        self.profiler = profiler or sql_profiler
+
+    async def __call__(self, scope, receive, send):
+        profiler = self.profiler
+        if scope["type"] != "http" or not profiler.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and profiler.server_timing:
+                header = profile.server_timing(profiler.repeat_threshold).encode("latin-1", "replace")
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header)]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            profiler.finish(scope, profile, time.perf_counter() - started)
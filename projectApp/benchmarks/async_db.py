@@ -0,0 +1,122 @@
+# benchmarks/async_db.py
+"""Concurrent-request throughput: sync Session vs AsyncSession in async handlers.
+
+The "before" app reproduces the old pattern (``async def`` handler calling the
+synchronous ``Session``); the "after" run drives the real ``GET /accounts/{id}``
+route on ``get_async_db``. Each SQL statement is slowed down by ``--latency-ms``
+inside the driver to stand in for network/DB time.
+
+Run from projectApp/:
+
+    python -m benchmarks.async_db --requests 400 --concurrency 50 --latency-ms 5
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+import httpx
+from fastapi import Depends, FastAPI, HTTPException
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app import models
+from app.database import Base, get_async_db
+from app.main import app as current_app
+from benchmarks.common import print_table, run_concurrent
+
+def slow_statements(latency_s: float):
+    def trace(_statement):
+        time.sleep(latency_s)
+    return trace
+
+def build_legacy_app(session_factory) -> FastAPI:
+    legacy = FastAPI()
+
+    def get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @legacy.get("/accounts/{account_id}")
+    async def get_account(account_id: int, db: Session = Depends(get_db)):
+        account = db.query(models.Account).filter(models.Account.id == account_id).first()
+        if not account:
+            raise HTTPException(status_code=404, detail="Account not found")
+        return {"account_id": account.id, "balance": account.balance}
+
+    return legacy
+
+async def drive(app: FastAPI, account_id: int, total: int, concurrency: int):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def send(_):
+            response = await client.get(f"/accounts/{account_id}")
+            return response.status_code == 200
+        return await run_concurrent(send, total, concurrency)
+
+async def main(args) -> None:
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    workdir = tempfile.mkdtemp()
+    path = os.path.join(workdir, "bench.db")
+    latency = args.latency_ms / 1000
+
+    # NullPool on both sides: the legacy handler closes its Session from the
+    # threadpool, which would otherwise starve a QueuePool while the loop is blocked
+    sync_engine = create_engine(
+        f"sqlite:///{path}", connect_args={"check_same_thread": False}, poolclass=NullPool
+    )
+    Base.metadata.create_all(bind=sync_engine)
+    SyncSession = sessionmaker(autoflush=False, bind=sync_engine)
+    with SyncSession() as db:
+        account = models.Account(owner="1", balance=100.0)
+        db.add(account)
+        db.commit()
+        account_id = account.id
+
+    # Latency hooks run inside the driver: on the loop thread for sqlite3,
+    # on aiosqlite's worker thread for the async engine
+    @event.listens_for(sync_engine, "connect")
+    def _sync_connect(dbapi_connection, _):
+        dbapi_connection.set_trace_callback(slow_statements(latency))
+
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    AsyncSession = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=async_engine)
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def _async_connect(dbapi_connection, _):
+        dbapi_connection.run_async(lambda conn: conn.set_trace_callback(slow_statements(latency)))
+
+    async def bench_get_async_db():
+        async with AsyncSession() as db:
+            yield db
+
+    current_app.dependency_overrides[get_async_db] = bench_get_async_db
+
+    results = {
+        "before: sync Session": await drive(build_legacy_app(SyncSession), account_id, args.requests, args.concurrency),
+        "after: AsyncSession": await drive(current_app, account_id, args.requests, args.concurrency),
+    }
+    print_table(
+        f"GET /accounts/{{id}} x{args.requests}, concurrency {args.concurrency}, "
+        f"{args.latency_ms}ms per statement",
+        results,
+    )
+
+    current_app.dependency_overrides.pop(get_async_db, None)
+    await async_engine.dispose()
+    sync_engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    asyncio.run(main(parser.parse_args()))
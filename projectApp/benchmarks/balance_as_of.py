@@ -0,0 +1,108 @@
+# benchmarks/balance_as_of.py
+"""Point-in-time balance latency: summing the whole history vs checkpoint + tail replay.
+
+One account with ``--rows`` deposits, one a minute. "full sum" is the old
+approach: add up every transaction of the account up to the timestamp.
+"checkpoint" is ``balance_as_of``, reading the nearest checkpoint and
+replaying at most ``--every`` ledger entries after it.
+
+Run from projectApp/:
+
+    python -m benchmarks.balance_as_of --rows 200000 --every 500
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import case, create_engine, func, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app import models
+from app.database import Base, to_async_url
+from app.pagination import cursor_timestamp
+from app.services.checkpoints import balance_as_of, write_checkpoints
+from app.services.ledger import journal_transactions
+from benchmarks.common import print_table, summarize
+
+def seed(sync_engine, rows: int, origin: datetime) -> int:
+    with sessionmaker(bind=sync_engine)() as db:
+        account = models.Account(owner="1", balance=0.0)
+        db.add(account)
+        db.flush()
+        chunk = 10_000
+        for start in range(0, rows, chunk):
+            db.execute(insert(models.Transaction), [
+                {"account_id": account.id, "transaction_type": models.TransactionType.deposit,
+                 "amount_minor": 100, "created_at": origin + timedelta(minutes=i)}
+                for i in range(start, min(start + chunk, rows))
+            ])
+        db.commit()
+        return account.id
+
+async def full_sum(db, account_id: int, as_of: datetime) -> int:
+    signed = case(
+        (models.Transaction.transaction_type == models.TransactionType.withdrawal, -models.Transaction.amount_minor),
+        (models.Transaction.transaction_type == models.TransactionType.deposit, models.Transaction.amount_minor),
+        else_=0,
+    )
+    return await db.scalar(
+        select(func.coalesce(func.sum(signed), 0))
+        .where(models.Transaction.account_id == account_id,
+               models.Transaction.created_at <= cursor_timestamp(db, as_of))
+    )
+
+async def main(args) -> None:
+    url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    sync_engine = create_engine(url, poolclass=NullPool)
+    Base.metadata.drop_all(bind=sync_engine)
+    Base.metadata.create_all(bind=sync_engine)
+    origin = datetime.now(timezone.utc).replace(microsecond=250000) - timedelta(minutes=args.rows + 60)
+    account_id = seed(sync_engine, args.rows, origin)
+
+    async_engine = create_async_engine(to_async_url(url), poolclass=NullPool)
+    BenchSession = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=async_engine)
+    async with BenchSession() as db:
+        ids = (await db.scalars(select(models.Transaction.id))).all()
+        for start in range(0, len(ids), 10_000):
+            await journal_transactions(db, ids[start:start + 10_000])
+        await db.commit()
+    started = time.perf_counter()
+    written = await write_checkpoints(BenchSession, every=args.every)
+    print(f"{written} checkpoints written in {time.perf_counter() - started:.2f}s")
+
+    rows = {}
+    for fraction in args.positions:
+        as_of = origin + timedelta(minutes=int(args.rows * fraction), seconds=30)
+        for name, read in [("full sum", full_sum), ("checkpoint", None)]:
+            latencies = []
+            started = time.perf_counter()
+            async with BenchSession() as db:
+                for _ in range(args.repeat):
+                    t0 = time.perf_counter()
+                    if read is None:
+                        balance = (await balance_as_of(db, account_id, as_of)).balance_minor
+                    else:
+                        balance = await read(db, account_id, as_of)
+                    latencies.append(time.perf_counter() - t0)
+            assert balance == 100 * (int(args.rows * fraction) + 1), balance
+            rows[f"{name} @ {fraction:.0%}"] = summarize(latencies, time.perf_counter() - started)
+
+    print_table(f"{args.rows} entries in one account, checkpoint every {args.every} "
+                f"({sync_engine.dialect.name})", rows)
+    await async_engine.dispose()
+    Base.metadata.drop_all(bind=sync_engine)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--every", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--positions", type=float, nargs="+", default=[0.1, 0.5, 0.99])
+    parser.add_argument("--database-url", help="sync SQLAlchemy URL; defaults to a temp SQLite file")
+    asyncio.run(main(parser.parse_args()))
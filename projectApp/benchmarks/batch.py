@@ -0,0 +1,98 @@
+# benchmarks/batch.py
+"""Ledger ingestion: one POST /transactions/ per event vs POST /transactions/batch.
+
+Run from projectApp/:
+
+    python -m benchmarks.batch --items 2000 --accounts 20 --batch-sizes 10 100 1000
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app import models
+from app.auth.jwt import create_access_token
+from app.database import Base, get_async_db, to_async_url
+from app.main import app
+from benchmarks.common import print_table, run_concurrent
+
+def make_items(account_ids, count):
+    return [
+        {"account_id": account_ids[i % len(account_ids)], "transaction_type": "deposit", "amount": 1.0}
+        for i in range(count)
+    ]
+
+async def main(args) -> None:
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    sync_engine = create_engine(url, poolclass=NullPool)
+    Base.metadata.drop_all(bind=sync_engine)
+    Base.metadata.create_all(bind=sync_engine)
+    with sessionmaker(bind=sync_engine)() as db:
+        user = models.User(full_name="Bench", email="bench@example.com", password_hash="-")
+        db.add(user)
+        db.flush()
+        accounts = [models.Account(owner=str(user.id), balance=0.0) for _ in range(args.accounts)]
+        db.add_all(accounts)
+        db.commit()
+        account_ids = [a.id for a in accounts]
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': str(user.id)})}"}
+
+    connect_args = {"timeout": 30} if url.startswith("sqlite") else {}
+    async_engine = create_async_engine(to_async_url(url), poolclass=NullPool, connect_args=connect_args)
+    BenchSession = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=async_engine)
+
+    async def bench_get_async_db():
+        async with BenchSession() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = bench_get_async_db
+    rows = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+        items = make_items(account_ids, args.items)
+
+        async def single(i):
+            response = await client.post("/transactions/", json=items[i])
+            return response.status_code == 200
+
+        started = time.perf_counter()
+        result = await run_concurrent(single, len(items), args.concurrency)
+        result["items_per_s"] = round(len(items) / (time.perf_counter() - started), 1)
+        rows["single POST"] = result
+
+        for size in args.batch_sizes:
+            chunks = [items[i:i + size] for i in range(0, len(items), size)]
+
+            async def batch(i):
+                response = await client.post("/transactions/batch", json=chunks[i])
+                return response.status_code == 200 and response.json()["rejected"] == 0
+
+            started = time.perf_counter()
+            result = await run_concurrent(batch, len(chunks), args.concurrency)
+            result["items_per_s"] = round(len(items) / (time.perf_counter() - started), 1)
+            rows[f"batch of {size}"] = result
+
+    print_table(f"{args.items} deposits over {args.accounts} accounts ({sync_engine.dialect.name})", rows)
+    print("\nitems/s: " + ", ".join(f"{name} {r['items_per_s']}" for name, r in rows.items()))
+    app.dependency_overrides.pop(get_async_db, None)
+    await async_engine.dispose()
+    Base.metadata.drop_all(bind=sync_engine)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--accounts", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--database-url", help="sync SQLAlchemy URL; defaults to a temp SQLite file")
+    asyncio.run(main(parser.parse_args()))
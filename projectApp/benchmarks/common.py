@@ -0,0 +1,60 @@
+# benchmarks/common.py
+
+import asyncio
+import statistics
+import time
+from typing import Awaitable, Callable, Dict, List
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def summarize(latencies: List[float], elapsed: float, errors: int = 0) -> Dict[str, float]:
+    """Reduce per-request latencies (seconds) to the numbers we report"""
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "req_per_s": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+async def run_concurrent(
+    send: Callable[[int], Awaitable[bool]],
+    total: int,
+    concurrency: int,
+) -> Dict[str, float]:
+    """Fire ``total`` calls of ``send(i)`` with at most ``concurrency`` in flight.
+
+    ``send`` returns True when the request succeeded; failures are counted but
+    their latency is still recorded.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(i: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            ok = await send(i)
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+def print_table(title: str, rows: Dict[str, Dict[str, float]]) -> None:
+    columns = ["requests", "errors", "req_per_s", "p50_ms", "p95_ms", "p99_ms"]
+    print(f"\n{title}")
+    print(f"{'scenario':<28}" + "".join(f"{c:>12}" for c in columns))
+    for name, result in rows.items():
+        print(f"{name:<28}" + "".join(f"{result[c]:>12}" for c in columns))
@@ -0,0 +1,111 @@
+# benchmarks/history.py
+"""Account history page latency by depth: OFFSET paging vs the keyset cursor.
+
+Run from projectApp/:
+
+    python -m benchmarks.history --rows 200000 --page-size 50
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app import models
+from app.auth.jwt import create_access_token
+from app.database import Base, get_async_db, to_async_url
+from app.main import app
+from app.pagination import encode_cursor
+from benchmarks.common import print_table, summarize
+
+async def main(args) -> None:
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    sync_engine = create_engine(url, poolclass=NullPool)
+    Base.metadata.drop_all(bind=sync_engine)
+    Base.metadata.create_all(bind=sync_engine)
+    with sessionmaker(bind=sync_engine)() as db:
+        user = models.User(full_name="Bench", email="bench@example.com", password_hash="-")
+        db.add(user)
+        db.flush()
+        account = models.Account(owner=str(user.id), balance=0.0)
+        db.add(account)
+        db.commit()
+        account_id = account.id
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': str(user.id)})}"}
+        # One row a minute, like a long-lived account, rather than all in the same second
+        origin = datetime.now(timezone.utc) - timedelta(minutes=args.rows)
+        chunk = 10_000
+        for start in range(0, args.rows, chunk):
+            db.execute(insert(models.Transaction), [
+                {"account_id": account_id, "transaction_type": models.TransactionType.deposit,
+                 "amount_minor": 100, "created_at": origin + timedelta(minutes=i)}
+                for i in range(start, min(start + chunk, args.rows))
+            ])
+        db.commit()
+        # Ids of the rows sitting at each probed depth, newest first
+        ordered = db.query(models.Transaction.created_at, models.Transaction.id).order_by(
+            models.Transaction.created_at.desc(), models.Transaction.id.desc()
+        )
+        depths = [d for d in args.depths if d < args.rows]
+        anchors = {d: ordered.offset(d - 1).first() if d else None for d in depths}
+
+    async_engine = create_async_engine(to_async_url(url), poolclass=NullPool)
+    BenchSession = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=async_engine)
+
+    async def bench_get_async_db():
+        async with BenchSession() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = bench_get_async_db
+    rows = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+        for depth in depths:
+            params = {"limit": args.page_size}
+            if anchors[depth]:
+                params["after"] = encode_cursor(*anchors[depth])
+            latencies = []
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                response = await client.get(f"/transactions/{account_id}", params=params)
+                assert response.status_code == 200, response.text
+                latencies.append(time.perf_counter() - t0)
+            rows[f"cursor @ row {depth}"] = summarize(latencies, time.perf_counter() - started)
+
+    # The same depths with OFFSET, as the old unbounded listing would need
+    with sessionmaker(bind=sync_engine)() as db:
+        for depth in depths:
+            latencies = []
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                db.query(models.Transaction).filter(models.Transaction.account_id == account_id).order_by(
+                    models.Transaction.created_at.desc(), models.Transaction.id.desc()
+                ).offset(depth).limit(args.page_size).all()
+                latencies.append(time.perf_counter() - t0)
+            rows[f"offset @ row {depth}"] = summarize(latencies, time.perf_counter() - started)
+
+    print_table(f"{args.rows} rows in one account, page size {args.page_size} ({sync_engine.dialect.name})", rows)
+    app.dependency_overrides.pop(get_async_db, None)
+    await async_engine.dispose()
+    Base.metadata.drop_all(bind=sync_engine)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--depths", type=int, nargs="+", default=[0, 10_000, 100_000, 190_000])
+    parser.add_argument("--database-url", help="sync SQLAlchemy URL; defaults to a temp SQLite file")
+    asyncio.run(main(parser.parse_args()))
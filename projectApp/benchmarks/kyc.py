@@ -0,0 +1,149 @@
+# benchmarks/kyc.py
+"""KYC verification throughput: one blocking call per background task vs the dispatcher.
+
+Both scenarios verify the same documents against the stub provider
+(app/kyc_stub.py) served by uvicorn in a separate process, so connection
+setup is real. "background-task" is the old path: a sync ``httpx.post`` on a new
+connection and a per-document session commit, on a 40-thread pool like
+Starlette's. "dispatcher" is ``KycDispatcher`` with a shared pool and
+batched writes.
+
+Run from projectApp/:
+
+    python -m benchmarks.kyc --documents 500 --latency 0.05 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import tempfile
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from sqlalchemy import create_engine, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.config import settings
+from app.database import Base
+from app.models import KycDocument, KycStatusEnum, User
+from app.services.kyc_dispatcher import KycDispatcher, document_url
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def serve_stub(port: int, latency: float) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.kyc_stub:app", "--port", str(port), "--log-level", "warning"],
+        env={**os.environ, "KYC_STUB_LATENCY": str(latency)},
+    )
+    for _ in range(500):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/_stats")
+            return server
+        except httpx.TransportError:
+            time.sleep(0.02)
+    server.kill()
+    raise RuntimeError("KYC stub did not start")
+
+def seed(Session, count: int):
+    with Session() as db:
+        db.query(KycDocument).delete()
+        db.query(User).delete()
+        users = [User(full_name=f"User {i}", email=f"user{i}@bench.example.com", password_hash="x")
+                 for i in range(count)]
+        db.add_all(users)
+        db.flush()
+        docs = [KycDocument(user_id=user.id, file_name=f"{user.id}_id.pdf", file_path=f"{user.id}_id.pdf",
+                            file_type="application/pdf") for user in users]
+        db.add_all(docs)
+        db.commit()
+        return [(doc.id, doc.user_id, document_url(doc.file_name)) for doc in docs]
+
+def legacy_call(Session, job) -> None:
+    """What the old BackgroundTask did for one document"""
+    document_id, user_id, url = job
+    response = httpx.post(
+        str(settings.KYC_API_URL),
+        headers={"Authorization": f"Bearer {settings.KYC_API_KEY}"},
+        json={"user_id": user_id, "document_url": url},
+    )
+    ok = response.status_code == 200 and response.json().get("status") == "verified"
+    status = KycStatusEnum.verified if ok else KycStatusEnum.failed
+    with Session() as db:
+        db.execute(update(KycDocument).where(KycDocument.id == document_id).values(doc_status=status))
+        db.execute(update(User).where(User.id == user_id).values(kyc_status=status))
+        db.commit()
+
+def run_legacy(Session, jobs) -> dict:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=40) as pool:
+        list(pool.map(lambda job: legacy_call(Session, job), jobs))
+    return {"elapsed_s": time.perf_counter() - started, "commits": len(jobs)}
+
+async def run_dispatcher(AsyncSession, jobs, args) -> dict:
+    kyc = KycDispatcher(session_factory=AsyncSession, concurrency=args.concurrency, requeue_pending=False)
+    await kyc.start()
+    started = time.perf_counter()
+    for job in jobs:
+        kyc.submit(*job)
+    await kyc.stop()
+    return {"elapsed_s": time.perf_counter() - started, "commits": kyc.stats()["flushes"]}
+
+def main(args) -> None:
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    sync_engine = create_engine(f"sqlite:///{path}", connect_args={"timeout": 30})
+    Base.metadata.create_all(bind=sync_engine)
+    Session = sessionmaker(bind=sync_engine)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    AsyncSession = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=async_engine)
+
+    rows = {}
+    for scenario in args.scenarios:
+        port = free_port()
+        server = serve_stub(port, args.latency)
+        settings.KYC_API_URL = f"http://127.0.0.1:{port}/api"
+        jobs = seed(Session, args.documents)
+        if scenario == "background-task":
+            result = run_legacy(Session, jobs)
+        else:
+            result = asyncio.run(run_dispatcher(AsyncSession, jobs, args))
+        provider = httpx.get(f"http://127.0.0.1:{port}/_stats").json()
+        server.terminate()
+        server.wait()
+        with Session() as db:
+            verified = db.query(KycDocument).filter(KycDocument.doc_status == KycStatusEnum.verified).count()
+        rows[scenario] = {
+            "documents": len(jobs),
+            "verified": verified,
+            "docs_per_s": round(len(jobs) / result["elapsed_s"], 1),
+            "elapsed_s": round(result["elapsed_s"], 2),
+            "connections": provider["connections"],
+            "db_commits": result["commits"],
+        }
+
+    columns = ["documents", "verified", "docs_per_s", "elapsed_s", "connections", "db_commits"]
+    print(f"\n{args.documents} documents, provider latency {args.latency * 1000:.0f} ms, "
+          f"dispatcher concurrency {args.concurrency}")
+    print(f"{'scenario':<20}" + "".join(f"{c:>13}" for c in columns))
+    for name, result in rows.items():
+        print(f"{name:<20}" + "".join(f"{result[c]:>13}" for c in columns))
+    sync_engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub provider latency, seconds")
+    parser.add_argument("--concurrency", type=int, default=settings.KYC_CONCURRENCY)
+    parser.add_argument("--scenarios", nargs="+", default=["background-task", "dispatcher"],
+                        choices=["background-task", "dispatcher"])
+    main(parser.parse_args())
@@ -0,0 +1,113 @@
+# benchmarks/login.py
+"""Login throughput with bcrypt inline on the event loop vs on the hash pool.
+
+While the login burst runs, a probe keeps hitting the health check so the
+report also shows how responsive the rest of the worker stays.
+
+Run from projectApp/:
+
+    python -m benchmarks.login --requests 200 --concurrency 32 --workers 4
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app import models
+from app.auth import passwords
+from app.config import settings
+from app.database import Base, get_async_db
+from app.main import app
+from benchmarks.common import print_table, run_concurrent, summarize
+
+PASSWORD = "bench-password"
+
+async def probe_health(client: httpx.AsyncClient, stop: asyncio.Event, interval: float):
+    latencies = []
+    started = time.perf_counter()
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await client.get("/")
+        latencies.append(time.perf_counter() - t0)
+        await asyncio.sleep(interval)
+    return summarize(latencies, time.perf_counter() - started)
+
+async def run_scenario(kind: str, args) -> dict:
+    passwords.password_pool = passwords.PasswordHashPool(
+        kind=kind, max_workers=args.workers, max_pending=args.max_pending
+    )
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def login(i):
+                response = await client.post("/auth/login", json={
+                    "email": f"user{i % args.users}@bench.example.com",
+                    "password": PASSWORD,
+                })
+                return response.status_code == 200
+
+            stop = asyncio.Event()
+            probe = asyncio.create_task(probe_health(client, stop, args.probe_interval))
+            result = await run_concurrent(login, args.requests, args.concurrency)
+            stop.set()
+            health = await probe
+    finally:
+        passwords.password_pool.shutdown()
+    return {"login": result, "health": health}
+
+async def main(args) -> None:
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    sync_engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=sync_engine)
+
+    # One hash for every user keeps seeding cheap; verification cost is identical
+    password_hash = passwords.get_password_hash(PASSWORD)
+    with sessionmaker(bind=sync_engine)() as db:
+        db.add_all([
+            models.User(full_name=f"User {i}", email=f"user{i}@bench.example.com", password_hash=password_hash)
+            for i in range(args.users)
+        ])
+        db.commit()
+
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    AsyncSession = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=async_engine)
+
+    async def bench_get_async_db():
+        async with AsyncSession() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = bench_get_async_db
+    rows = {}
+    for kind in args.kinds:
+        result = await run_scenario(kind, args)
+        rows[f"{kind}: POST /auth/login"] = result["login"]
+        rows[f"{kind}: GET / (probe)"] = result["health"]
+    print_table(
+        f"bcrypt rounds {settings.BCRYPT_ROUNDS}, {args.requests} logins, "
+        f"concurrency {args.concurrency}, {args.workers} workers",
+        rows,
+    )
+    app.dependency_overrides.pop(get_async_db, None)
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=settings.PASSWORD_HASH_WORKERS)
+    parser.add_argument("--max-pending", type=int, default=10_000)
+    parser.add_argument("--probe-interval", type=float, default=0.01)
+    parser.add_argument("--kinds", nargs="+", default=["inline", "thread", "process"],
+                        choices=["inline", "thread", "process"])
+    asyncio.run(main(parser.parse_args()))
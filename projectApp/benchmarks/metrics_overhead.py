@@ -0,0 +1,89 @@
+# benchmarks/metrics_overhead.py
+"""Per-request cost of MetricsMiddleware, in microseconds.
+
+Calls a one-route FastAPI app directly over ASGI, with no server and no
+sockets, with and without the middleware, so the difference is the
+middleware itself. It also times ``MetricsRegistry.observe`` alone (a
+bisect plus a few in-place writes to the mmap). Rounds alternate between
+the two apps, so drift in CPU frequency hits both alike.
+
+Run from projectApp/:
+
+    python -m benchmarks.metrics_overhead --requests 20000 --rounds 5
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+
+from fastapi import FastAPI
+
+from app.metrics import MetricsMiddleware, MetricsRegistry
+from benchmarks.common import percentile
+
+def build_app(registry=None) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int):
+        return {"item_id": item_id}
+
+    if registry is not None:
+        app.add_middleware(MetricsMiddleware, registry=registry)
+    return app
+
+async def time_requests(app, requests: int):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/items/7", "raw_path": b"/items/7", "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    latencies = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        await app(dict(scope), receive, send)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+def micros(samples, pct=None) -> float:
+    value = statistics.fmean(samples) if pct is None else percentile(samples, pct)
+    return round(value * 1e6, 2)
+
+async def main(args) -> None:
+    registry = MetricsRegistry(tempfile.mkdtemp(prefix="bench-metrics-"))
+    apps = {"bare": build_app(), "with_metrics": build_app(registry)}
+    samples = {name: [] for name in apps}
+    for name, app in apps.items():
+        await time_requests(app, 500)  # warm up routing and the series cache
+    for _ in range(args.rounds):
+        for name, app in apps.items():
+            samples[name].extend(await time_requests(app, args.requests))
+
+    observe = []
+    for i in range(args.requests):
+        started = time.perf_counter()
+        registry.observe("GET", "/items/{item_id}", 200, (i % 100) / 1000, 0, 13)
+        observe.append(time.perf_counter() - started)
+    samples["observe_only"] = observe
+
+    print(f"\n{args.requests * args.rounds} requests per app, sequential (microseconds)")
+    print(f"{'scenario':<28}{'mean_us':>12}{'p50_us':>12}{'p95_us':>12}{'p99_us':>12}")
+    for name, values in samples.items():
+        print(f"{name:<28}{micros(values):>12}{micros(values, 50):>12}{micros(values, 95):>12}{micros(values, 99):>12}")
+    overhead = micros(samples["with_metrics"], 50) - micros(samples["bare"], 50)
+    print(f"\nmiddleware overhead at p50: {overhead:.2f} us per request")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
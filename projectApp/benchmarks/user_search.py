@@ -0,0 +1,86 @@
+# benchmarks/user_search.py
+"""Admin user search: leading-wildcard LIKE scan vs the indexed search.
+
+On SQLite the indexed path is the in-process trigram index (built once, on the
+first query); pass a PostgreSQL URL to exercise the pg_trgm GIN indexes after
+`alembic upgrade head`.
+
+Run from projectApp/:
+
+    python -m benchmarks.user_search --users 200000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import string
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert, or_, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.database import Base, to_async_url
+from app.models import User
+from app.services.user_search import search_users
+from benchmarks.common import print_table, summarize
+
+QUERIES = ["ann", "smith", "example.org", "zq", "lee 4", "user12345"]
+
+def fake_users(count, seed=7):
+    rng = random.Random(seed)
+    first = ["Ann", "Bob", "Carla", "Dmitri", "Eve", "Farah", "Gus", "Hannah", "Ivo", "Joanna"]
+    last = ["Smith", "Lee", "Ng", "Berg", "Stone", "Ruiz", "Okafor", "Novak", "Kim", "Patel"]
+    for i in range(count):
+        tag = "".join(rng.choices(string.ascii_lowercase, k=4))
+        yield {
+            "full_name": f"{rng.choice(first)} {rng.choice(last)} {i % 97}",
+            "email": f"user{i}.{tag}@example.{rng.choice(['com', 'org', 'net'])}",
+            "password_hash": "-",
+        }
+
+async def main(args) -> None:
+    url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    sync_engine = create_engine(url, poolclass=NullPool)
+    Base.metadata.drop_all(bind=sync_engine)
+    Base.metadata.create_all(bind=sync_engine)
+    rows = list(fake_users(args.users))
+    with sync_engine.begin() as conn:
+        for start in range(0, len(rows), 10_000):
+            conn.execute(insert(User), rows[start:start + 10_000])
+
+    async_engine = create_async_engine(to_async_url(url), poolclass=NullPool)
+    BenchSession = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=async_engine)
+    results = {}
+    async with BenchSession() as db:
+        started = time.perf_counter()
+        await search_users(db, "warmup", 20)
+        print(f"first query (index build on SQLite): {(time.perf_counter() - started) * 1000:.0f} ms")
+
+        for label, run in (
+            ("LIKE '%q%' scan", lambda q: db.scalars(
+                select(User).where(or_(User.full_name.ilike(f"%{q}%"), User.email.ilike(f"%{q}%"))).limit(20)
+            )),
+            ("indexed search", lambda q: search_users(db, q, 20)),
+        ):
+            latencies = []
+            began = time.perf_counter()
+            for _ in range(args.repeat):
+                for q in QUERIES:
+                    t0 = time.perf_counter()
+                    await run(q)
+                    latencies.append(time.perf_counter() - t0)
+            results[label] = summarize(latencies, time.perf_counter() - began)
+
+    print_table(f"search over {args.users} users, {len(QUERIES)} queries ({sync_engine.dialect.name})", results)
+    await async_engine.dispose()
+    Base.metadata.drop_all(bind=sync_engine)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--database-url", help="sync SQLAlchemy URL; defaults to a temp SQLite file")
+    asyncio.run(main(parser.parse_args()))
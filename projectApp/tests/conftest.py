@@ -1,27 +1,54 @@
 import os
 import shutil
 import tempfile
+import httpx
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool
 
-from app.database import Base, get_db
+from app.database import Base, get_db, get_async_db, get_async_session_factory
 from app.main import app
 from app.config import settings
 from app.config import settings
+from app.kyc_stub import create_stub
+from app.replica import replica_router
+from app.services.checkpoints import balance_checkpointer
+from app.sql_profiler import sql_profiler
+from app.services.idempotency import idempotency_store
+from app.services.kyc_dispatcher import kyc_dispatcher
+from app.services.log_retention import log_maintenance
+from app.services.log_writer import system_log_writer
+from app.services.stats import stats_service
+from app.services.user_search import user_search_index
+from app.auth.principal_cache import principal_cache
 
-# Use in-memory SQLite for testing
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+# File-backed SQLite so the sync engine (schema setup, assertions) and the
+# aiosqlite engine used by the app see the same database
+TEST_DB_DIR = tempfile.mkdtemp()
+TEST_DB_PATH = os.path.join(TEST_DB_DIR, "test.db")
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{TEST_DB_PATH}"
+ASYNC_SQLALCHEMY_DATABASE_URL = f"sqlite+aiosqlite:///{TEST_DB_PATH}"
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
     connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Every TestClient runs its own event loop, so async connections are never pooled.
+# SQLite serialises writers; the long busy timeout lets concurrency tests queue up.
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL,
+    poolclass=NullPool,
+    connect_args={"timeout": 30},
+)
+TestingAsyncSessionLocal = async_sessionmaker(
+    autoflush=False, expire_on_commit=False, bind=async_engine
+)
+
 @pytest.fixture(scope="session")
 def temp_uploads_dir():
     """Create a temporary uploads directory for tests"""
@@ -42,11 +69,28 @@ def override_get_db():
     finally:
         db.close()
 
+async def override_get_async_db():
+    """Override async database dependency for testing"""
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
 @pytest.fixture(scope="session", autouse=True)
 def test_app(temp_uploads_dir):
     """Create test app with overridden dependencies"""
     app.dependency_overrides[get_db] = override_get_db
-    return app
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_async_session_factory] = lambda: TestingAsyncSessionLocal
+    system_log_writer.session_factory = TestingAsyncSessionLocal
+    stats_service.session_factory = TestingAsyncSessionLocal
+    log_maintenance.session_factory = TestingAsyncSessionLocal
+    kyc_dispatcher.session_factory = TestingAsyncSessionLocal
+    balance_checkpointer.session_factory = TestingAsyncSessionLocal
+    idempotency_store.session_factory = TestingAsyncSessionLocal
+    sql_profiler.watch(async_engine.sync_engine)
+    kyc_dispatcher.transport = httpx.ASGITransport(app=create_stub())
+    yield app
+    engine.dispose()
+    shutil.rmtree(TEST_DB_DIR, ignore_errors=True)
 
 @pytest.fixture(autouse=True, scope="function")
 def test_db():
@@ -54,6 +98,11 @@ def test_db():
     Base.metadata.create_all(bind=engine)
     yield
     Base.metadata.drop_all(bind=engine)
+    # Ids restart with every database, so cached principals must not leak across tests
+    principal_cache.clear()
+    user_search_index.clear()
+    idempotency_store.clear()
+    replica_router.clear()
 
 @pytest.fixture(scope="function")
 def client(test_app, test_db, temp_uploads_dir):
@@ -0,0 +1,108 @@
+import asyncio
+
+from app.config import settings
+from app.models import KYCRequest, StatCounter, User
+from app.services.stats import USERS_TOTAL, stats_service
+from tests.conftest import TestingSessionLocal
+from tests.test_balances import create_account, register
+
+def admin_headers(client):
+    client.post("/auth/admin/init")
+    response = client.post("/auth/admin/login", json={
+        "email": settings.DEFAULT_ADMIN_EMAIL,
+        "password": settings.DEFAULT_ADMIN_PASSWORD
+    })
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def fresh_stats(client, headers):
+    asyncio.run(stats_service.flush())
+    stats_service._cached = None
+    return client.get("/api/admin/stats", headers=headers).json()
+
+def test_counters_follow_writes(client):
+    headers = admin_headers(client)
+    assert fresh_stats(client, headers)["totalUsers"] == 1
+
+    user_id, user_headers = register(client, "counted@example.com")
+    account_id = create_account(owner=str(user_id))
+    client.post("/deposit/", json={"account_id": account_id, "amount": 10.0})
+    client.post("/transactions/batch", headers=user_headers, json=[
+        {"account_id": account_id, "transaction_type": "withdrawal", "amount": 1.0},
+        {"account_id": account_id, "transaction_type": "withdrawal", "amount": 100.0},
+    ])
+    db = TestingSessionLocal()
+    try:
+        db.add(KYCRequest(user_id=1))
+        db.commit()
+    finally:
+        db.close()
+
+    stats = fresh_stats(client, headers)
+    assert stats["totalUsers"] == 2
+    assert stats["transactionsLast24h"] == 2
+    assert stats["pendingKYC"] == 1
+
+    request_id = client.get("/api/admin/kyc", headers=headers).json()[0]["id"]
+    client.post(f"/api/admin/kyc/{request_id}/approve", headers=headers)
+    assert fresh_stats(client, headers)["pendingKYC"] == 0
+
+def test_rolled_back_writes_are_not_counted(client):
+    headers = admin_headers(client)
+    db = TestingSessionLocal()
+    try:
+        db.add(User(full_name="Ghost", email="ghost@example.com", password_hash="-"))
+        db.flush()
+        db.rollback()
+    finally:
+        db.close()
+    assert fresh_stats(client, headers)["totalUsers"] == 1
+
+def test_snapshot_is_cached_for_ttl(client):
+    headers = admin_headers(client)
+    asyncio.run(stats_service.flush())
+    stats_service._cached = None
+    assert client.get("/api/admin/stats", headers=headers).json()["totalUsers"] == 1
+    register(client, "late@example.com")
+    asyncio.run(stats_service.flush())
+    # Still inside the TTL: the cached snapshot is served
+    assert client.get("/api/admin/stats", headers=headers).json()["totalUsers"] == 1
+
+def test_reconcile_repairs_drift(client):
+    headers = admin_headers(client)
+    asyncio.run(stats_service.flush())
+    db = TestingSessionLocal()
+    try:
+        db.get(StatCounter, USERS_TOTAL).value = 42
+        db.commit()
+    finally:
+        db.close()
+
+    account_id = create_account()
+    client.post("/deposit/", json={"account_id": account_id, "amount": 1.0})
+
+    response = client.post("/api/admin/stats/reconcile", headers=headers)
+    assert response.json()["drift"][USERS_TOTAL] == 1 - 42
+    assert client.get("/api/admin/stats", headers=headers).json()["totalUsers"] == 1
+
+    # Later deltas land on the recounted hourly bucket
+    client.post("/deposit/", json={"account_id": account_id, "amount": 1.0})
+    assert fresh_stats(client, headers)["transactionsLast24h"] == 2
+
+def test_commit_racing_reconcile_is_counted_once(client, monkeypatch):
+    headers = admin_headers(client)
+    open_session = stats_service._session
+
+    def session_after_a_commit():
+        # Lands after reconcile() starts but before its recount reads users
+        db = TestingSessionLocal()
+        try:
+            db.add(User(full_name="Racer", email="racer@example.com", password_hash="x"))
+            db.commit()
+        finally:
+            db.close()
+        monkeypatch.setattr(stats_service, "_session", open_session)
+        return open_session()
+
+    monkeypatch.setattr(stats_service, "_session", session_after_a_commit)
+    asyncio.run(stats_service.reconcile())
+    assert fresh_stats(client, headers)["totalUsers"] == 2
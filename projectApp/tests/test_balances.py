@@ -0,0 +1,134 @@
+import asyncio
+import time
+import pytest
+from app.models import Account, Transaction, TransactionType
+from app.services.balances import AccountNotFound, InsufficientFunds, post_transaction
+from tests.conftest import TestingSessionLocal, TestingAsyncSessionLocal
+
+def create_account(owner="1", balance=0.0):
+    db = TestingSessionLocal()
+    try:
+        account = Account(owner=owner, balance=balance)
+        db.add(account)
+        db.commit()
+        return account.id
+    finally:
+        db.close()
+
+async def deposit(account_id, amount):
+    async with TestingAsyncSessionLocal() as db:
+        posted = await post_transaction(db, account_id, TransactionType.deposit, amount)
+        await db.commit()
+        return posted
+
+async def test_concurrent_deposits_do_not_lose_updates():
+    """Thousands of parallel deposits to one account all land exactly once"""
+    account_id = create_account()
+    total, concurrency = 2000, 32
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(_):
+        async with semaphore:
+            await deposit(account_id, 1.0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+    print(f"\n{total} deposits in {elapsed:.2f}s ({total / elapsed:.0f}/s)")
+
+    db = TestingSessionLocal()
+    try:
+        assert db.get(Account, account_id).balance == total
+        assert db.query(Transaction).filter(Transaction.account_id == account_id).count() == total
+    finally:
+        db.close()
+
+async def test_withdrawal_rejected_without_funds():
+    account_id = create_account(balance=10.0)
+    async with TestingAsyncSessionLocal() as db:
+        with pytest.raises(InsufficientFunds):
+            await post_transaction(db, account_id, TransactionType.withdrawal, 25.0)
+        posted = await post_transaction(db, account_id, TransactionType.withdrawal, 10.0)
+        await db.commit()
+    assert posted.balance == 0.0
+    assert posted.amount == 10.0
+
+async def test_owner_mismatch_reports_not_found():
+    account_id = create_account(owner="1", balance=10.0)
+    async with TestingAsyncSessionLocal() as db:
+        with pytest.raises(AccountNotFound):
+            await post_transaction(db, account_id, TransactionType.deposit, 5.0, owner="2")
+        with pytest.raises(AccountNotFound):
+            await post_transaction(db, account_id + 100, TransactionType.deposit, 5.0)
+
+def test_deposit_endpoint_records_transaction(client):
+    account_id = create_account(balance=5.0)
+    response = client.post("/deposit/", json={"account_id": account_id, "amount": 20.0})
+    assert response.status_code == 200
+    assert response.json()["new_balance"] == 25.0
+
+    db = TestingSessionLocal()
+    try:
+        tx = db.query(Transaction).filter(Transaction.account_id == account_id).one()
+        assert tx.transaction_type == TransactionType.deposit
+        assert tx.amount == 20.0
+    finally:
+        db.close()
+
+    assert client.post("/deposit/", json={"account_id": 9999, "amount": 1.0}).status_code == 404
+
+def register(client, email):
+    response = client.post("/auth/register", data={
+        "full_name": "Batch User",
+        "email": email,
+        "password": "testpass123",
+    }, files={
+        "id_document": ("test.pdf", b"test content", "application/pdf")
+    })
+    body = response.json()
+    return body["user_id"], {"Authorization": f"Bearer {body['access_token']}"}
+
+def test_transaction_batch_checks_funds_in_order(client):
+    """Items are applied per account in order; rejections don't stop the batch"""
+    user_id, headers = register(client, "batch@example.com")
+    first = create_account(owner=str(user_id), balance=10.0)
+    second = create_account(owner=str(user_id), balance=0.0)
+    foreign = create_account(owner="999", balance=100.0)
+
+    response = client.post("/transactions/batch", json=[
+        {"account_id": first, "transaction_type": "withdrawal", "amount": 15.0},
+        {"account_id": first, "transaction_type": "deposit", "amount": 10.0},
+        {"account_id": first, "transaction_type": "withdrawal", "amount": 15.0},
+        {"account_id": second, "transaction_type": "deposit", "amount": 3.0},
+        {"account_id": foreign, "transaction_type": "withdrawal", "amount": 1.0},
+    ], headers=headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["applied"] == 3
+    assert body["rejected"] == 2
+    statuses = [(r["status"], r["balance"], r["error"]) for r in body["results"]]
+    assert statuses == [
+        ("rejected", None, "Insufficient funds"),
+        ("applied", 20.0, None),
+        ("applied", 5.0, None),
+        ("applied", 3.0, None),
+        ("rejected", None, "Account not found"),
+    ]
+    assert all(r["transaction_id"] for r in body["results"] if r["status"] == "applied")
+
+    db = TestingSessionLocal()
+    try:
+        assert db.get(Account, first).balance == 5.0
+        assert db.get(Account, second).balance == 3.0
+        assert db.get(Account, foreign).balance == 100.0
+        assert db.query(Transaction).count() == 3
+    finally:
+        db.close()
+
+def test_transaction_batch_size_limit(client, monkeypatch):
+    from app.config import settings
+    _, headers = register(client, "limit@example.com")
+    monkeypatch.setattr(settings, "TRANSACTION_BATCH_MAX_ITEMS", 2)
+    item = {"account_id": 1, "transaction_type": "deposit", "amount": 1.0}
+    response = client.post("/transactions/batch", json=[item] * 3, headers=headers)
+    assert response.status_code == 413
@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta, timezone
+
+from app.models import BalanceCheckpoint, LedgerEntry, Transaction, TransactionType
+from app.services.checkpoints import balance_as_of, write_checkpoints
+from tests.conftest import TestingAsyncSessionLocal, TestingSessionLocal
+from tests.test_balances import create_account
+
+NOW = datetime.now(timezone.utc).replace(hour=12, minute=0, second=0, microsecond=500000)
+
+def post_history(account_id, moments, amount_minor=100):
+    """Journal one deposit per moment, with the timestamps given"""
+    db = TestingSessionLocal()
+    try:
+        for moment in moments:
+            transaction = Transaction(account_id=account_id, transaction_type=TransactionType.deposit,
+                                      amount_minor=amount_minor, created_at=moment)
+            db.add(transaction)
+            db.flush()
+            db.add_all([
+                LedgerEntry(transaction_id=transaction.id, account_id=account_id,
+                            amount_minor=amount_minor, created_at=moment),
+                LedgerEntry(transaction_id=transaction.id, account_id=None,
+                            amount_minor=-amount_minor, created_at=moment),
+            ])
+        db.commit()
+    finally:
+        db.close()
+
+def checkpoints(account_id):
+    db = TestingSessionLocal()
+    try:
+        return [(c.as_of.replace(tzinfo=timezone.utc), c.balance_minor) for c in
+                db.query(BalanceCheckpoint).filter_by(account_id=account_id).order_by(BalanceCheckpoint.as_of)]
+    finally:
+        db.close()
+
+async def as_of(account_id, moment):
+    async with TestingAsyncSessionLocal() as db:
+        return await balance_as_of(db, account_id, moment)
+
+async def test_checkpoints_every_n_entries_and_at_day_end():
+    account_id = create_account()
+    # Three days of hourly deposits, the last day still running
+    moments = [NOW - timedelta(hours=60) + timedelta(hours=i) for i in range(60)]
+    post_history(account_id, moments)
+
+    written = await write_checkpoints(TestingAsyncSessionLocal, now=NOW, every=25, settle=0)
+    written_at = checkpoints(account_id)
+    assert written == len(written_at)
+    # 25th and 50th entry, plus the last entry of each finished day
+    expected = {moments[24], moments[49]} | {
+        max(m for m in moments if m.date() == day) for day in {m.date() for m in moments} if day < NOW.date()
+    }
+    assert {at for at, _ in written_at} == expected
+    for at, balance_minor in written_at:
+        assert balance_minor == 100 * sum(1 for m in moments if m <= at)
+
+    # Nothing is due twice
+    assert await write_checkpoints(TestingAsyncSessionLocal, now=NOW, every=25, settle=0) == 0
+
+async def test_balance_as_of_replays_only_the_tail():
+    account_id = create_account()
+    moments = [NOW - timedelta(days=30) + timedelta(minutes=7 * i) for i in range(2000)]
+    post_history(account_id, moments)
+    await write_checkpoints(TestingAsyncSessionLocal, now=NOW, every=100, settle=0)
+
+    for probe in [moments[0] - timedelta(seconds=1), moments[0], moments[150], moments[999],
+                  moments[1000] + timedelta(seconds=1), moments[-1], NOW]:
+        result = await as_of(account_id, probe)
+        assert result.balance_minor == 100 * sum(1 for m in moments if m <= probe)
+        assert result.replayed_entries <= 100
+
+async def test_later_runs_continue_from_the_last_checkpoint():
+    account_id = create_account()
+    first = [NOW - timedelta(hours=10) + timedelta(minutes=i) for i in range(10)]
+    post_history(account_id, first, amount_minor=250)
+    await write_checkpoints(TestingAsyncSessionLocal, now=NOW, every=10, settle=0)
+    assert checkpoints(account_id) == [(first[-1], 2500)]
+
+    # Entries sharing a timestamp all land on the same side of a checkpoint
+    tied = NOW - timedelta(hours=5)
+    post_history(account_id, [tied] * 15)
+    await write_checkpoints(TestingAsyncSessionLocal, now=NOW, every=10, settle=0)
+    assert checkpoints(account_id) == [(first[-1], 2500), (tied, 4000)]
+    assert (await as_of(account_id, tied)).balance_minor == 4000
+
+async def test_unsettled_entries_are_not_checkpointed():
+    account_id = create_account()
+    post_history(account_id, [NOW - timedelta(seconds=s) for s in (900, 60, 30)])
+    await write_checkpoints(TestingAsyncSessionLocal, now=NOW, every=1, settle=300)
+    assert checkpoints(account_id) == [(NOW - timedelta(seconds=900), 100)]
+    assert (await as_of(account_id, NOW)).balance_minor == 300
+
+def test_balance_endpoint(client):
+    account_id = create_account()
+    assert client.post("/deposit/", json={"account_id": account_id, "amount": 12.5}).status_code == 200
+
+    body = client.get(f"/accounts/{account_id}/balance").json()
+    assert body["balance"] == 12.5
+    assert body["checkpoint_at"] is None and body["replayed_entries"] == 1
+
+    past = client.get(f"/accounts/{account_id}/balance",
+                      params={"as_of": (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()})
+    assert past.status_code == 200
+    assert past.json()["balance"] == 0.0
+
+    assert client.get("/accounts/999999/balance").status_code == 404
+    assert client.get(f"/accounts/{account_id}/balance", params={"as_of": "yesterday"}).status_code == 422
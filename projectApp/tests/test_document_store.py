@@ -0,0 +1,116 @@
+import hashlib
+import os
+
+from app.models import DocumentBlob, KycDocument, User
+from app.services.document_store import DocumentStore, document_store, migrate_documents
+from tests.conftest import TestingAsyncSessionLocal, TestingSessionLocal
+
+def register(client, email, content):
+    response = client.post("/auth/register", data={
+        "full_name": "Store User",
+        "email": email,
+        "password": "testpass123",
+    }, files={
+        "id_document": ("passport.pdf", content, "application/pdf")
+    })
+    assert response.status_code == 201
+    return response.json()["user_id"]
+
+def blobs():
+    db = TestingSessionLocal()
+    try:
+        return {blob.sha256: blob.ref_count for blob in db.query(DocumentBlob)}
+    finally:
+        db.close()
+
+def documents():
+    db = TestingSessionLocal()
+    try:
+        return db.query(KycDocument).order_by(KycDocument.id).all()
+    finally:
+        db.close()
+
+def test_keys_are_sharded_by_digest(tmp_path):
+    store = DocumentStore(root=str(tmp_path), shard_depth=2, shard_width=2)
+    digest = hashlib.sha256(b"scan").hexdigest()
+    assert store.key(digest) == f"blobs/{digest[:2]}/{digest[2:4]}/{digest}"
+    assert store.path(store.key(digest)) == os.path.join(tmp_path, "blobs", digest[:2], digest[2:4], digest)
+    # Legacy absolute paths resolve to themselves
+    assert store.path("/srv/uploads/1_passport.pdf") == "/srv/uploads/1_passport.pdf"
+
+def test_identical_uploads_share_one_file(client):
+    """Re-uploading the same content adds a reference instead of a second copy"""
+    register(client, "first@example.com", b"same passport scan")
+    register(client, "second@example.com", b"same passport scan")
+    register(client, "third@example.com", b"another scan")
+
+    first, second, third = documents()
+    assert first.file_path == second.file_path != third.file_path
+    assert first.file_path.startswith("blobs/")
+    assert blobs() == {first.sha256: 2, third.sha256: 1}
+    assert os.path.isfile(document_store.path(first.file_path))
+
+async def test_garbage_collection_removes_unreferenced_blobs(client):
+    register(client, "first@example.com", b"same passport scan")
+    register(client, "second@example.com", b"same passport scan")
+    first, second = documents()
+    path = document_store.path(first.file_path)
+
+    db = TestingSessionLocal()
+    try:
+        db.delete(db.get(KycDocument, first.id))
+        db.commit()
+    finally:
+        db.close()
+    assert blobs() == {first.sha256: 1}
+    assert await document_store.collect_garbage(TestingAsyncSessionLocal) == 0
+
+    db = TestingSessionLocal()
+    try:
+        db.delete(db.get(KycDocument, second.id))
+        db.commit()
+    finally:
+        db.close()
+    assert await document_store.collect_garbage(TestingAsyncSessionLocal) == 1
+    assert blobs() == {}
+    assert not os.path.exists(path)
+
+async def test_migration_rehomes_legacy_files(tmp_path):
+    """Flat uploads move into the store in batches, duplicates collapse, missing files stay put"""
+    store = DocumentStore(root=str(tmp_path))
+    contents = [b"alpha", b"beta", b"alpha", b"gamma", None]
+    db = TestingSessionLocal()
+    try:
+        user = User(full_name="Legacy", email="legacy@example.com", password_hash="x")
+        db.add(user)
+        db.flush()
+        for i, content in enumerate(contents):
+            path = os.path.join(tmp_path, f"{user.id}_{i}.pdf")
+            if content is not None:
+                with open(path, "wb") as f:
+                    f.write(content)
+            db.add(KycDocument(user_id=user.id, file_name=os.path.basename(path), file_path=path,
+                               file_type="application/pdf"))
+        db.commit()
+    finally:
+        db.close()
+
+    summary = await migrate_documents(TestingAsyncSessionLocal, store=store, batch_size=2)
+    assert summary == {"migrated": 4, "deduplicated": 1, "missing": 1}
+
+    docs = documents()
+    for doc, content in zip(docs, contents):
+        if content is None:
+            assert doc.sha256 is None and os.path.isabs(doc.file_path)
+            continue
+        assert doc.sha256 == hashlib.sha256(content).hexdigest()
+        assert doc.size_bytes == len(content)
+        with open(store.path(doc.file_path), "rb") as f:
+            assert f.read() == content
+    assert blobs() == {hashlib.sha256(b"alpha").hexdigest(): 2,
+                       hashlib.sha256(b"beta").hexdigest(): 1,
+                       hashlib.sha256(b"gamma").hexdigest(): 1}
+    # Originals are gone; only the store (and nothing flat) is left
+    assert sorted(os.listdir(tmp_path)) == ["blobs"]
+    # Running again has nothing left to do
+    assert (await migrate_documents(TestingAsyncSessionLocal, store=store))["migrated"] == 0
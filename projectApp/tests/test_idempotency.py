@@ -0,0 +1,161 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from app.models import Account, IdempotencyKey, Transaction, TransactionType
+from app.services.balances import post_transaction
+from app.services.idempotency import IdempotencyStore, idempotency_store
+from tests.conftest import TestingAsyncSessionLocal, TestingSessionLocal
+from tests.test_balances import create_account, register
+
+def balance_minor(account_id):
+    db = TestingSessionLocal()
+    try:
+        return db.get(Account, account_id).balance_minor
+    finally:
+        db.close()
+
+def transaction_count(account_id):
+    db = TestingSessionLocal()
+    try:
+        return db.query(Transaction).filter_by(account_id=account_id).count()
+    finally:
+        db.close()
+
+def test_retried_deposit_is_applied_once(client):
+    account_id = create_account()
+    payload = {"account_id": account_id, "amount": 25.0}
+    headers = {"Idempotency-Key": "deposit-1"}
+
+    first = client.post("/deposit/", json=payload, headers=headers)
+    assert first.status_code == 200
+    assert "Idempotent-Replayed" not in first.headers
+    for _ in range(3):
+        retry = client.post("/deposit/", json=payload, headers=headers)
+        assert retry.status_code == 200
+        assert retry.headers["Idempotent-Replayed"] == "true"
+        assert retry.json() == first.json()
+    assert balance_minor(account_id) == 2500
+    assert transaction_count(account_id) == 1
+    assert idempotency_store.stats()["cache_hits"] >= 3
+
+    # The stored response outlives the in-memory copy
+    idempotency_store.clear()
+    assert client.post("/deposit/", json=payload, headers=headers).headers["Idempotent-Replayed"] == "true"
+    assert balance_minor(account_id) == 2500
+
+    # Without a key every request applies, as before
+    client.post("/deposit/", json=payload)
+    assert balance_minor(account_id) == 5000
+
+def test_key_reused_with_a_different_request(client):
+    account_id = create_account()
+    headers = {"Idempotency-Key": "deposit-2"}
+    client.post("/deposit/", json={"account_id": account_id, "amount": 1.0}, headers=headers)
+    response = client.post("/deposit/", json={"account_id": account_id, "amount": 2.0}, headers=headers)
+    assert response.status_code == 422
+    assert balance_minor(account_id) == 100
+
+def test_deposit_keys_are_per_account_and_client(client):
+    first, second = create_account(), create_account()
+    alice = {"Idempotency-Key": "1", "Authorization": "Bearer alice"}
+    bob = {"Idempotency-Key": "1", "Authorization": "Bearer bob"}
+    mine = client.post("/deposit/", json={"account_id": first, "amount": 1.0}, headers=alice)
+    # Another account, or another client on the same account: neither replays nor conflicts
+    theirs = client.post("/deposit/", json={"account_id": second, "amount": 2.0}, headers=bob)
+    assert theirs.status_code == 200 and "Idempotent-Replayed" not in theirs.headers
+    assert theirs.json()["account_id"] == second
+    same_account = client.post("/deposit/", json={"account_id": first, "amount": 3.0}, headers=bob)
+    assert same_account.status_code == 200 and "Idempotent-Replayed" not in same_account.headers
+    assert balance_minor(first) == 400 and balance_minor(second) == 200
+
+    replay = client.post("/deposit/", json={"account_id": first, "amount": 1.0}, headers=alice)
+    assert replay.headers["Idempotent-Replayed"] == "true" and replay.json() == mine.json()
+
+def test_transaction_keys_are_per_user_and_failures_are_not_stored(client):
+    first_user, first_headers = register(client, "idem-1@example.com")
+    second_user, second_headers = register(client, "idem-2@example.com")
+    first = create_account(owner=str(first_user))
+    second = create_account(owner=str(second_user), balance=10.0)
+    withdrawal = {"account_id": first, "transaction_type": "withdrawal", "amount": 5.0}
+
+    # Rejected for lack of funds: nothing stored, so the retry runs again
+    keyed = {**first_headers, "Idempotency-Key": "withdraw"}
+    assert client.post("/transactions/", json=withdrawal, headers=keyed).status_code == 400
+    client.post("/deposit/", json={"account_id": first, "amount": 5.0})
+    applied = client.post("/transactions/", json=withdrawal, headers=keyed)
+    assert applied.status_code == 200 and "Idempotent-Replayed" not in applied.headers
+    assert client.post("/transactions/", json=withdrawal, headers=keyed).json() == applied.json()
+    assert balance_minor(first) == 0
+
+    # The same key from another user is a different request altogether
+    other = client.post("/transactions/", headers={**second_headers, "Idempotency-Key": "withdraw"},
+                        json={**withdrawal, "account_id": second})
+    assert other.status_code == 200 and "Idempotent-Replayed" not in other.headers
+    assert balance_minor(second) == 500
+
+async def deposit_work(db, account_id, amount=1.0, gate=None):
+    async def work():
+        if gate is not None:
+            await gate.wait()
+        posted = await post_transaction(db, account_id, TransactionType.deposit, amount)
+        return 200, {"balance": posted.balance}
+    return work
+
+async def test_concurrent_duplicates_are_coalesced():
+    account_id = create_account()
+    store = IdempotencyStore(session_factory=TestingAsyncSessionLocal)
+    gate = asyncio.Event()
+
+    async def request():
+        async with TestingAsyncSessionLocal() as db:
+            return await store.execute(db, "test", "burst", "fp", await deposit_work(db, account_id, gate=gate))
+
+    requests = [asyncio.create_task(request()) for _ in range(20)]
+    await asyncio.sleep(0.05)
+    gate.set()
+    results = await asyncio.gather(*requests)
+    assert sorted(replayed for _, replayed in results) == [False] + [True] * 19
+    assert {stored.body for stored, _ in results} == {'{"balance": 1.0}'}
+    assert store.stats()["executed"] == 1 and store.stats()["coalesced"] == 19
+    assert balance_minor(account_id) == 100
+
+async def test_duplicate_in_another_process_rolls_back():
+    """Two workers miss each other's memory; the second commit loses and is undone"""
+    account_id = create_account()
+    first_worker = IdempotencyStore(session_factory=TestingAsyncSessionLocal)
+    second_worker = IdempotencyStore(session_factory=TestingAsyncSessionLocal)
+    gate = asyncio.Event()
+
+    async def late():
+        async with TestingAsyncSessionLocal() as db:
+            return await second_worker.execute(db, "test", "race", "fp", await deposit_work(db, account_id, gate=gate))
+
+    loser = asyncio.create_task(late())
+    await asyncio.sleep(0.05)  # the second worker has looked the key up and is about to apply
+    async with TestingAsyncSessionLocal() as db:
+        _, replayed = await first_worker.execute(db, "test", "race", "fp", await deposit_work(db, account_id))
+    assert not replayed
+    gate.set()
+    stored, replayed = await loser
+    assert replayed and stored.body == '{"balance": 1.0}'
+    assert second_worker.stats()["races_lost"] == 1
+    assert balance_minor(account_id) == 100
+
+async def test_expired_keys_run_again_and_are_purged():
+    account_id = create_account()
+    store = IdempotencyStore(session_factory=TestingAsyncSessionLocal, ttl=-1)
+    for _ in range(2):
+        async with TestingAsyncSessionLocal() as db:
+            _, replayed = await store.execute(db, "test", "old", "fp", await deposit_work(db, account_id))
+        assert not replayed
+    assert balance_minor(account_id) == 200
+    assert await store.purge_expired() == 1
+
+    db = TestingSessionLocal()
+    try:
+        db.add(IdempotencyKey(scope="test", key="live", fingerprint="fp", status_code=200, response_body="{}",
+                              expires_at=datetime.now(timezone.utc) + timedelta(hours=1)))
+        db.commit()
+    finally:
+        db.close()
+    assert await store.purge_expired() == 0
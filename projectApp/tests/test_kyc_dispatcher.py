@@ -0,0 +1,227 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from app.kyc_stub import create_stub
+from app.models import KycDocument, KycStatusEnum, User
+from app.services.kyc_dispatcher import KycDispatcher, document_url
+from tests.conftest import TestingAsyncSessionLocal, TestingSessionLocal
+
+def seed_documents(count, reject=(), offset=0, claimed_at=None):
+    """Users with one pending KYC document each; returns [(document_id, user_id, url)]"""
+    db = TestingSessionLocal()
+    try:
+        jobs = []
+        for i in range(offset, offset + count):
+            user = User(full_name=f"User {i}", email=f"user{i}@example.com", password_hash="x")
+            db.add(user)
+            db.flush()
+            file_name = f"{user.id}_{'reject' if i in reject else 'passport'}.pdf"
+            doc = KycDocument(user_id=user.id, file_name=file_name, file_path=file_name,
+                              file_type="application/pdf", claimed_at=claimed_at)
+            db.add(doc)
+            db.flush()
+            jobs.append((doc.id, user.id, document_url(file_name)))
+        db.commit()
+        return jobs
+    finally:
+        db.close()
+
+def statuses():
+    db = TestingSessionLocal()
+    try:
+        docs = {doc.id: doc.doc_status for doc in db.query(KycDocument)}
+        users = {user.id: user.kyc_status for user in db.query(User)}
+        return docs, users
+    finally:
+        db.close()
+
+def claims():
+    db = TestingSessionLocal()
+    try:
+        return {doc.id: doc.claimed_at for doc in db.query(KycDocument)}
+    finally:
+        db.close()
+
+def dispatcher(stub, **kwargs):
+    options = dict(
+        session_factory=TestingAsyncSessionLocal,
+        concurrency=4,
+        backoff_base=0.001,
+        flush_interval=0.05,
+        requeue_pending=False,
+        transport=httpx.ASGITransport(app=stub),
+    )
+    options.update(kwargs)
+    return KycDispatcher(**options)
+
+async def test_dispatcher_writes_verdicts_in_batches():
+    """Verdicts for documents and users are written back in bulk"""
+    jobs = seed_documents(10, reject={3})
+    kyc = dispatcher(create_stub(), batch_size=100, flush_interval=60)
+    await kyc.start()
+    for job in jobs:
+        assert kyc.submit(*job)
+    await kyc.stop()
+
+    docs, users = statuses()
+    rejected_doc, rejected_user, _ = jobs[3]
+    assert docs[rejected_doc] == users[rejected_user] == KycStatusEnum.failed
+    assert sum(status == KycStatusEnum.verified for status in docs.values()) == 9
+    assert sum(status == KycStatusEnum.verified for status in users.values()) == 9
+    stats = kyc.stats()
+    assert stats["written"] == 10 and stats["flushes"] == 1
+    assert stats["calls"] == 10 and stats["retries"] == 0
+
+async def test_dispatcher_retries_transient_errors():
+    """503s are retried with backoff until the provider answers"""
+    jobs = seed_documents(5)
+    stub = create_stub(flaky_attempts=2)
+    kyc = dispatcher(stub, max_attempts=3)
+    await kyc.start()
+    for job in jobs:
+        kyc.submit(*job)
+    await kyc.stop()
+
+    docs, _ = statuses()
+    assert set(docs.values()) == {KycStatusEnum.verified}
+    assert kyc.stats()["calls"] == 15
+    assert kyc.stats()["retries"] == 10
+    assert set(stub.state.calls.values()) == {3}
+
+async def test_dispatcher_leaves_pending_when_provider_never_answers():
+    """Exhausted retries leave the document pending, to be queued again on the next start"""
+    jobs = seed_documents(2)
+    kyc = dispatcher(create_stub(flaky_attempts=5), max_attempts=2)
+    await kyc.start()
+    for job in jobs:
+        kyc.submit(*job)
+    await kyc.stop()
+
+    docs, users = statuses()
+    assert set(docs.values()) == set(users.values()) == {KycStatusEnum.pending}
+    assert kyc.stats()["gave_up"] == 2
+
+    kyc.transport = httpx.ASGITransport(app=create_stub())
+    kyc.requeue_pending = True
+    await kyc.start()
+    await kyc.stop()
+    docs, _ = statuses()
+    assert set(docs.values()) == {KycStatusEnum.verified}
+
+async def test_stop_releases_documents_cut_off_mid_call():
+    """Documents still waiting on the provider when the drain times out are released"""
+    jobs = seed_documents(2, claimed_at=datetime.now(timezone.utc))
+    kyc = dispatcher(create_stub(latency=5), drain_timeout=0.05)
+    await kyc.start()
+    for job in jobs:
+        kyc.submit(*job)
+    await asyncio.sleep(0.01)
+    await kyc.stop()
+
+    docs, _ = statuses()
+    assert set(docs.values()) == {KycStatusEnum.pending}
+    assert set(claims().values()) == {None}
+
+async def test_failed_write_is_retried_on_next_flush():
+    """Verdicts survive a batch write that fails"""
+    jobs = seed_documents(3)
+    failures = [ConnectionRefusedError()]
+
+    def flaky_session():
+        if failures:
+            raise failures.pop()
+        return TestingAsyncSessionLocal()
+
+    kyc = dispatcher(create_stub(), session_factory=flaky_session, batch_size=100, flush_interval=60)
+    await kyc.start()
+    for job in jobs:
+        kyc.submit(*job)
+    await kyc.stop()
+
+    docs, _ = statuses()
+    assert set(docs.values()) == {KycStatusEnum.verified}
+    stats = kyc.stats()
+    assert stats["write_errors"] == 3 and stats["written"] == 3 and stats["flushes"] == 2
+
+async def test_workers_starting_together_send_each_document_once():
+    """Requeue claims documents, so two workers never both send one"""
+    seed_documents(6)
+    stub = create_stub(latency=0.01)
+    first, second = (dispatcher(stub, requeue_pending=True, requeue_page_size=4) for _ in range(2))
+    await asyncio.gather(first.start(), second.start())
+    for _ in range(200):
+        docs, _ = statuses()
+        if set(docs.values()) == {KycStatusEnum.verified}:
+            break
+        await asyncio.sleep(0.02)
+    await asyncio.gather(first.stop(), second.stop())
+
+    assert set(docs.values()) == {KycStatusEnum.verified}
+    assert first.stats()["requeued"] + second.stats()["requeued"] == 6
+    assert set(stub.state.calls.values()) == {1}
+
+async def test_requeue_leaves_room_for_registrations():
+    """Pending documents are queued a page at a time while half the queue is free"""
+    jobs = seed_documents(9)
+    kyc = dispatcher(create_stub(latency=0.05), requeue_pending=True, max_queue_size=4, concurrency=1)
+    await kyc.start()
+    assert kyc.stats()["requeued"] == 2
+    # Claimed by the register route as it submits
+    fresh = seed_documents(1, offset=9, claimed_at=datetime.now(timezone.utc))[0]
+    assert kyc.submit(*fresh)
+    for _ in range(200):
+        docs, _ = statuses()
+        if set(docs.values()) == {KycStatusEnum.verified}:
+            break
+        await asyncio.sleep(0.02)
+    await kyc.stop()
+    assert set(docs.values()) == {KycStatusEnum.verified} and len(docs) == len(jobs) + 1
+    assert kyc.stats()["calls"] == 10 and kyc.stats()["dropped"] == 0
+
+async def test_dispatcher_limits_concurrency():
+    """Never more provider calls in flight than the configured concurrency"""
+    jobs = seed_documents(12)
+    stub = create_stub(latency=0.02)
+    in_flight, peak = 0, 0
+
+    @stub.middleware("http")
+    async def track(request, call_next):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        try:
+            return await call_next(request)
+        finally:
+            in_flight -= 1
+
+    kyc = dispatcher(stub, concurrency=3)
+    await kyc.start()
+    for job in jobs:
+        kyc.submit(*job)
+    await kyc.stop()
+
+    assert peak == 3
+    assert kyc.stats()["verified"] == 12
+
+def test_registration_is_verified_in_background(client):
+    """Registering queues the document; the verdict lands without another request"""
+    response = client.post("/auth/register", data={
+        "full_name": "Kyc User",
+        "email": "kyc@example.com",
+        "password": "testpass123",
+    }, files={
+        "id_document": ("passport.pdf", b"test content", "application/pdf")
+    })
+    assert response.status_code == 201
+    assert response.json()["kyc_status"] == "pending"
+    user_id = response.json()["user_id"]
+
+    deadline = time.monotonic() + 5
+    status = "pending"
+    while status == "pending" and time.monotonic() < deadline:
+        time.sleep(0.05)
+        status = client.get("/auth/auth/kyc-status", params={"user_id": user_id}).json()["kyc_status"]
+    assert status == "verified"
@@ -0,0 +1,123 @@
+import pytest
+from sqlalchemy import func
+
+from app.models import Account, LedgerEntry, Transaction
+from app.services.ledger import LedgerIntegrityError, rebuild_balances, verify_ledger
+from tests.conftest import TestingAsyncSessionLocal, TestingSessionLocal
+from tests.test_balances import create_account, register
+
+def journal(account_id):
+    db = TestingSessionLocal()
+    try:
+        entries = db.query(LedgerEntry).order_by(LedgerEntry.id).all()
+        per_transaction = dict(
+            db.query(LedgerEntry.transaction_id, func.sum(LedgerEntry.amount_minor))
+            .group_by(LedgerEntry.transaction_id)
+        )
+        account = db.get(Account, account_id)
+        return entries, per_transaction, account.balance_minor
+    finally:
+        db.close()
+
+def test_postings_are_double_entry(client):
+    """Every movement posts a customer leg and a settlement leg that cancel out"""
+    user_id, headers = register(client, "ledger@example.com")
+    account_id = create_account(owner=str(user_id))
+    assert client.post("/deposit/", json={"account_id": account_id, "amount": 19.99}).status_code == 200
+    response = client.post("/transactions/", headers=headers, json={
+        "account_id": account_id, "transaction_type": "withdrawal", "amount": 4.5,
+    })
+    assert response.status_code == 200
+    assert response.json()["amount"] == 4.5
+
+    entries, per_transaction, balance_minor = journal(account_id)
+    assert [(e.account_id, e.amount_minor) for e in entries] == [
+        (account_id, 1999), (None, -1999), (account_id, -450), (None, 450),
+    ]
+    assert set(per_transaction.values()) == {0}
+    assert balance_minor == 1549
+    assert client.get(f"/accounts/{account_id}").json()["balance"] == 15.49
+
+def test_cents_add_up_exactly(client):
+    account_id = create_account()
+    for _ in range(10):
+        client.post("/deposit/", json={"account_id": account_id, "amount": 0.1})
+    _, _, balance_minor = journal(account_id)
+    assert balance_minor == 100
+
+def test_sub_cent_amounts_are_rejected(client):
+    account_id = create_account()
+    response = client.post("/deposit/", json={"account_id": account_id, "amount": 0.001})
+    assert response.status_code == 422
+
+def test_amounts_must_be_positive(client):
+    user_id, headers = register(client, "signs@example.com")
+    account_id = create_account(owner=str(user_id))
+    for amount in (-5.0, 0.0):
+        assert client.post("/deposit/", json={"account_id": account_id, "amount": amount}).status_code == 422
+        item = {"account_id": account_id, "transaction_type": "withdrawal", "amount": amount}
+        assert client.post("/transactions/", headers=headers, json=item).status_code == 422
+        assert client.post("/transactions/batch", headers=headers, json=[item]).status_code == 422
+    assert client.post("/accounts/", json={"user_id": 1, "initial_deposit": -1.0}).status_code == 422
+    assert client.post("/accounts/", json={"user_id": 1, "initial_deposit": 0.0}).status_code == 200
+    _, _, balance_minor = journal(account_id)
+    assert balance_minor == 0
+
+def test_batch_journals_accepted_items_only(client):
+    user_id, headers = register(client, "batch-ledger@example.com")
+    account_id = create_account(owner=str(user_id))
+    response = client.post("/transactions/batch", headers=headers, json=[
+        {"account_id": account_id, "transaction_type": "deposit", "amount": 10.0},
+        {"account_id": account_id, "transaction_type": "withdrawal", "amount": 50.0},
+        {"account_id": account_id, "transaction_type": "withdrawal", "amount": 2.25},
+    ])
+    assert response.json()["applied"] == 2
+
+    entries, per_transaction, balance_minor = journal(account_id)
+    assert len(entries) == 4 and len(per_transaction) == 2
+    assert balance_minor == 775 == sum(e.amount_minor for e in entries if e.account_id == account_id)
+
+def test_opening_deposit_is_journaled(client):
+    response = client.post("/accounts/", json={"user_id": 1, "initial_deposit": 250.0})
+    assert response.status_code == 200
+    account_id = response.json()["account_id"]
+    assert response.json()["balance"] == 250.0
+
+    entries, _, balance_minor = journal(account_id)
+    assert balance_minor == 25000
+    assert [(e.account_id, e.amount_minor) for e in entries] == [(account_id, 25000), (None, -25000)]
+
+async def test_verify_and_rebuild_cached_balances(client):
+    account_id = create_account()
+    client.post("/deposit/", json={"account_id": account_id, "amount": 3.0})
+    async with TestingAsyncSessionLocal() as db:
+        assert await verify_ledger(db) == {"unbalanced": [], "drifted": []}
+
+    # A balance written around the journal is reported, then rebuilt from it
+    db = TestingSessionLocal()
+    try:
+        db.get(Account, account_id).balance = 99.0
+        db.commit()
+    finally:
+        db.close()
+    async with TestingAsyncSessionLocal() as db:
+        assert (await verify_ledger(db))["drifted"] == [(account_id, 9900, 300)]
+        assert await rebuild_balances(db) == 1
+        await db.commit()
+        assert await verify_ledger(db) == {"unbalanced": [], "drifted": []}
+
+def test_journal_is_append_only(client):
+    account_id = create_account()
+    client.post("/deposit/", json={"account_id": account_id, "amount": 1.0})
+    db = TestingSessionLocal()
+    try:
+        entry = db.query(LedgerEntry).first()
+        entry.amount_minor = 1
+        with pytest.raises(LedgerIntegrityError):
+            db.commit()
+        db.rollback()
+        db.delete(db.query(LedgerEntry).first())
+        with pytest.raises(LedgerIntegrityError):
+            db.commit()
+    finally:
+        db.close()
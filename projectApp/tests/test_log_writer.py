@@ -0,0 +1,66 @@
+import pytest
+from app.models import SystemLog
+from app.services.log_writer import SystemLogWriter
+from tests.conftest import TestingSessionLocal, TestingAsyncSessionLocal
+
+def count_logs():
+    db = TestingSessionLocal()
+    try:
+        return db.query(SystemLog).count()
+    finally:
+        db.close()
+
+async def test_writer_flushes_on_stop():
+    """Queued records are written in bulk when the writer stops"""
+    writer = SystemLogWriter(session_factory=TestingAsyncSessionLocal, batch_size=100, flush_interval=60)
+    await writer.start()
+    for i in range(25):
+        assert writer.submit("INFO", "api", f"GET /{i}")
+    await writer.stop()
+
+    assert count_logs() == 25
+    assert writer.stats()["written"] == 25
+    assert writer.stats()["flushes"] == 1
+
+async def test_writer_drops_when_full():
+    """A full queue drops new records and counts them instead of blocking"""
+    writer = SystemLogWriter(
+        session_factory=TestingAsyncSessionLocal,
+        max_queue_size=5,
+        batch_size=100,
+        flush_interval=60,
+        sample_high_water=1.0,
+    )
+    await writer.start()
+    accepted = [writer.submit("ERROR", "api", "boom") for _ in range(8)]
+    await writer.stop()
+
+    assert accepted.count(True) == 5
+    assert writer.stats()["dropped"] == 3
+    assert count_logs() == 5
+
+async def test_writer_samples_info_above_high_water():
+    """INFO records are sampled once the queue passes the high-water mark"""
+    writer = SystemLogWriter(
+        session_factory=TestingAsyncSessionLocal,
+        max_queue_size=100,
+        batch_size=1000,
+        flush_interval=60,
+        sample_high_water=0.1,
+        sample_rate=5,
+    )
+    await writer.start()
+    for _ in range(60):
+        writer.submit("INFO", "api", "GET /")
+    writer.submit("ERROR", "api", "Error 500 on GET /")
+    await writer.stop()
+
+    stats = writer.stats()
+    assert stats["sampled_out"] > 0
+    assert stats["enqueued"] + stats["sampled_out"] == 61
+    assert count_logs() == stats["enqueued"]
+
+def test_submit_before_start_is_dropped():
+    writer = SystemLogWriter(session_factory=TestingAsyncSessionLocal)
+    assert writer.submit("INFO", "api", "GET /") is False
+    assert writer.stats()["dropped"] == 1
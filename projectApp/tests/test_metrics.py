@@ -0,0 +1,101 @@
+import json
+import re
+import subprocess
+import sys
+import tempfile
+
+from app.metrics import MetricsRegistry
+from tests.test_balances import create_account
+
+SAMPLE = re.compile(r'^(\w+)\{(.*)\} (\S+)$')
+
+def parse(text):
+    samples = {}
+    for line in text.splitlines():
+        match = SAMPLE.match(line)
+        if match:
+            labels = tuple(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', match.group(2)))
+            samples[(match.group(1), labels)] = float(match.group(3))
+    return samples
+
+def scrape(client):
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    return parse(response.text)
+
+def series(samples, name, **labels):
+    wanted = set(labels.items())
+    return {key[1]: value for key, value in samples.items() if key[0] == name and wanted <= set(key[1])}
+
+def test_requests_are_recorded_by_route_and_status(client):
+    account_id = create_account(balance=1.0)
+    route = {"method": "GET", "route": "/accounts/{account_id}"}
+    before = scrape(client)
+    body = json.dumps({"account_id": account_id, "amount": 2.5})
+    client.post("/deposit/", content=body, headers={"Content-Type": "application/json"})
+    for _ in range(3):
+        client.get(f"/accounts/{account_id}")
+    client.get("/accounts/999999")
+    client.get("/no/such/path")
+    after = scrape(client)
+
+    def delta(name, **labels):
+        return sum(series(after, name, **labels).values()) - sum(series(before, name, **labels).values())
+
+    assert delta("http_request_duration_seconds_count", status="200", **route) == 3
+    assert delta("http_request_duration_seconds_count", status="404", **route) == 1
+    assert delta("http_request_duration_seconds_count", route="<unmatched>", status="404") == 1
+    assert delta("http_request_size_bytes_total", method="POST", route="/deposit/") == len(body)
+    assert delta("http_response_size_bytes_total", status="200", **route) > 0
+    assert delta("http_request_duration_seconds_sum", status="200", **route) > 0
+    assert series(after, "http_requests_in_progress", method="POST") == {(("method", "POST"),): 0.0}
+
+    # Buckets are cumulative and end at the count
+    buckets = sorted(
+        (float(dict(labels)["le"]), value)
+        for labels, value in series(after, "http_request_duration_seconds_bucket", status="200", **route).items()
+    )
+    assert [value for _, value in buckets] == sorted(value for _, value in buckets)
+    assert buckets[-1] == (float("inf"), sum(series(after, "http_request_duration_seconds_count",
+                                                    status="200", **route).values()))
+
+WORKER = """
+import sys
+from app.metrics import MetricsRegistry
+registry = MetricsRegistry(sys.argv[1], buckets=[0.1, 1.0])
+registry.observe("GET", "/a", 200, 0.05, 10, 100)
+registry.observe("GET", "/a", 200, 0.5, 0, 100)
+registry.track_in_progress("GET", 1)  # exits mid-request
+"""
+
+def test_workers_are_merged_through_the_shared_directory():
+    directory = tempfile.mkdtemp()
+    subprocess.run([sys.executable, "-c", WORKER, directory], check=True)
+    registry = MetricsRegistry(directory, buckets=[0.1, 1.0])
+    registry.observe("GET", "/a", 200, 0.07, 5, 50)
+    registry.observe("GET", "/a", 500, 2.0, 0, 0)
+    registry.track_in_progress("GET", 1)
+
+    samples = parse(registry.render())
+    labels = (("method", "GET"), ("route", "/a"), ("status", "200"))
+    assert [samples[("http_request_duration_seconds_bucket", labels + (("le", le),))]
+            for le in ("0.1", "1.0", "+Inf")] == [2.0, 3.0, 3.0]
+    assert samples[("http_request_duration_seconds_count", labels)] == 3.0
+    assert samples[("http_request_size_bytes_total", labels)] == 15.0
+    assert samples[("http_response_size_bytes_total", labels)] == 250.0
+    assert samples[("http_request_duration_seconds_count", labels[:2] + (("status", "500"),))] == 1.0
+    # The exited worker's in-progress request is not counted
+    assert samples[("http_requests_in_progress", (("method", "GET"),))] == 1.0
+
+def test_values_survive_reopening_and_growing_the_file():
+    directory = tempfile.mkdtemp()
+    registry = MetricsRegistry(directory)
+    for i in range(500):  # well past the initial 64 KiB
+        registry.observe("GET", f"/route/{i}", 200, 0.001, 0, 1)
+    reopened = MetricsRegistry(directory)
+    reopened.observe("GET", "/route/499", 200, 0.001, 0, 1)
+    samples = parse(reopened.render())
+    count = ("http_request_duration_seconds_count", (("method", "GET"), ("route", "/route/499"), ("status", "200")))
+    assert samples[count] == 2.0
+    assert len(series(samples, "http_request_duration_seconds_count")) == 500
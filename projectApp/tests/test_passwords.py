@@ -0,0 +1,40 @@
+import asyncio
+import threading
+import pytest
+from fastapi import HTTPException
+from app.auth.passwords import PasswordHashPool, get_password_hash, verify_password
+
+async def test_pool_hashes_off_loop():
+    """Hashing and verification give the same results through the pool"""
+    pool = PasswordHashPool(kind="thread", max_workers=2, max_pending=4)
+    try:
+        hashed = await pool.run(get_password_hash, "s3cret")
+        assert await pool.run(verify_password, "s3cret", hashed)
+        assert not await pool.run(verify_password, "wrong", hashed)
+    finally:
+        pool.shutdown()
+
+async def test_pool_rejects_when_saturated():
+    """Jobs beyond max_pending fail fast with 503 instead of queueing"""
+    pool = PasswordHashPool(kind="thread", max_workers=1, max_pending=1)
+    release = threading.Event()
+    try:
+        blocked = asyncio.ensure_future(pool.run(release.wait, 5))
+        await asyncio.sleep(0)
+        assert pool.pending == 1
+
+        with pytest.raises(HTTPException) as exc:
+            await pool.run(get_password_hash, "s3cret")
+        assert exc.value.status_code == 503
+        assert pool.rejected == 1
+
+        release.set()
+        await blocked
+        assert pool.pending == 0
+    finally:
+        release.set()
+        pool.shutdown()
+
+def test_unknown_executor_kind():
+    with pytest.raises(ValueError):
+        PasswordHashPool(kind="fibers")
@@ -0,0 +1,69 @@
+import asyncio
+import os
+import tempfile
+import time
+
+import pytest
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.pool_metrics import PoolMetrics
+from tests.test_admin_stats import admin_headers
+
+def sqlite_url(scheme="sqlite"):
+    return f"{scheme}:///{os.path.join(tempfile.mkdtemp(), 'pool.db')}"
+
+def test_checkouts_overflow_timeouts_and_slow_holds():
+    metrics = PoolMetrics("test", slow_hold=0.3)
+    engine = create_engine(sqlite_url(), poolclass=metrics.pool_class(QueuePool),
+                           pool_size=1, max_overflow=1, pool_timeout=0.1)
+    metrics.attach(engine)
+
+    first = engine.connect()
+    second = engine.connect()  # beyond pool_size: an overflow connection
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    stats = metrics.stats()
+    assert stats["pool"]["checked_out"] == 2 and stats["pool"]["overflow"] == 1
+    assert stats["overflow"] == {"checkouts": 1, "peak": 1}
+    assert stats["timeouts"] == 1 and stats["wait_ms"]["max"] >= 100
+
+    second.close()
+    time.sleep(0.3)
+    first.close()
+    stats = metrics.stats()
+    assert stats["checkouts"] == 2 and stats["connects"] == 2
+    assert stats["held_ms"]["peak_checked_out"] == 2 and stats["held_ms"]["slow"] == 1
+    assert stats["pool"]["checked_out"] == 0 and stats["pool"]["checked_in"] == 1
+
+    # Timing survives the pool being rebuilt
+    engine.dispose()
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    assert metrics.stats()["checkouts"] == 3 and metrics.stats()["wait_ms"]["samples"] == 4
+
+async def test_async_engine_pool():
+    metrics = PoolMetrics("test")
+    engine = create_async_engine(sqlite_url("sqlite+aiosqlite"), poolclass=metrics.pool_class(AsyncAdaptedQueuePool),
+                                 pool_size=2, max_overflow=0, pool_pre_ping=True)
+    metrics.attach(engine.sync_engine)
+
+    async def query():
+        async with engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*(query() for _ in range(6)))
+    stats = metrics.stats()
+    assert stats["checkouts"] == 6 and stats["connects"] == 2
+    assert stats["held_ms"]["peak_checked_out"] == 2 and stats["pool"]["pre_ping"] is True
+    # Four of the six waited for one of the two connections to come back
+    assert stats["wait_ms"]["samples"] == 6 and stats["wait_ms"]["max"] >= 5
+    await engine.dispose()
+
+def test_db_pool_endpoint(client):
+    response = client.get("/api/admin/db-pool", headers=admin_headers(client))
+    assert response.status_code == 200
+    assert set(response.json()) == {"async", "sync"}
+    assert client.get("/api/admin/db-pool").status_code == 401
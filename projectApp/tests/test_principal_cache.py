@@ -0,0 +1,82 @@
+import time
+import pytest
+from app.auth.principal_cache import Principal, PrincipalCache, principal_cache
+from app.config import settings
+from app.models import KycStatusEnum, User
+from tests.conftest import TestingSessionLocal
+
+def make_principal(user_id=1, is_admin=False):
+    return Principal(
+        id=user_id,
+        email=f"user{user_id}@example.com",
+        full_name="Test User",
+        is_admin=is_admin,
+        kyc_status=KycStatusEnum.pending,
+    )
+
+def test_cache_hit_and_lru_eviction():
+    cache = PrincipalCache(max_entries=2)
+    exp = time.time() + 60
+    cache.put("token-a", {"sub": "1", "exp": exp}, make_principal(1))
+    cache.put("token-b", {"sub": "2", "exp": exp}, make_principal(2))
+    assert cache.get("token-a")[1].id == 1  # a is now most recently used
+    cache.put("token-c", {"sub": "3", "exp": exp}, make_principal(3))
+
+    assert cache.get("token-b") is None
+    assert cache.get("token-c")[1].id == 3
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+
+def test_cache_entries_expire_with_token():
+    cache = PrincipalCache(max_entries=10)
+    cache.put("token", {"sub": "1", "exp": time.time() - 1}, make_principal())
+    assert cache.get("token") is None
+
+def test_cache_entries_are_capped_by_ttl():
+    """Other workers never see this process's invalidations; the TTL bounds their staleness"""
+    cache = PrincipalCache(max_entries=10, ttl=0.05)
+    cache.put("token", {"sub": "1", "exp": time.time() + 86400}, make_principal(is_admin=True))
+    assert cache.get("token") is not None
+    time.sleep(0.06)
+    assert cache.get("token") is None
+
+def test_invalidate_user_drops_all_tokens():
+    cache = PrincipalCache(max_entries=10)
+    exp = time.time() + 60
+    cache.put("token-a", {"sub": "1", "exp": exp}, make_principal(1))
+    cache.put("token-b", {"sub": "1", "exp": exp}, make_principal(1))
+    cache.invalidate_user(1)
+    assert cache.get("token-a") is None
+    assert cache.get("token-b") is None
+    assert cache.stats()["invalidations"] == 2
+
+def test_put_skipped_after_concurrent_invalidation():
+    cache = PrincipalCache(max_entries=10)
+    epoch = cache.epoch
+    cache.invalidate_user(1)
+    cache.put("token", {"sub": "1", "exp": time.time() + 60}, make_principal(1), epoch)
+    assert cache.get("token") is None
+
+def test_admin_flag_change_invalidates_cached_principal(client):
+    """Revoking is_admin takes effect on the next request despite the cache"""
+    client.post("/auth/admin/init")
+    token = client.post("/auth/admin/login", json={
+        "email": settings.DEFAULT_ADMIN_EMAIL,
+        "password": settings.DEFAULT_ADMIN_PASSWORD
+    }).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    assert client.get("/api/admin/stats", headers=headers).status_code == 200
+    hits = principal_cache.hits
+    assert client.get("/api/admin/stats", headers=headers).status_code == 200
+    assert principal_cache.hits == hits + 1
+
+    db = TestingSessionLocal()
+    admin = db.query(User).filter(User.email == settings.DEFAULT_ADMIN_EMAIL).first()
+    admin.is_admin = False
+    db.commit()
+    db.close()
+
+    assert client.get("/api/admin/stats", headers=headers).status_code == 403
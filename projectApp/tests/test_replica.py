@@ -0,0 +1,81 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.replica import PRIMARY_COOKIE, replica_router
+from tests.conftest import TEST_DB_PATH
+from tests.test_balances import create_account, deposit
+
+def use_replica(monkeypatch, path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    monkeypatch.setattr(replica_router, "replica_factory",
+                        async_sessionmaker(autoflush=False, expire_on_commit=False, bind=engine))
+    monkeypatch.setattr(replica_router, "healthy", False)
+    monkeypatch.setattr(replica_router, "lag", None)
+
+def replicate(path):
+    """Copy the primary into the replica file: replication, as far as two SQLite files go"""
+    primary, replica = sqlite3.connect(TEST_DB_PATH), sqlite3.connect(path)
+    try:
+        primary.backup(replica)
+    finally:
+        primary.close()
+        replica.close()
+
+def balance(client, account_id):
+    return client.get(f"/accounts/{account_id}").json()["balance"]
+
+def test_reads_use_the_replica_until_the_client_writes(client, monkeypatch):
+    path = os.path.join(tempfile.mkdtemp(), "replica.db")
+    use_replica(monkeypatch, path)
+    account_id = create_account(balance=10.0)
+    replicate(path)
+    assert asyncio.run(replica_router.check())
+
+    asyncio.run(deposit(account_id, 5.0))  # not replicated yet
+    assert balance(client, account_id) == 10.0
+
+    response = client.post("/deposit/", json={"account_id": account_id, "amount": 1.0})
+    assert PRIMARY_COOKIE in response.cookies
+    assert balance(client, account_id) == 16.0
+    # Without the cookie the client is still remembered in this process
+    client.cookies.clear()
+    assert balance(client, account_id) == 16.0
+    replica_router.clear()
+    assert balance(client, account_id) == 10.0
+
+    # Failed writes change nothing, so they do not pin reads
+    assert client.post("/deposit/", json={"account_id": account_id + 1, "amount": 1.0}).status_code == 404
+    assert balance(client, account_id) == 10.0
+
+def test_reads_fall_back_to_the_primary(client, monkeypatch):
+    path = os.path.join(tempfile.mkdtemp(), "replica.db")
+    use_replica(monkeypatch, path)
+    account_id = create_account(balance=10.0)
+    replicate(path)
+    asyncio.run(deposit(account_id, 5.0))
+
+    # No successful probe yet
+    assert balance(client, account_id) == 15.0
+    asyncio.run(replica_router.check())
+    assert balance(client, account_id) == 10.0
+
+    monkeypatch.setattr(replica_router, "lag", replica_router.max_lag + 1)
+    assert balance(client, account_id) == 15.0
+    monkeypatch.setattr(replica_router, "lag", 0.0)
+
+    # The replica goes away between probes: the failing read marks it down
+    # and is answered from the primary
+    use_replica(monkeypatch, os.path.join(tempfile.mkdtemp(), "missing", "replica.db"))
+    monkeypatch.setattr(replica_router, "healthy", True)
+    monkeypatch.setattr(replica_router, "lag", 0.0)
+    failovers = replica_router.failovers
+    assert balance(client, account_id) == 15.0
+    assert not replica_router.healthy and replica_router.failovers == failovers + 1
+    assert balance(client, account_id) == 15.0
+    assert not asyncio.run(replica_router.check())
+    assert replica_router.stats()["last_error"]
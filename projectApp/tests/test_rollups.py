@@ -0,0 +1,58 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import cli, database
+from app.models import DailyTransactionRollup, Transaction
+from app.services.rollups import utc_date
+from app.services.stats import stats_service
+from tests.conftest import TestingAsyncSessionLocal, TestingSessionLocal
+from tests.test_admin_stats import admin_headers
+from tests.test_balances import create_account
+
+def test_chart_reads_rollups_written_with_transactions(client):
+    headers = admin_headers(client)
+    account_id = create_account()
+    client.post("/deposit/", json={"account_id": account_id, "amount": 10.0})
+    client.post("/deposit/", json={"account_id": account_id, "amount": 5.0})
+    asyncio.run(stats_service.flush())
+
+    response = client.get("/api/admin/transactions/chart", params={"days": 30}, headers=headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert len(body["labels"]) == len(body["values"]) == 30
+    assert body["labels"][-1] == datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    assert body["values"][-1] == 2
+    assert body["amounts"]["deposit"][-1] == 15.0
+    assert sum(body["values"][:-1]) == 0
+
+def test_backfill_rebuilds_past_days(client, monkeypatch):
+    headers = admin_headers(client)
+    account_id = create_account()
+    today = datetime.now(timezone.utc).replace(hour=12, minute=0, second=0, microsecond=0)
+    db = TestingSessionLocal()
+    try:
+        for days_ago, kind, amount in ((3, "deposit", 20.0), (3, "withdrawal", 5.0), (1, "deposit", 7.0)):
+            db.add(Transaction(account_id=account_id, transaction_type=kind, amount=amount,
+                               created_at=today - timedelta(days=days_ago)))
+        db.commit()
+        # Drop what the write hooks produced, as if the table had just been created
+        db.query(DailyTransactionRollup).delete()
+        db.commit()
+    finally:
+        db.close()
+    stats_service._take_pending()
+
+    monkeypatch.setattr(database, "AsyncSessionLocal", TestingAsyncSessionLocal)
+    cli.main(["backfill-rollups", "--chunk-days", "2"])
+
+    body = client.get("/api/admin/transactions/chart", params={"days": 7}, headers=headers).json()
+    assert body["values"][-4:] == [2, 0, 1, 0]
+    assert body["amounts"]["deposit"][-4:] == [20.0, 0.0, 7.0, 0.0]
+    assert body["amounts"]["withdrawal"][-4] == 5.0
+
+def test_days_are_bucketed_in_utc_on_every_dialect():
+    day = utc_date(Transaction.created_at)
+    assert str(day.compile(dialect=postgresql.dialect())) == "date(timezone('UTC', transactions.created_at))"
+    assert str(day.compile(dialect=sqlite.dialect())) == "date(transactions.created_at)"
@@ -0,0 +1,93 @@
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_async_db
+from app.models import Account
+from app.sql_profiler import RequestProfile, SqlProfiler, SqlProfilingMiddleware, statement_shape
+from app.sql_profiler import _before_cursor_execute, sql_profiler
+from tests.conftest import async_engine, override_get_async_db
+from tests.test_admin_stats import admin_headers
+from tests.test_balances import create_account
+
+@pytest.fixture
+def profiler():
+    """A profiler on the test engine behind a one-route app that loads accounts one by one"""
+    profiler = SqlProfiler(enabled=True, server_timing=True, slow_request=10.0, repeat_threshold=5)
+    profiler.watch(async_engine.sync_engine)
+    logged = []
+    profiler.sink = lambda level, service, message: logged.append((level, service, message))
+
+    app = FastAPI()
+
+    @app.get("/accounts/{count}")
+    async def load(count: int, db: AsyncSession = Depends(get_async_db)):
+        for account_id in range(1, count + 1):
+            await db.scalar(select(Account).where(Account.id == account_id))
+        return {}
+
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.add_middleware(SqlProfilingMiddleware, profiler=profiler)
+    yield profiler, TestClient(app), logged
+    profiler.disable()
+
+def test_queries_are_attributed_to_the_request(profiler):
+    profiler, client, logged = profiler
+    for _ in range(3):
+        create_account()
+    timing = client.get("/accounts/3").headers["server-timing"]
+    assert timing.startswith("db;dur=") and 'desc="3 queries"' in timing and "db-slowest;dur=" in timing
+    assert "db-repeated" not in timing and logged == []
+
+    route = profiler.stats()["routes"]["GET /accounts/{count}"]
+    assert route["requests"] == 1 and route["max_queries"] == 3 and route["avg_db_ms"] > 0
+
+def test_repeated_statements_are_flagged_and_logged(profiler):
+    profiler, client, logged = profiler
+    timing = client.get("/accounts/6").headers["server-timing"]
+    assert 'db-repeated;desc="6x SELECT accounts.id' in timing
+    assert profiler.stats()["repeated_statement_requests"] == 1
+    [(level, service, message)] = logged
+    assert (level, service) == ("WARNING", "sql")
+    assert message.startswith("GET /accounts/{count} took ") and "6 queries" in message and "likely N+1, 6x" in message
+
+    # Sampled: only a share of flagged requests is logged
+    profiler.log_sample = 0.0
+    client.get("/accounts/6")
+    assert len(logged) == 1 and profiler.stats()["repeated_statement_requests"] == 2
+
+def test_disabled_profiler_costs_nothing(profiler):
+    profiler, client, logged = profiler
+    profiler.disable()
+    assert not event.contains(async_engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    response = client.get("/accounts/6")
+    assert "server-timing" not in response.headers
+    assert profiler.stats()["profiled_requests"] == 0 and logged == []
+
+    profiler.enable()
+    assert "server-timing" in client.get("/accounts/1").headers
+
+def test_statement_shapes():
+    assert statement_shape("SELECT *\n  FROM a WHERE id IN (?, ?, ?)") == statement_shape(
+        "SELECT * FROM a WHERE id IN (?)") == "SELECT * FROM a WHERE id IN (...)"
+    assert statement_shape("SELECT * FROM a WHERE id IN ($1, $2)") == "SELECT * FROM a WHERE id IN (...)"
+    profile = RequestProfile()
+    for size in range(1, 6):
+        profile.record("SELECT * FROM a WHERE id IN (" + ", ".join("?" * size) + ")", 0.001)
+    profile.record("SELECT 1", 0.002)
+    assert profile.repeated(5) == [("SELECT * FROM a WHERE id IN (...)", 5)]
+    assert profile.slowest_statement == "SELECT 1"
+
+def test_admin_switch(client):
+    headers = admin_headers(client)
+    try:
+        stats = client.post("/api/admin/sql-profile", params={"enabled": True, "reset": True}, headers=headers).json()
+        assert stats["enabled"] and stats["profiled_requests"] == 0
+        client.get("/api/admin/users", headers=headers)
+        stats = client.get("/api/admin/sql-profile", headers=headers).json()
+        assert stats["routes"]["GET /api/admin/users"]["max_queries"] >= 1
+    finally:
+        client.post("/api/admin/sql-profile", params={"enabled": False, "reset": True}, headers=headers)
+    assert not sql_profiler.enabled
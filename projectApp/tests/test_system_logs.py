@@ -0,0 +1,95 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from app.models import SystemLog
+from app.services.log_retention import (
+    add_months, ensure_partitions, month_start, partition_bounds, run_log_maintenance,
+)
+from tests.conftest import TestingAsyncSessionLocal, TestingSessionLocal
+from tests.test_admin_stats import admin_headers
+
+def seed_logs(*entries):
+    db = TestingSessionLocal()
+    try:
+        db.add_all([SystemLog(timestamp=ts, level=level, service="api", message=f"m{i}")
+                    for i, (ts, level) in enumerate(entries)])
+        db.commit()
+    finally:
+        db.close()
+
+def test_logs_page_newest_first_by_level(client):
+    headers = admin_headers(client)
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    seed_logs(*[(base + timedelta(minutes=i), "ERROR" if i % 2 else "INFO") for i in range(9)])
+
+    messages, cursor = [], None
+    while True:
+        params = {"level": "ERROR", "limit": 2, "end_date": "2026-01-02T00:00:00"}
+        if cursor:
+            params["after"] = cursor
+        body = client.get("/api/admin/logs", params=params, headers=headers).json()
+        messages.extend(item["message"] for item in body["items"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert messages == ["m7", "m5", "m3", "m1"]
+    assert client.get("/api/admin/logs", params={"after": "garbage"}, headers=headers).status_code == 400
+
+def test_retention_deletes_expired_rows_in_one_statement(client):
+    now = datetime(2026, 6, 15, tzinfo=timezone.utc)
+    seed_logs((now - timedelta(days=120), "INFO"), (now - timedelta(days=91), "INFO"), (now - timedelta(days=5), "INFO"))
+
+    summary = asyncio.run(run_log_maintenance(TestingAsyncSessionLocal, now=now, retention_days=90))
+    assert summary["partitioned"] is False
+    assert summary["deleted_rows"] == 2
+    db = TestingSessionLocal()
+    try:
+        assert [log.message for log in db.query(SystemLog)] == ["m2"]
+    finally:
+        db.close()
+
+def test_partition_calendar_helpers():
+    assert month_start(datetime(2026, 12, 31, 23, 59, tzinfo=timezone.utc)) == datetime(2026, 12, 1, tzinfo=timezone.utc)
+    assert add_months(datetime(2026, 11, 1, tzinfo=timezone.utc), 3) == datetime(2027, 2, 1, tzinfo=timezone.utc)
+    bounds = partition_bounds({
+        "system_logs_legacy": "FOR VALUES FROM (MINVALUE) TO ('2026-11-01 00:00:00+00')",
+        "system_logs_2026_11": "FOR VALUES FROM ('2026-11-01 00:00:00+00') TO ('2026-12-01 00:00:00+00')",
+        "system_logs_default": "DEFAULT",
+    })
+    assert bounds["system_logs_legacy"] == datetime(2026, 11, 1, tzinfo=timezone.utc)
+    assert bounds["system_logs_2026_11"] == datetime(2026, 12, 1, tzinfo=timezone.utc)
+    assert bounds["system_logs_default"] is None
+
+class RecordingPartitionSession:
+    """Stands in for a PostgreSQL session: serves pg_inherits rows and records the DDL"""
+
+    def __init__(self, partitions, months_in_default):
+        self.partitions = partitions
+        self.months_in_default = months_in_default
+        self.statements = []
+
+    async def execute(self, statement, params=None):
+        self.statements.append(str(statement))
+        return SimpleNamespace(all=lambda: list(self.partitions.items()), rowcount=2)
+
+    async def scalar(self, statement, params=None):
+        return params["start"] in self.months_in_default
+
+def test_month_with_rows_in_default_is_split_out():
+    november = datetime(2026, 11, 1, tzinfo=timezone.utc)
+    db = RecordingPartitionSession({
+        "system_logs_2026_10": "FOR VALUES FROM ('2026-10-01 00:00:00+00') TO ('2026-11-01 00:00:00+00')",
+        "system_logs_default": "DEFAULT",
+    }, months_in_default={november})
+
+    created = asyncio.run(ensure_partitions(db, november + timedelta(days=14), months_ahead=1))
+    assert created == ["system_logs_2026_11", "system_logs_2026_12"]
+    ddl = db.statements[1:]
+    assert ddl[0] == 'LOCK TABLE "system_logs_default" IN EXCLUSIVE MODE'
+    assert ddl[1].startswith('CREATE TABLE "system_logs_2026_11" (LIKE')
+    assert 'DELETE FROM "system_logs_default"' in ddl[2] and 'INSERT INTO "system_logs_2026_11"' in ddl[2]
+    assert ddl[3].startswith('ALTER TABLE "system_logs" ATTACH PARTITION "system_logs_2026_11"')
+    # December has nothing in DEFAULT yet, so it is created directly
+    assert ddl[4].startswith('CREATE TABLE IF NOT EXISTS "system_logs_2026_12" PARTITION OF')
+    assert len(ddl) == 5
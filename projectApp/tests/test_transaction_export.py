@@ -0,0 +1,58 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from app.models import Transaction
+from tests.conftest import TestingSessionLocal
+from tests.test_transaction_history import seed_history
+
+def test_export_ndjson_streams_whole_history(client):
+    account_id, headers = seed_history(25)
+    response = client.get(f"/transactions/{account_id}/export", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == 25
+    assert [row["id"] for row in rows] == sorted(row["id"] for row in rows)
+    assert rows[0]["transaction_type"] == "deposit"
+
+def test_export_csv_with_gzip(client):
+    account_id, headers = seed_history(5)
+    response = client.get(
+        f"/transactions/{account_id}/export",
+        params={"format": "csv", "gzip": True},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert 'filename="account-' in response.headers["content-disposition"]
+    # The client undoes Content-Encoding itself
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0] == ["id", "account_id", "transaction_type", "amount", "description", "created_at",
+                       "counter_account_id"]
+    assert len(rows) == 6
+
+def test_export_date_range(client):
+    account_id, headers = seed_history(0)
+    db = TestingSessionLocal()
+    try:
+        for day in (1, 2, 3):
+            db.add(Transaction(account_id=account_id, transaction_type="deposit", amount=day,
+                               created_at=datetime(2024, 1, day, 12, 0)))
+        db.commit()
+    finally:
+        db.close()
+
+    response = client.get(
+        f"/transactions/{account_id}/export",
+        params={"start": "2024-01-02", "end": "2024-01-03"},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert [json.loads(line)["amount"] for line in response.text.splitlines()] == [2.0]
+
+def test_export_requires_ownership(client):
+    account_id, _ = seed_history(1)
+    _, other_headers = seed_history(0, owner_email="other@example.com")
+    assert client.get(f"/transactions/{account_id}/export", headers=other_headers).status_code == 404
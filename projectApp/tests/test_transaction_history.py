@@ -0,0 +1,59 @@
+import pytest
+from app.auth.jwt import create_access_token
+from app.models import Account, Transaction, TransactionType, User
+from tests.conftest import TestingSessionLocal
+
+def seed_history(count, owner_email="history@example.com"):
+    """A user with one account holding ``count`` deposits; returns (account_id, headers)"""
+    db = TestingSessionLocal()
+    try:
+        user = User(full_name="History User", email=owner_email, password_hash="-")
+        db.add(user)
+        db.flush()
+        account = Account(owner=str(user.id), balance=float(count))
+        db.add(account)
+        db.flush()
+        db.add_all([
+            Transaction(account_id=account.id, transaction_type=TransactionType.deposit,
+                        amount=1.0, description=f"tx {i}")
+            for i in range(count)
+        ])
+        db.commit()
+        token = create_access_token({"sub": str(user.id)})
+        return account.id, {"Authorization": f"Bearer {token}"}
+    finally:
+        db.close()
+
+def test_history_pages_with_cursor(client):
+    """Pages are newest-first, disjoint and cover the whole history"""
+    account_id, headers = seed_history(25)
+    seen, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": 10}
+        if cursor:
+            params["after"] = cursor
+        response = client.get(f"/transactions/{account_id}", params=params, headers=headers)
+        assert response.status_code == 200
+        body = response.json()
+        seen.extend(item["id"] for item in body["items"])
+        pages += 1
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+
+    assert pages == 3
+    assert len(seen) == 25
+    assert seen == sorted(set(seen), reverse=True)
+
+def test_history_rejects_bad_cursor_and_foreign_accounts(client):
+    account_id, headers = seed_history(3)
+    response = client.get(f"/transactions/{account_id}", params={"after": "not-a-cursor"}, headers=headers)
+    assert response.status_code == 400
+
+    _, other_headers = seed_history(0, owner_email="other@example.com")
+    assert client.get(f"/transactions/{account_id}", headers=other_headers).status_code == 404
+
+def test_history_page_size_is_bounded(client):
+    account_id, headers = seed_history(1)
+    response = client.get(f"/transactions/{account_id}", params={"limit": 100000}, headers=headers)
+    assert response.status_code == 422
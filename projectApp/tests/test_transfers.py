@@ -0,0 +1,154 @@
+import asyncio
+import random
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app.models import Account, LedgerEntry
+from app.services import transfers
+from app.services.ledger import verify_ledger
+from app.services.transfers import transfer
+from tests.conftest import TestingAsyncSessionLocal, TestingSessionLocal
+from tests.test_balances import create_account, deposit, register
+
+def balances(*account_ids):
+    db = TestingSessionLocal()
+    try:
+        return [db.get(Account, account_id).balance_minor for account_id in account_ids]
+    finally:
+        db.close()
+
+async def ledger_report():
+    async with TestingAsyncSessionLocal() as db:
+        return await verify_ledger(db)
+
+def test_transfer_moves_money_and_journals_both_legs(client):
+    user_id, headers = register(client, "sender@example.com")
+    source = create_account(owner=str(user_id))
+    destination = create_account(owner="999")
+    asyncio.run(deposit(source, 100.0))
+
+    response = client.post("/transactions/transfer", headers=headers, json={
+        "from_account_id": source, "to_account_id": destination, "amount": 30.25, "description": "Rent",
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert body["from_account_id"] == source and body["to_account_id"] == destination
+    assert body["amount"] == 30.25 and body["balance"] == 69.75
+    assert balances(source, destination) == [6975, 3025]
+
+    db = TestingSessionLocal()
+    try:
+        legs = db.query(LedgerEntry.account_id, LedgerEntry.amount_minor).filter_by(transaction_id=body["id"]).all()
+    finally:
+        db.close()
+    assert sorted(legs) == [(source, -3025), (destination, 3025)]
+    assert asyncio.run(ledger_report()) == {"unbalanced": [], "drifted": []}
+
+def test_transfer_rejections(client):
+    user_id, headers = register(client, "rejections@example.com")
+    source = create_account(owner=str(user_id))
+    destination = create_account(owner="999")
+    foreign = create_account(owner="999")
+    asyncio.run(deposit(source, 10.0))
+
+    def attempt(**overrides):
+        payload = {"from_account_id": source, "to_account_id": destination, "amount": 5.0, **overrides}
+        return client.post("/transactions/transfer", headers=headers, json=payload)
+
+    assert attempt(amount=10.01).status_code == 400
+    assert attempt(from_account_id=foreign).json()["detail"] == "Account not found"
+    assert attempt(to_account_id=999999).json()["detail"] == "Destination account not found"
+    assert attempt(to_account_id=source).status_code == 422
+    assert attempt(amount=-5.0).status_code == 422
+    assert attempt(amount=0.001).status_code == 422
+    assert balances(source, destination, foreign) == [1000, 0, 0]
+
+def test_single_account_endpoints_refuse_transfers(client):
+    user_id, headers = register(client, "no-transfer@example.com")
+    source = create_account(owner=str(user_id))
+    asyncio.run(deposit(source, 10.0))
+    item = {"account_id": source, "transaction_type": "transfer", "amount": 1.0}
+
+    response = client.post("/transactions/", headers=headers, json=item)
+    assert response.status_code == 422
+    assert "POST /transactions/transfer" in response.text
+    response = client.post("/transactions/batch", headers=headers, json=[
+        {**item, "transaction_type": "deposit"}, item,
+    ])
+    assert response.status_code == 422 and "POST /transactions/transfer" in response.text
+    assert balances(source) == [1000]
+
+def test_received_transfers_show_in_history_and_export(client):
+    sender_id, sender_headers = register(client, "from@example.com")
+    receiver_id, receiver_headers = register(client, "to@example.com")
+    source = create_account(owner=str(sender_id))
+    destination = create_account(owner=str(receiver_id))
+    asyncio.run(deposit(source, 50.0))
+    asyncio.run(deposit(destination, 1.0))
+    client.post("/transactions/transfer", headers=sender_headers, json={
+        "from_account_id": source, "to_account_id": destination, "amount": 20.0,
+    })
+
+    items = client.get(f"/transactions/{destination}", headers=receiver_headers).json()["items"]
+    assert [(item["transaction_type"], item["account_id"], item["counter_account_id"]) for item in items] == [
+        ("transfer", source, destination), ("deposit", destination, None),
+    ]
+    first = client.get(f"/transactions/{destination}", params={"limit": 1}, headers=receiver_headers).json()
+    rest = client.get(f"/transactions/{destination}", params={"after": first["next_cursor"]},
+                      headers=receiver_headers).json()
+    assert [item["id"] for item in first["items"] + rest["items"]] == [item["id"] for item in items]
+
+    export = client.get(f"/transactions/{destination}/export", headers=receiver_headers)
+    assert len(export.text.splitlines()) == 2
+
+async def test_concurrent_transfers_across_hot_accounts():
+    """Transfers in every direction between a few accounts neither deadlock nor lose money"""
+    accounts = [create_account() for _ in range(4)]
+    for account_id in accounts:
+        await deposit(account_id, 1000.0)
+    rng = random.Random(7)
+    pairs = [rng.sample(accounts, 2) for _ in range(200)]
+
+    semaphore = asyncio.Semaphore(16)
+
+    async def one(a, b):
+        async with semaphore:
+            return await transfer(TestingAsyncSessionLocal, a, b, 1.0)
+
+    results = await asyncio.gather(*(one(a, b) for a, b in pairs), return_exceptions=True)
+    assert [r for r in results if isinstance(r, Exception)] == []
+    final = balances(*accounts)
+    assert sum(final) == 4 * 100000
+    expected = {account_id: 100000 for account_id in accounts}
+    for a, b in pairs:
+        expected[a] -= 100
+        expected[b] += 100
+    assert final == [expected[account_id] for account_id in accounts]
+    assert await ledger_report() == {"unbalanced": [], "drifted": []}
+
+class SerializationFailure(Exception):
+    sqlstate = "40001"
+
+async def test_serialization_failures_are_retried(monkeypatch):
+    source, destination = create_account(), create_account()
+    await deposit(source, 5.0)
+    real = transfers.post_transfer
+    calls = []
+
+    async def flaky(db, *args, **kwargs):
+        calls.append(1)
+        if len(calls) < 3:
+            await real(db, *args, **kwargs)  # the work done so far must be rolled back
+            raise OperationalError("UPDATE accounts ...", {}, SerializationFailure())
+        return await real(db, *args, **kwargs)
+
+    monkeypatch.setattr(transfers, "post_transfer", flaky)
+    posted = await transfer(TestingAsyncSessionLocal, source, destination, 2.0, backoff_base=0)
+    assert len(calls) == 3 and posted.balance_minor == 300
+    assert balances(source, destination) == [300, 200]
+
+    calls.clear()
+    with pytest.raises(OperationalError):
+        await transfer(TestingAsyncSessionLocal, source, destination, 1.0, max_attempts=2, backoff_base=0)
+    assert len(calls) == 2 and balances(source, destination) == [300, 200]
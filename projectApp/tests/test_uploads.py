@@ -0,0 +1,131 @@
+import hashlib
+import io
+import os
+
+import httpx
+import pytest
+from fastapi import FastAPI, File, UploadFile
+
+from app.config import settings
+from app.models import KycDocument, User
+from app.services.document_store import document_store
+from app.services.uploads import INCOMING_DIR, UploadLimitMiddleware, UploadTooLarge, receive_upload
+from tests.conftest import TestingSessionLocal
+
+def register(client, email, content, filename="passport.pdf"):
+    return client.post("/auth/register", data={
+        "full_name": "Upload User",
+        "email": email,
+        "password": "testpass123",
+    }, files={
+        "id_document": (filename, content, "application/pdf")
+    })
+
+def incoming_files(temp_uploads_dir):
+    incoming = os.path.join(temp_uploads_dir, INCOMING_DIR)
+    return os.listdir(incoming) if os.path.isdir(incoming) else []
+
+class RecordingStream(io.BytesIO):
+    """Remembers the largest read so tests can check memory stays bounded"""
+    largest_read = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.largest_read = max(self.largest_read, len(chunk))
+        return chunk
+
+def test_registration_stores_measured_document(client, temp_uploads_dir):
+    """The document lands in UPLOAD_DIR with its size and SHA-256 recorded"""
+    content = os.urandom(300_000)
+    response = register(client, "upload@example.com", content)
+    assert response.status_code == 201
+
+    db = TestingSessionLocal()
+    try:
+        doc = db.query(KycDocument).one()
+    finally:
+        db.close()
+    assert doc.size_bytes == len(content)
+    assert doc.sha256 == hashlib.sha256(content).hexdigest()
+    with open(document_store.path(doc.file_path), "rb") as f:
+        assert f.read() == content
+    assert incoming_files(temp_uploads_dir) == []
+
+def test_registration_rejects_oversized_document(client, temp_uploads_dir, monkeypatch):
+    """Past UPLOAD_MAX_BYTES the upload is aborted: 413, no user, no partial file"""
+    monkeypatch.setattr(settings, "UPLOAD_MAX_BYTES", 1000)
+    response = register(client, "big@example.com", b"x" * 1001)
+    assert response.status_code == 413
+
+    db = TestingSessionLocal()
+    try:
+        assert db.query(User).count() == 0
+        assert db.query(KycDocument).count() == 0
+    finally:
+        db.close()
+    assert incoming_files(temp_uploads_dir) == []
+
+def test_oversized_content_length_is_refused_before_the_body(client, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_MAX_BYTES", 1000)
+    monkeypatch.setattr(settings, "UPLOAD_FORM_OVERHEAD", 1000)
+    response = register(client, "huge@example.com", b"x" * 5000)
+    assert response.status_code == 413
+    assert response.json()["detail"] == "Request body exceeds 2000 bytes"
+    db = TestingSessionLocal()
+    try:
+        assert db.query(User).count() == 0
+    finally:
+        db.close()
+
+async def test_streamed_body_is_cut_off_at_the_limit():
+    """Without a Content-Length the body is counted as it arrives and parsing stops at the cap"""
+    app = FastAPI()
+    handled = []
+
+    @app.post("/upload")
+    async def upload(document: UploadFile = File(...)):
+        handled.append(document.filename)
+        return {}
+
+    app.add_middleware(UploadLimitMiddleware, paths=["/upload"], max_bytes=10_000)
+    sent = []
+
+    async def body():
+        yield b'--b\r\nContent-Disposition: form-data; name="document"; filename="a.pdf"\r\n\r\n'
+        for _ in range(100):
+            sent.append(4096)
+            yield b"x" * 4096
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post("/upload", content=body(),
+                                     headers={"Content-Type": "multipart/form-data; boundary=b"})
+    assert response.status_code == 413 and handled == []
+    assert len(sent) <= 4
+
+def test_registration_strips_directories_from_filename(client, temp_uploads_dir):
+    response = register(client, "path@example.com", b"content", filename="../../etc/passwd")
+    assert response.status_code == 201
+    db = TestingSessionLocal()
+    try:
+        doc = db.query(KycDocument).one()
+    finally:
+        db.close()
+    assert doc.file_name == f"{response.json()['user_id']}_passwd"
+    assert document_store.path(doc.file_path).startswith(temp_uploads_dir)
+
+async def test_receive_upload_reads_in_chunks(tmp_path):
+    content = os.urandom(50_000)
+    stream = RecordingStream(content)
+    stored = await receive_upload(UploadFile(stream), str(tmp_path), max_bytes=len(content), chunk_size=4096)
+
+    assert stream.largest_read == 4096
+    assert stored.size == len(content)
+    assert stored.sha256 == hashlib.sha256(content).hexdigest()
+
+async def test_receive_upload_stops_at_limit(tmp_path):
+    stream = RecordingStream(b"x" * 100_000)
+    with pytest.raises(UploadTooLarge):
+        await receive_upload(UploadFile(stream), str(tmp_path), max_bytes=10_000, chunk_size=4096)
+    # Aborted after the chunk that crossed the limit, not at the end of the stream
+    assert stream.tell() <= 12_288
+    assert os.listdir(tmp_path / INCOMING_DIR) == []
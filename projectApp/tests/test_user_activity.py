@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta, timezone
+
+from app.models import DailyActiveUserSketch, Transaction
+from app.services.hll import HyperLogLog
+from tests.conftest import TestingSessionLocal
+from tests.test_admin_stats import admin_headers
+from tests.test_balances import create_account
+
+def test_hyperloglog_estimate_and_merge():
+    first = HyperLogLog().update(str(i) for i in range(20000))
+    second = HyperLogLog().update(str(i) for i in range(10000, 30000))
+    assert abs(first.count() - 20000) < 20000 * 0.05
+    merged = HyperLogLog.from_bytes(first.to_bytes()).merge(second)
+    assert abs(merged.count() - 30000) < 30000 * 0.05
+    assert HyperLogLog().count() == 0
+
+def seed_activity():
+    """Owner "1" active 2 and 40 days ago, owner "2" 2 days ago and today"""
+    now = datetime.now(timezone.utc).replace(hour=12, minute=0, second=0, microsecond=0)
+    first, second, also_first = create_account(owner="1"), create_account(owner="2"), create_account(owner="1")
+    db = TestingSessionLocal()
+    try:
+        for account_id, days_ago in ((first, 2), (also_first, 2), (second, 2), (first, 40), (second, 0)):
+            db.add(Transaction(account_id=account_id, transaction_type="deposit", amount=1.0,
+                               created_at=now - timedelta(days=days_ago)))
+        db.commit()
+    finally:
+        db.close()
+
+def test_activity_short_range_is_exact(client):
+    headers = admin_headers(client)
+    seed_activity()
+    body = client.get("/api/admin/users/activity", params={"days": 7}, headers=headers).json()
+    assert body["approximate"] is False
+    assert len(body["labels"]) == 7
+    assert body["values"][-3:] == [2, 0, 1]
+    assert body["unique_users"] == 2
+
+def test_activity_long_range_merges_stored_sketches(client):
+    headers = admin_headers(client)
+    seed_activity()
+    body = client.get("/api/admin/users/activity", params={"days": 90}, headers=headers).json()
+    assert body["approximate"] is True
+    assert body["values"][-3:] == [2, 0, 1]
+    assert body["values"][-41] == 1
+    assert body["unique_users"] == 2
+
+    db = TestingSessionLocal()
+    try:
+        # Every closed day in the range is kept for the next query; today is not
+        assert db.query(DailyActiveUserSketch).count() == 89
+    finally:
+        db.close()
+    again = client.get("/api/admin/users/activity", params={"days": 90}, headers=headers).json()
+    assert again == body
@@ -0,0 +1,99 @@
+import asyncio
+import time
+
+from app.config import settings
+from app.models import User
+from app.services.user_search import UserSearchIndex
+from tests.conftest import TestingSessionLocal, async_engine
+from tests.test_admin_stats import admin_headers
+
+def add_users(*people):
+    db = TestingSessionLocal()
+    try:
+        db.add_all([User(full_name=name, email=email, password_hash="-") for name, email in people])
+        db.commit()
+    finally:
+        db.close()
+
+def search(client, headers, q, **params):
+    response = client.get("/api/admin/users/search", params={"q": q, **params}, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+def test_search_ranks_and_pages(client):
+    headers = admin_headers(client)
+    add_users(
+        ("Joanna Smith", "jo@example.com"),
+        ("Anna Berg", "anna@example.com"),
+        ("Hannah Annandale", "h.annandale@example.com"),
+        ("Bob Stone", "bob@example.com"),
+    )
+    results = search(client, headers, "anna")
+    assert [user["name"] for user in results] == ["Anna Berg", "Hannah Annandale", "Joanna Smith"]
+    assert results[0]["email"] == "anna@example.com"
+    assert "join_date" in results[0]
+
+    assert [user["name"] for user in search(client, headers, "ANNA", limit=1, offset=1)] == ["Hannah Annandale"]
+    assert search(client, headers, "zzz") == []
+    # Short queries match name-word and email prefixes
+    assert [user["name"] for user in search(client, headers, "bo")] == ["Bob Stone"]
+    assert client.get("/api/admin/users/search", params={"q": "a", "limit": 1000}, headers=headers).status_code == 422
+
+def test_search_sees_new_and_renamed_users(client):
+    headers = admin_headers(client)
+    add_users(("Carla Ruiz", "carla@example.com"))
+    assert len(search(client, headers, "carla")) == 1
+
+    add_users(("Carlos Diaz", "carlos@example.com"))
+    db = TestingSessionLocal()
+    try:
+        db.query(User).filter(User.email == "carla@example.com").one().full_name = "Karla Ruiz"
+        db.commit()
+    finally:
+        db.close()
+    assert {user["name"] for user in search(client, headers, "carl")} == {"Carlos Diaz", "Karla Ruiz"}
+    assert [user["name"] for user in search(client, headers, "karla")] == ["Karla Ruiz"]
+
+def test_index_matches_substrings_only():
+    index = UserSearchIndex()
+    index._built_at = 0.0
+    index.max_age = float("inf")
+    index.upsert(1, "Ann Lee", "ann@example.com")
+    index.upsert(2, "Nathan Ng", "nate@example.com")
+    assert index.search("nat", 10) == [2]
+    assert index.search("lee ann", 10) == []
+    index.remove(2)
+    assert index.search("nat", 10) == []
+
+def test_list_users_uses_model_fields(client):
+    headers = admin_headers(client)
+    users = client.get("/api/admin/users", headers=headers).json()
+    assert users[0]["email"] == settings.DEFAULT_ADMIN_EMAIL
+    assert users[0]["name"]
+    assert users[0]["kyc_status"] == "verified"
+
+async def test_concurrent_searches_share_one_build(monkeypatch):
+    add_users(("Dana Park", "dana@example.com"))
+    index = UserSearchIndex(max_age=60)
+    builds = []
+    index_rows = UserSearchIndex._index
+
+    def slow_index(rows):
+        builds.append(len(rows))
+        # A user committed while the build is underway survives the swap
+        index.upsert(999, "Late Comer", "late@example.com")
+        time.sleep(0.05)
+        return index_rows(rows)
+
+    monkeypatch.setattr(index, "_index", slow_index)
+    await asyncio.gather(*(index.ensure(async_engine) for _ in range(10)))
+    assert builds == [1]
+    assert index.search("dana", 10) and index.search("late", 10) == [999]
+
+    # Expired: the old index answers while the rebuild runs in the background
+    index._built_at -= 120
+    add_users(("Eli Moss", "eli@example.com"))
+    await index.ensure(async_engine)
+    assert index.search("eli", 10) == []
+    await index._building
+    assert len(index.search("eli", 10)) == 1 and builds == [1, 2]